@@ -53,12 +53,12 @@ def run():
         # 构造命令：
         # 1. 切换到项目目录
         # 2. 运行 Python 脚本
-        # 3. 传入接口参数 (假设你的程序接受 --intf)
+        # 3. 传入本机地址，并把 OLSR 路由通过 netlink 装进内核 (ip route 里 proto 100 的条目)
         # 4. 重定向日志 (非常重要！)
         # 5. 后台运行 (&)
         cmd = (
             f"cd {project_path} && "
-            f"python3 {olsr_script} --intf {intf} "
+            f"python3 {olsr_script} {h.IP()} --install-routes netlink --route-dev {intf} "
             f"> {project_path}/logs/{h.name}.log 2>&1 &"
         )
         
@@ -0,0 +1,211 @@
+'''
+本文件实现 OLSRNode 的 asyncio 运行模式
+
+线程模式下 loop_hello / loop_tc / loop_expiry / loop_recompute 四个守护线程加一个阻塞的 receive_loop
+靠一把全局锁串行化，一次慢的路由重算会同时卡住 HELLO 发送和收包处理。
+asyncio 模式下所有工作都在同一个事件循环里完成：
+1. 收包：DatagramProtocol.datagram_received 排空 socket 后调用 process_batch
+2. HELLO / TC：带抖动的 call_later 定时回调，和线程模式的间隔一致 (INTERVAL - 0.5 + random())
+3. 元组过期：按 ExpiryScheduler 的最早过期时刻挂一个定时器，有更早的元组登记进来就重新挂
+4. 合并窗口内被推迟的重算：窗口到期时挂一个定时器执行
+5. 发送聚合队列：第一条消息入队时在它的发送时刻挂一个定时器
+6. 数据面：数据 socket 的可读回调里排空已到达的数据包
+单线程执行，所以全局锁换成空上下文，不再有锁竞争和线程切换
+'''
+import asyncio
+import contextlib
+import random
+
+from constants import HELLO_INTERVAL, TC_INTERVAL
+from olsr_log import get_logger, Addr
+
+log = get_logger('runtime')
+
+# 定时器比截止时刻稍晚触发，保证 run_due / poll 的 "严格早于 now" 判断能成立
+TIMER_SLACK = 0.001
+
+
+class OLSRProtocol(asyncio.DatagramProtocol):
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def datagram_received(self, data, addr):
+        self.runtime.on_datagram(data, addr)
+
+    def error_received(self, exc):
+        log.error("收包出错: %s", exc)
+
+
+class AsyncRuntime:
+    def __init__(self, node):
+        self.node = node
+        self.loop = None
+        self.transport = None
+        self._stopped = None
+
+        self._expiry_handle = None      # 过期定时器
+        self._expiry_deadline = None    # 过期定时器对应的截止时刻
+        self._recompute_handle = None   # 合并窗口定时器
+        self._hello_handle = None
+        self._tc_handle = None
+        self._tx_handle = None          # 发送聚合定时器
+        self._egress_handle = None      # 出口调度器定时器
+        self._egress_deadline = None
+
+    async def run(self):
+        node = self.node
+        self.loop = asyncio.get_running_loop()
+        self._stopped = self.loop.create_future()
+
+        # 复用 OLSRNode 已经绑定好的 socket
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: OLSRProtocol(self), sock=node.sock
+        )
+        node.sendto = self.transport.sendto
+        self.install()
+        # 数据 socket 直接挂可读回调，用数据面的预分配缓冲区收包
+        node.data_sock.setblocking(False)
+        self.loop.add_reader(node.data_sock, self._data_ready)
+
+        log.info("OLSR Node %s started on port %d (asyncio)", Addr(node.my_ip), node.port)
+        self._hello_tick()
+        self._tc_tick()
+
+        try:
+            await self._stopped
+        finally:
+            self.cancel_timers()
+            self.loop.remove_reader(node.data_sock)
+            self.transport.close()
+
+    def install(self):
+        """把节点的各个调度器接到本运行时的定时器上 (仿真运行时 sim.SimRuntime 复用)"""
+        node = self.node
+        node.lock = contextlib.nullcontext()   # 单线程执行，不需要锁
+        node.expiry.on_earliest_changed = self._arm_expiry
+        node.tx_queue.on_deadline = self._arm_tx
+        node.egress.on_wakeup = self._arm_egress
+        self._arm_expiry(node.expiry.next_deadline())
+
+    def cancel_timers(self):
+        for handle in (self._expiry_handle, self._recompute_handle, self._hello_handle, self._tc_handle, self._tx_handle,
+                       self._egress_handle):
+            if handle is not None:
+                handle.cancel()
+
+    def stop(self):
+        """可以从其他线程调用"""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._set_stopped)
+
+    def _set_stopped(self):
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+
+    # ==========================
+    # 收包
+    # ==========================
+    def on_datagram(self, data, addr):
+        # 事件循环每次可读回调只读一个数据报，这里顺手把 socket 里已到达的其余数据报非阻塞地取完，
+        # 整批交给 process_batch，批内的重算请求合并到批末
+        try:
+            batch = self.node.receiver.drain([(data, addr)])
+            self.node.process_batch(batch)
+        except Exception as e:
+            log.error("收包出错: %s", e)
+        self._arm_recompute()
+
+    def _data_ready(self):
+        try:
+            self.node.data_plane.drain()
+        except Exception as e:
+            log.error("数据面出错: %s", e)
+
+    # ==========================
+    # 定时任务
+    # ==========================
+    def _hello_tick(self):
+        try:
+            self.node.generate_and_send_hello()
+        except Exception as e:
+            log.error("发送 HELLO 出错: %s", e)
+        self._hello_handle = self.loop.call_later(HELLO_INTERVAL - 0.5 + random.random(), self._hello_tick)
+
+    def _tc_tick(self):
+        try:
+            self.node.generate_and_send_tc()
+        except Exception as e:
+            log.error("发送 TC 出错: %s", e)
+        self._tc_handle = self.loop.call_later(TC_INTERVAL - 0.5 + random.random(), self._tc_tick)
+
+    def _arm_expiry(self, deadline):
+        """在最早过期时刻挂定时器；已挂的定时器更早则不动"""
+        if deadline is None:
+            return
+        if self._expiry_handle is not None:
+            if self._expiry_deadline <= deadline:
+                return
+            self._expiry_handle.cancel()
+        self._expiry_deadline = deadline
+        delay = max(0.0, deadline - self.node.clock()) + TIMER_SLACK
+        self._expiry_handle = self.loop.call_later(delay, self._expiry_tick)
+
+    def _expiry_tick(self):
+        node = self.node
+        self._expiry_handle = None
+        self._expiry_deadline = None
+        if node.expiry.run_due():
+            # 过期清理也会改变二跳集/拓扑集
+            node.recompute_scheduler.request()
+        self._arm_expiry(node.expiry.next_deadline())
+        self._arm_recompute()
+
+    def _arm_tx(self, deadline):
+        """聚合队列从空变为非空时，在它的发送时刻挂定时器"""
+        if self._tx_handle is not None:
+            self._tx_handle.cancel()
+        self._tx_handle = self.loop.call_later(max(0.0, deadline - self.node.clock()), self._tx_tick)
+
+    def _tx_tick(self):
+        self._tx_handle = None
+        try:
+            self.node.tx_queue.flush()
+        except Exception as e:
+            log.error("发送聚合队列出错: %s", e)
+
+    def _arm_egress(self, deadline):
+        """出口调度器有排队的包时，在它下一次能发的时刻挂定时器；已挂的定时器更早则不动"""
+        if deadline is None:
+            return
+        if self._egress_handle is not None:
+            if self._egress_deadline <= deadline:
+                return
+            self._egress_handle.cancel()
+        self._egress_deadline = deadline
+        self._egress_handle = self.loop.call_later(max(0.0, deadline - self.node.clock()), self._egress_tick)
+
+    def _egress_tick(self):
+        self._egress_handle = None
+        self._egress_deadline = None
+        try:
+            deadline = self.node.egress.drain()
+        except Exception as e:
+            log.error("出口调度出错: %s", e)
+            return
+        self._arm_egress(deadline)
+
+    def _arm_recompute(self):
+        """有被合并窗口推迟的重算时，在窗口到期时执行"""
+        if self._recompute_handle is not None:
+            return
+        deadline = self.node.recompute_scheduler.next_deadline()
+        if deadline is None:
+            return
+        delay = max(0.0, deadline - self.node.clock()) + TIMER_SLACK
+        self._recompute_handle = self.loop.call_later(delay, self._recompute_tick)
+
+    def _recompute_tick(self):
+        self._recompute_handle = None
+        self.node.recompute_scheduler.poll()
+        self._arm_recompute()
@@ -0,0 +1,265 @@
+'''
+控制面规模基准：在仿真器 (sim.py) 里跑整网 OLSRNode，量化一次代码改动对协议开销的影响
+
+拓扑：grid / line / random (随机几何图) / clustered (簇内稠密、簇间少量桥接)，10 ~ 2000 个节点
+每个 (拓扑, 规模) 分两个阶段：
+1. 收敛：所有节点同时启动，每隔 step 秒 (虚拟时间) 检查一次，直到每个节点的路由表都和最短跳数一致
+2. 稳态：收敛后再跑 measure 秒，统计稳态下的控制开销
+报告：
+- 收敛时刻 (虚拟时间) 和仿真耗时
+- 稳态下每节点每秒的控制包数 / 字节数，以及按消息类型 (HELLO / TC) 分的消息数和字节数
+- 每处理一条 HELLO / TC 的 CPU 时间 (不含其中触发的重算)，每次 MPR / 路由重算的 CPU 时间
+- recalculate_mpr / recalculate_routing_table 的调用次数
+- 各状态表 (链路集、邻居集、二跳集、拓扑集、重复集、路由表、过期堆等) 的峰值：单节点最大值和全网总量
+结果写成 JSON (--output)，可以用 --compare 和之前某次提交的结果对比
+仿真是单线程的，CPU 时间用 perf_counter 计
+
+用法: python3 bench_control_plane.py [--topologies grid,random] [--sizes 10,50,100,200] [--output out.json]
+                                     [--compare baseline.json]
+(1000 个节点以上每个配置要跑几分钟到几十分钟)
+'''
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from sim import Simulator, make_topology, TOPOLOGIES
+from constants import HELLO_MESSAGE, TC_MESSAGE
+
+SIZES = (10, 50, 100, 200)
+MSG_NAMES = {HELLO_MESSAGE: 'hello', TC_MESSAGE: 'tc'}
+HANDLERS = ('process_hello', 'process_tc')
+RECOMPUTES = ('recalculate_mpr', 'recalculate_routing_table')
+
+# 各状态表的大小 (单个节点)
+TABLES = {
+    'links': lambda n: len(n.link_set.links),
+    'neighbors': lambda n: len(n.neighbor_manager.neighbors),
+    'two_hop': lambda n: len(n.neighbor_manager.two_hop_set),
+    'mpr_set': lambda n: len(n.neighbor_manager.current_mpr_set),
+    'mpr_selectors': lambda n: len(n.neighbor_manager.mpr_selectors),
+    'topology_records': lambda n: len(n.topology_manager.records),
+    'topology_links': lambda n: sum(len(r.dests) for r in n.topology_manager.records.values()),
+    'duplicate_windows': lambda n: len(n.duplicate_set.windows),
+    'routes': lambda n: len(n.routing_manager.routing_table),
+    'expiry_heap': lambda n: len(n.expiry),
+}
+
+
+class Probe:
+    """
+    给每个节点的处理函数套一层计时，所有节点共用一份计数
+    HELLO / TC 处理里可能直接触发重算，这部分时间从 HELLO / TC 里扣掉，只记在重算上
+    """
+    def __init__(self):
+        self.calls = dict.fromkeys(HANDLERS + RECOMPUTES, 0)
+        self.time = dict.fromkeys(HANDLERS + RECOMPUTES, 0.0)
+        self._inner = 0.0   # 累计的重算时间，用于扣除嵌套部分
+
+    def attach(self, node):
+        self._wrap(node, 'process_hello')
+        self._wrap(node, 'process_tc')
+        self._wrap(node.neighbor_manager, 'recalculate_mpr')
+        self._wrap(node.routing_manager, 'recalculate_routing_table')
+
+    def _wrap(self, obj, name):
+        fn = getattr(obj, name)
+        clock = time.perf_counter
+        nested = name in RECOMPUTES
+
+        def timed(*args, **kwargs):
+            inner0 = self._inner
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - t0
+                if nested:
+                    self._inner += elapsed
+                else:
+                    elapsed -= self._inner - inner0
+                self.time[name] += elapsed
+                self.calls[name] += 1
+        setattr(obj, name, timed)
+
+
+def sample_tables(sim, peaks):
+    for name, size in TABLES.items():
+        values = [size(node) for node in sim.nodes.values()]
+        peak = peaks[name]
+        peak['max_per_node'] = max(peak['max_per_node'], max(values))
+        peak['total'] = max(peak['total'], sum(values))
+
+
+def medium_counters(medium):
+    return medium.control_sent, medium.bytes, dict(medium.msg_count), dict(medium.msg_bytes)
+
+
+def run_case(topology, size, seed, timeout, measure, step):
+    sim = Simulator(seed=seed)
+    n, edges = make_topology(topology, size, random.Random(seed))
+    sim.build(n, edges)
+    probe = Probe()
+    for node in sim.nodes.values():
+        probe.attach(node)
+    peaks = {name: {'max_per_node': 0, 'total': 0} for name in TABLES}
+
+    # 1. 收敛
+    sim.start()
+    expected = sim.expected_distances()
+    converged_at = None
+    end = timeout
+    while sim.loop.now < end:
+        sim.run(min(step, end - sim.loop.now))
+        sample_tables(sim, peaks)
+        if sim.convergence(expected) == 1.0:
+            converged_at = sim.loop.now
+            break
+    convergence_wall = sim.wall_time
+    convergence_ratio = sim.convergence(expected)
+
+    # 2. 稳态
+    before = medium_counters(sim.medium)
+    calls_before = dict(probe.calls)
+    t_measure = sim.loop.now
+    while sim.loop.now < t_measure + measure:
+        sim.run(min(step, t_measure + measure - sim.loop.now))
+        sample_tables(sim, peaks)
+    after = medium_counters(sim.medium)
+    rate = 1.0 / (len(sim.nodes) * measure) if measure else 0.0
+
+    by_type = {}
+    for msg_type in sorted(set(after[2]) | set(before[2])):
+        by_type[MSG_NAMES.get(msg_type, str(msg_type))] = {
+            'messages_per_node_s': (after[2].get(msg_type, 0) - before[2].get(msg_type, 0)) * rate,
+            'bytes_per_node_s': (after[3].get(msg_type, 0) - before[3].get(msg_type, 0)) * rate,
+        }
+
+    stats = sim.stats()
+    return {
+        'topology': topology,
+        'nodes': stats['nodes'],
+        'links': stats['links'],
+        'seed': seed,
+        'converged': converged_at is not None,
+        'convergence_time': converged_at,
+        'convergence_ratio': convergence_ratio,
+        'convergence_wall_time': convergence_wall,
+        'sim_time': stats['sim_time'],
+        'wall_time': stats['wall_time'],
+        'speedup': stats['speedup'],
+        'events': stats['events'],
+        'overhead': {
+            'packets_per_node_s': (after[0] - before[0]) * rate,
+            'bytes_per_node_s': (after[1] - before[1]) * rate,
+            'by_type': by_type,
+        },
+        'cpu_us': {name: probe.time[name] / probe.calls[name] * 1e6 if probe.calls[name] else 0.0
+                   for name in HANDLERS + RECOMPUTES},
+        'calls': dict(probe.calls),
+        'steady_calls': {name: probe.calls[name] - calls_before[name] for name in RECOMPUTES},
+        'peak_tables': peaks,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# 对比时关注的指标：(名字, 取值函数)，都是越小越好
+COMPARE_METRICS = (
+    ('convergence_time', lambda r: r['convergence_time']),
+    ('bytes/node/s', lambda r: r['overhead']['bytes_per_node_s']),
+    ('hello us', lambda r: r['cpu_us']['process_hello']),
+    ('tc us', lambda r: r['cpu_us']['process_tc']),
+    ('route us', lambda r: r['cpu_us']['recalculate_routing_table']),
+    ('route calls', lambda r: r['calls']['recalculate_routing_table']),
+    ('mpr calls', lambda r: r['calls']['recalculate_mpr']),
+)
+
+
+def compare(results, baseline):
+    base = {(r['topology'], r['nodes']): r for r in baseline['results']}
+    print(f"\n与 {baseline['meta'].get('commit')} 对比 (新 / 旧)")
+    print(f"{'topology':>10} {'nodes':>6} " + "".join(f"{name:>17}" for name, _ in COMPARE_METRICS))
+    for r in results:
+        old = base.get((r['topology'], r['nodes']))
+        if old is None:
+            continue
+        row = f"{r['topology']:>10} {r['nodes']:>6} "
+        for _, get in COMPARE_METRICS:
+            new_v, old_v = get(r), get(old)
+            row += f"{new_v / old_v:>17.2f}" if new_v is not None and old_v else f"{'-':>17}"
+        print(row)
+
+
+def print_result(r):
+    conv = f"{r['convergence_time']:.1f}" if r['converged'] else f"no ({r['convergence_ratio']:.0%})"
+    by_type = r['overhead']['by_type']
+    hello = by_type.get('hello', {}).get('bytes_per_node_s', 0.0)
+    tc = by_type.get('tc', {}).get('bytes_per_node_s', 0.0)
+    print(f"{r['topology']:>10} {r['nodes']:>6} {r['links']:>6} {conv:>9} {r['wall_time']:>8.1f} "
+          f"{r['overhead']['packets_per_node_s']:>8.2f} {hello:>9.0f} {tc:>9.0f} "
+          f"{r['cpu_us']['process_hello']:>8.1f} {r['cpu_us']['process_tc']:>7.1f} "
+          f"{r['calls']['recalculate_mpr']:>7} {r['calls']['recalculate_routing_table']:>7} "
+          f"{r['peak_tables']['topology_links']['max_per_node']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OLSR 控制面规模基准")
+    parser.add_argument("--topologies", default=",".join(TOPOLOGIES))
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES), help="节点数，逗号分隔 (10 ~ 2000)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="收敛阶段最多仿真多少秒")
+    parser.add_argument("--measure", type=float, default=20.0, help="稳态阶段仿真多少秒")
+    parser.add_argument("--step", type=float, default=1.0, help="收敛检查 / 状态表采样的间隔 (秒)")
+    parser.add_argument("--output", default=None, help="把结果写成 JSON 文件")
+    parser.add_argument("--compare", default=None, help="与之前的 JSON 结果对比")
+    args = parser.parse_args()
+
+    topologies = [t for t in args.topologies.split(',') if t]
+    for t in topologies:
+        if t not in TOPOLOGIES:
+            parser.error(f"unknown topology: {t}")
+    sizes = [int(x) for x in args.sizes.split(',') if x]
+
+    print(f"{'topology':>10} {'nodes':>6} {'links':>6} {'conv s':>9} {'wall s':>8} {'pkt/n/s':>8} "
+          f"{'hello B/s':>9} {'tc B/s':>9} {'hello us':>8} {'tc us':>7} {'mpr #':>7} {'route #':>7} {'topo':>7}")
+    results = []
+    for topology in topologies:
+        for size in sizes:
+            r = run_case(topology, size, args.seed, args.timeout, args.measure, args.step)
+            results.append(r)
+            print_result(r)
+            sys.stdout.flush()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': args.seed,
+            'timeout': args.timeout,
+            'measure': args.measure,
+            'step': args.step,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"结果已写入 {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
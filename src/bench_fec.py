@@ -0,0 +1,114 @@
+'''
+视频流 FEC (fec.py) 的恢复能力与吞吐基准
+
+1. 恢复：合成的视频帧经 VideoStreamSender 切片 (可带 FEC)，每个分片独立地经过 hops 跳、
+   每跳丢包率为 loss 的模拟链路，交给 VideoStreamReceiver 重组，统计帧完成率和恢复出的分片数
+2. 吞吐：单独计时 FEC 编码和 (丢 r 个数据分片时的) 解码，给出 MB/s
+没有 NumPy 时 Reed-Solomon (r >= 2) 的配置会被跳过
+
+用法: python3 bench_fec.py [recovery|throughput|all] [帧数]
+'''
+import os
+import random
+import sys
+import time
+
+from fec import encode_group, decode_group, np
+from video_stream import VideoStreamSender, VideoStreamReceiver
+
+CHUNK_SIZE = 1200
+FRAME_SIZES = (20000, 60000)            # 合成帧大小范围 (字节)，约 17-50 个分片
+LOSS_RATES = (0.0, 0.01, 0.02, 0.05, 0.10)
+HOPS = (1, 3, 5)
+CONFIGS = [(0, 0), (8, 1), (8, 2), (16, 4), (10, 5)]   # (k, r)，(0, 0) 为不带 FEC
+
+
+def label(fec):
+    k, r = fec
+    if not k:
+        return "none"
+    return f"{'xor' if r == 1 else 'rs'} {k}+{r}"
+
+
+def available(fec):
+    return fec[1] < 2 or np is not None
+
+
+def run_recovery(fec, loss, hops, frames, seed=1):
+    rng = random.Random(seed)
+    packets = []
+    sender = VideoStreamSender(lambda dest, p: packets.append(bytes(p)) or True, 1,
+                               chunk_size=CHUNK_SIZE, fec=fec)
+    receiver = VideoStreamReceiver(max_frame_size=FRAME_SIZES[1] + CHUNK_SIZE)
+    data = os.urandom(FRAME_SIZES[1])
+    deliver = (1.0 - loss) ** hops      # 分片经过 hops 跳都没丢的概率
+
+    for _ in range(frames):
+        sender.send_frame(data[:rng.randint(*FRAME_SIZES)])
+        for p in packets:
+            if rng.random() < deliver:
+                receiver.handle(1, p)
+        packets.clear()
+    stats = next(iter(receiver.stats().values()))
+    overhead = sender.repair_chunks / (sender.chunks - sender.repair_chunks)
+    return stats['completion_rate'], stats['recovered_chunks'], overhead
+
+
+def bench_recovery(frames):
+    configs = [c for c in CONFIGS if available(c)]
+    print(f"帧完成率 (每配置 {frames} 帧，分片 {CHUNK_SIZE} 字节)")
+    header = f"{'hops':>4} {'loss':>5} " + "".join(f"{label(c):>11}" for c in configs)
+    print(header)
+    for hops in HOPS:
+        for loss in LOSS_RATES:
+            row = f"{hops:>4} {loss:>5.0%} "
+            for fec in configs:
+                rate, _, _ = run_recovery(fec, loss, hops, frames)
+                row += f"{rate:>11.1%}"
+            print(row)
+    row = f"{'冗余':<9}" + "".join(f"{run_recovery(c, 0, 1, 10)[2]:>11.1%}" for c in configs)
+    print(row)
+
+
+def bench_throughput(rounds=200):
+    print(f"\nFEC 编解码吞吐 (分片 {CHUNK_SIZE} 字节)")
+    print(f"{'config':>8} {'encode MB/s':>12} {'decode MB/s':>12}")
+    for fec in CONFIGS:
+        k, r = fec
+        if not k or not available(fec):
+            continue
+        chunks = [os.urandom(CHUNK_SIZE) for _ in range(k)]
+        repairs = encode_group(chunks, CHUNK_SIZE, r)
+
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            encode_group(chunks, CHUNK_SIZE, r)
+        t_enc = time.perf_counter() - t0
+
+        # 丢掉前 r 个数据分片，用全部修复分片恢复
+        present = {i: chunks[i] for i in range(r, k)}
+        present.update({k + j: repairs[j] for j in range(r)})
+        recovered = decode_group(present, k, r, CHUNK_SIZE)
+        assert all(recovered[i] == chunks[i] for i in range(r)), "FEC 解码结果错误"
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            decode_group(present, k, r, CHUNK_SIZE)
+        t_dec = time.perf_counter() - t0
+
+        mb = rounds * k * CHUNK_SIZE / 1e6
+        print(f"{label(fec):>8} {mb / t_enc:>12.1f} {mb / t_dec:>12.1f}")
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else "all"
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    if np is None:
+        print("未安装 NumPy，跳过 Reed-Solomon 配置")
+    if mode in ("recovery", "all"):
+        bench_recovery(frames)
+    if mode in ("throughput", "all"):
+        bench_throughput()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+'''
+MPR 选择：增量引擎 (mpr_engine.py) 与从头计算 (select_mpr) 的对照检查和基准
+
+1. 性质检查：对 NeighborManager 随机施加一串增量 (邻居对称状态 / 意愿值翻转、二跳元组增删、
+   元组过期、邻居删除)，每一步都比较
+   - 增量维护的覆盖关系 与 get_reachability_map() 从头构建的结果
+   - MPREngine.select()  与 select_mpr() 从头选择的结果
+   必须完全相同
+2. 基准：N 个对称邻居、每个邻居 K 个二跳的稳定网络中，每次只有一条二跳元组出现/消失，
+   对比每次更新后重算 MPR 的耗时
+3. 选择函数基准：合成的稠密邻域上，对比位集 + 惰性堆实现的 select_mpr 与原来的 select_mpr_legacy，
+   并检查两者步骤 1-3 的结果一致 (legacy 结果补做步骤 4 后应与 select_mpr 相同)
+
+用法: python3 bench_mpr.py [check|bench|select|all] [随机轮数]
+'''
+import contextlib
+import os
+import random
+import sys
+import time
+
+from constants import *
+from neigh_manager import NeighborManager
+from mpr_selector import select_mpr, select_mpr_legacy, remove_redundant_mprs
+
+
+def hello(groups):
+    return {'neighbor_groups': groups}
+
+
+def sym_group(ips):
+    return ((SYM_NEIGH << 2) | SYM_LINK, ips)
+
+
+def lost_group(ips):
+    return ((NOT_NEIGH << 2) | LOST_LINK, ips)
+
+
+def random_step(nm, rng, pool, now):
+    """对 NeighborManager 施加一个随机增量"""
+    op = rng.random()
+    n = rng.choice(pool)
+    if op < 0.25:
+        will = rng.choice([WILL_NEVER, WILL_LOW, WILL_DEFAULT, WILL_DEFAULT, WILL_HIGH, WILL_ALWAYS])
+        nm.update_neighbor_status(n, will, rng.random() < 0.8)
+    elif op < 0.65:
+        # 二跳里既有纯二跳，也可能是我的一跳邻居
+        targets = rng.sample(pool, rng.randint(1, 4))
+        nm.process_2hop_neighbors(n, hello([sym_group(targets)]), rng.uniform(1, 6), now)
+    elif op < 0.8:
+        targets = rng.sample(pool, rng.randint(1, 3))
+        nm.process_2hop_neighbors(n, hello([lost_group(targets)]), 6, now)
+    elif op < 0.9:
+        nm.expiry.run_due(now)
+    else:
+        nm.remove_neighbor(n)
+
+
+def check(rounds=200, steps=150, seed=1):
+    """随机性质检查，返回比较的次数"""
+    compared = 0
+    for r in range(rounds):
+        rng = random.Random(seed * 100003 + r)
+        my_ip = 1
+        pool = list(range(2, 2 + rng.randint(4, 30)))
+        nm = NeighborManager(my_ip)
+        now = 0.0
+        for _ in range(steps):
+            now += rng.uniform(0, 1)
+            random_step(nm, rng, pool, now)
+
+            expected_cov = nm.get_reachability_map()
+            got_cov = nm.mpr_engine.coverage_map()
+            assert got_cov == expected_cov, (r, got_cov, expected_cov)
+
+            expected = nm.recalculate_mpr_full()
+            got = nm.mpr_engine.select()
+            assert got == expected, (r, sorted(got), sorted(expected))
+            compared += 1
+    return compared
+
+
+def bench(num_neighbors, two_hop_per_neighbor, updates=200, seed=7):
+    rng = random.Random(seed)
+    my_ip = 1
+    neighbors = list(range(2, 2 + num_neighbors))
+    two_hops = list(range(100000, 100000 + num_neighbors * two_hop_per_neighbor // 2))
+    nm = NeighborManager(my_ip)
+    for n in neighbors:
+        nm.update_neighbor_status(n, WILL_DEFAULT, True)
+        nm.process_2hop_neighbors(n, hello([sym_group(rng.sample(two_hops, two_hop_per_neighbor))]), 1e9, 0)
+
+    deltas = []
+    for _ in range(updates):
+        n = rng.choice(neighbors)
+        t = rng.choice(two_hops)
+        group = lost_group([t]) if (n, t) in nm.two_hop_set else sym_group([t])
+        deltas.append((n, group))
+
+    full_s = inc_s = 0.0
+    for n, group in deltas:
+        nm.process_2hop_neighbors(n, hello([group]), 1e9, 0)
+        t0 = time.perf_counter()
+        expected = nm.recalculate_mpr_full()
+        t1 = time.perf_counter()
+        got = nm.mpr_engine.select()
+        t2 = time.perf_counter()
+        assert got == expected
+        full_s += t1 - t0
+        inc_s += t2 - t1
+    return full_s / updates * 1e3, inc_s / updates * 1e3
+
+
+def synthetic_neighborhood(rng, num_neighbors, num_two_hop, density):
+    """随机邻域：每个邻居以 density 的概率覆盖每个二跳，意愿值随机"""
+    wills = [WILL_NEVER, WILL_LOW, WILL_DEFAULT, WILL_DEFAULT, WILL_DEFAULT, WILL_HIGH]
+    candidates = {n: rng.choice(wills) for n in range(num_neighbors)}
+    two_hops = range(10000, 10000 + num_two_hop)
+    coverage_map = {n: {t for t in two_hops if rng.random() < density} for n in candidates}
+    return candidates, coverage_map
+
+
+def bench_select(num_neighbors, num_two_hop, density, repeat=5, seed=11):
+    rng = random.Random(seed)
+    cases = [synthetic_neighborhood(rng, num_neighbors, num_two_hop, density) for _ in range(repeat)]
+    legacy_s = new_s = 0.0
+    removed = 0
+    for candidates, coverage_map in cases:
+        t0 = time.perf_counter()
+        old = select_mpr_legacy(candidates, coverage_map)
+        t1 = time.perf_counter()
+        new = select_mpr(candidates, coverage_map)
+        t2 = time.perf_counter()
+        rank = {ip: i for i, ip in enumerate(candidates)}
+        assert new == remove_redundant_mprs(set(old), candidates, coverage_map, rank)
+        legacy_s += t1 - t0
+        new_s += t2 - t1
+        removed += len(old) - len(new)
+    return legacy_s / repeat * 1e3, new_s / repeat * 1e3, removed / repeat
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'all'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    if mode in ('check', 'all'):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            compared = check(rounds)
+        print(f"check: {compared} 次比较，增量引擎与 select_mpr 结果一致")
+
+    if mode in ('bench', 'all'):
+        print(f"{'neighbors':>9} {'2hop/n':>6} {'full ms':>9} {'incr ms':>9} {'speedup':>8}")
+        for num_neighbors, k in ((10, 5), (50, 10), (200, 20), (500, 20)):
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                full_ms, inc_ms = bench(num_neighbors, k)
+            print(f"{num_neighbors:>9} {k:>6} {full_ms:>9.3f} {inc_ms:>9.3f} {full_ms / inc_ms:>7.1f}x")
+
+    if mode in ('select', 'all'):
+        print(f"{'neighbors':>9} {'2hop':>5} {'density':>7} {'legacy ms':>10} {'select ms':>10} {'speedup':>8} {'step4 -':>7}")
+        for num_neighbors, num_two_hop, density in ((10, 30, 0.2), (30, 100, 0.1), (60, 200, 0.1),
+                                                    (100, 400, 0.05), (200, 800, 0.05)):
+            legacy_ms, new_ms, removed = bench_select(num_neighbors, num_two_hop, density)
+            print(f"{num_neighbors:>9} {num_two_hop:>5} {density:>7} {legacy_ms:>10.3f} {new_ms:>10.3f} "
+                  f"{legacy_ms / new_ms:>7.1f}x {removed:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+'''
+解析层微基准：对比原来的 parse_hello_body / parse_tc_body (bytes 切片 + 格式字符串 + 逐个 inet_ntoa)
+与 msg_view 中的 memoryview 视图 (预编译 struct + unpack_from + 延迟解码，地址直接解为 int)
+
+每种情况构造一个完整的 UDP 包 (包头 + 消息头 + 消息体)，宣告的邻居数从 1 到 200
+  - header : 只解析到固定头部 (重复消息 / 只需要转发时的情况)
+  - full   : 解析并访问全部地址列表
+
+用法: python3 bench_parse.py [重复次数]
+'''
+import sys
+import struct
+import timeit
+
+from constants import *
+from pkt_msg_fmt import create_packet_header, create_message_header, create_link_code
+from hello_msg_body import create_hello_body, parse_hello_body
+from tc_msg_body import create_tc_body, parse_tc_body
+from msg_view import iter_messages
+
+NEIGHBOR_COUNTS = [1, 5, 10, 25, 50, 100, 200]
+
+
+def make_ips(n):
+    return [f"10.{(i >> 16) & 0xFF}.{(i >> 8) & 0xFF}.{i & 0xFF}" for i in range(1, n + 1)]
+
+
+def build_packet(msg_type, body):
+    header = create_message_header(msg_type, NEIGHB_HOLD_TIME, len(body), "10.255.0.1", 255, 0, 1)
+    msg = header + body
+    return create_packet_header(len(msg), 1) + msg
+
+
+def build_hello_packet(n):
+    ips = make_ips(n)
+    half = n // 2
+    groups = [(create_link_code(SYM_LINK, MPR_NEIGH), ips[:half]),
+              (create_link_code(SYM_LINK, SYM_NEIGH), ips[half:])]
+    body = create_hello_body({"htime_seconds": HELLO_INTERVAL, "willingness": WILL_DEFAULT,
+                              "neighbor_groups": [g for g in groups if g[1]]})
+    return build_packet(HELLO_MESSAGE, body)
+
+
+def build_tc_packet(n):
+    return build_packet(TC_MESSAGE, create_tc_body(1, make_ips(n)))
+
+
+# ---- 原实现：与 OLSRNode.process_packet 原来的写法一致 ----
+def legacy_parse(data, full):
+    cursor = 4
+    struct.unpack('!HH', data[:4])
+    while cursor < len(data):
+        if len(data) - cursor < 12: break
+        msg_type, vtime, msg_size, orig_bytes, ttl, hop, msg_seq = \
+            struct.unpack('!BBH4sBBH', data[cursor:cursor+12])
+        body = data[cursor+12:cursor+msg_size]
+        if msg_type == HELLO_MESSAGE:
+            info = parse_hello_body(body)
+            if full:
+                for _, ips in info['neighbor_groups']: len(ips)
+        else:
+            info = parse_tc_body(body)
+            if full:
+                len(info['advertised_neighbors'])
+        cursor += msg_size
+
+
+# ---- 新实现：memoryview 视图 ----
+def view_parse(data, full):
+    for msg in iter_messages(data):
+        msg.orig_ip
+        if msg.msg_type == HELLO_MESSAGE:
+            info = msg.hello()
+            if full:
+                for _, ips in info['neighbor_groups']: len(ips)
+        else:
+            info = msg.tc()
+            if full:
+                len(info['advertised_neighbors'])
+
+
+def bench(func, data, full, number):
+    return min(timeit.repeat(lambda: func(data, full), number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'type':<6} {'neigh':>5} {'mode':<7} {'legacy(us)':>11} {'view(us)':>9} {'speedup':>8}")
+    print("-" * 52)
+    for name, builder in (("HELLO", build_hello_packet), ("TC", build_tc_packet)):
+        for n in NEIGHBOR_COUNTS:
+            data = builder(n)
+            for full in (False, True):
+                t_old = bench(legacy_parse, data, full, number)
+                t_new = bench(view_parse, data, full, number)
+                mode = "full" if full else "header"
+                print(f"{name:<6} {n:>5} {mode:<7} {t_old:>11.2f} {t_new:>9.2f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
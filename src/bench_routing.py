@@ -0,0 +1,134 @@
+'''
+路由后端基准：在 100 ~ 5000 个节点的合成拓扑上对比各个路由计算后端
+
+拓扑：节点随机撒在单位正方形里，距离小于通信半径的两点互连 (双向边，权重 1)，
+平均度数约为 DEGREE；源节点为 0 号节点
+对比的后端 (边先通过 add_edge 全部上报，再计时 update() 从空路由表整体计算一次)：
+- dict+dijkstra : 原来的做法，建 { 节点: [(邻居, 权重)] } 字典 + dijkstra.dijkstra + 逐个回溯下一跳
+- dynamic       : DynamicSPF
+- csr-python    : CSR 数组 + 纯 Python BFS
+- csr-numpy     : CSR 数组 + NumPy 向量化 BFS (需要 NumPy)
+- scipy         : CSR 数组 + scipy.sparse.csgraph (需要 SciPy)
+另外给出 "删一条树边后再 update" 的耗时，对比增量后端和整体重算后端
+所有后端算出的距离必须一致
+
+用法: python3 bench_routing.py [节点数,...]
+'''
+import math
+import random
+import sys
+import time
+
+from dynamic_spf import DynamicSPF
+import csr_routing
+from csr_routing import CSRRouting, bfs_python
+
+DEGREE = 6
+SIZES = (100, 500, 1000, 2000, 5000)
+
+
+def geometric_edges(n, seed=3):
+    rng = random.Random(seed)
+    pts = [(rng.random(), rng.random()) for _ in range(n)]
+    radius = math.sqrt(DEGREE / (math.pi * n))
+    cell = {}
+    for i, (x, y) in enumerate(pts):
+        cell.setdefault((int(x / radius), int(y / radius)), []).append(i)
+    edges = []
+    for i, (x, y) in enumerate(pts):
+        cx, cy = int(x / radius), int(y / radius)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cell.get((cx + dx, cy + dy), ()):
+                    if j != i and (pts[j][0] - x) ** 2 + (pts[j][1] - y) ** 2 < radius * radius:
+                        edges.append((i, j))
+    return edges
+
+
+def dict_dijkstra(edges, source):
+    """原来 compute_full_routing_table 的做法"""
+    from dijkstra import dijkstra
+    graph = {source: []}
+    for u, v in edges:
+        graph.setdefault(u, [])
+        graph.setdefault(v, [])
+        graph[u].append((v, 1.0))
+    dist, parent = dijkstra(graph, source)
+    table = {}
+    for target in dist:
+        if target == source or dist[target] == float('inf'):
+            continue
+        curr, prev = target, None
+        while curr != source and curr is not None:
+            prev, curr = curr, parent[curr]
+        table[target] = {'next_hop': prev, 'distance': dist[target]}
+    return table
+
+
+def make_backends():
+    backends = {'dynamic': lambda: DynamicSPF(0)}
+
+    def csr_python():
+        r = CSRRouting(0, 'csr')
+        r.bfs = bfs_python
+        return r
+    backends['csr-python'] = csr_python
+    if csr_routing.np is not None:
+        backends['csr-numpy'] = lambda: CSRRouting(0, 'csr')
+    if csr_routing.csr_matrix is not None:
+        backends['scipy'] = lambda: CSRRouting(0, 'scipy')
+    return backends
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1].split(',')] if len(sys.argv) > 1 else SIZES
+    backends = make_backends()
+    try:
+        import dijkstra  # noqa: F401
+        have_dijkstra = True
+    except ImportError:
+        have_dijkstra = False
+
+    names = (['dict+dijkstra'] if have_dijkstra else []) + list(backends)
+    print("full: 从空图整体计算一次 (ms)    delta: 删一条树边后 update (ms)")
+    print(f"{'nodes':>6} {'edges':>7} " + " ".join(f"{n + ' full':>18} {'delta':>8}" for n in names))
+
+    for n in sizes:
+        edges = geometric_edges(n)
+        first_hops = {v for u, v in edges if u == 0}
+        cols = []
+        reference = None
+
+        if have_dijkstra:
+            t0 = time.perf_counter()
+            reference = dict_dijkstra(edges, 0)
+            cols.append((time.perf_counter() - t0, None))
+
+        for name, factory in backends.items():
+            engine = factory()
+            for u, v in edges:
+                engine.add_edge(u, v)
+            t0 = time.perf_counter()
+            engine.update()
+            full = time.perf_counter() - t0
+
+            table = {d: e['distance'] for d, e in engine.routing_table.items()}
+            if reference is None:
+                reference = dict(engine.routing_table)
+            assert table == {d: e['distance'] for d, e in reference.items()}, name
+            assert all(e['next_hop'] in first_hops for e in engine.routing_table.values()), name
+
+            # 删掉源节点的一条出边 (一定是树边)，再 update
+            u, v = next((u, v) for u, v in edges if u == 0)
+            t0 = time.perf_counter()
+            engine.remove_edge(u, v)
+            engine.update()
+            delta = time.perf_counter() - t0
+            cols.append((full, delta))
+
+        print(f"{n:>6} {len(edges):>7} " + " ".join(
+            f"{full * 1e3:>18.2f} {('-' if delta is None else f'{delta * 1e3:.2f}'):>8}" for full, delta in cols))
+
+
+if __name__ == "__main__":
+    main()
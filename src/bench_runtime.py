@@ -0,0 +1,139 @@
+'''
+运行时基准：用同一套压测方法对比线程模式和 asyncio 模式的 OLSRNode
+
+做法：
+1. 在本机回环地址上启动被测节点 (指定运行模式)，发包出口替换为只记录时间戳的空函数
+2. 压测端模拟 N 个邻居，按给定速率 (包/秒) 向节点灌入 HELLO (带对称链路和二跳) 和 TC；
+   每个邻居用自己的回环地址 (127.1.x.y) 作为消息源地址，并从绑定在这个地址上的 socket 发出，
+   节点看到的是 N 个不同的发送方，链路 / 邻居 / MPR 状态按 N 个邻居建立
+3. 统计：
+   - 处理吞吐 (包/秒) 和丢包 (内核缓冲区溢出)
+   - 压测期间 HELLO 发送间隔的最大值，看收包处理是否拖慢了 HELLO 发送
+   - 收包批大小 (平均/最大) 和内核统计的丢包数 (见 batch_rx.py)，用来调 SO_RCVBUF
+
+用法: python3 bench_runtime.py [包数] [邻居数] [速率]
+'''
+import socket
+import sys
+import threading
+import time
+
+from constants import *
+from pkt_msg_fmt import create_packet_header, create_message_header, create_link_code
+from hello_msg_body import create_hello_body
+from tc_msg_body import create_tc_body
+from olsr_main import OLSRNode
+
+NODE_IP = "10.99.0.1"
+
+
+def neighbor_addrs(num_neighbors):
+    """模拟邻居的地址：回环网段里各不相同的地址，可以直接绑定"""
+    return [f"127.1.{i // 250}.{i % 250 + 1}" for i in range(num_neighbors)]
+
+
+def build_traffic(num_packets, num_neighbors):
+    """预先生成要灌入的数据包：每个邻居交替发 HELLO 和 TC，返回 [(邻居下标, 数据包), ...]"""
+    neighbors = neighbor_addrs(num_neighbors)
+    packets = []
+    for i in range(num_packets):
+        n = i % num_neighbors
+        me = neighbors[n]
+        seq = i // num_neighbors + 1
+        if (i // num_neighbors) % 2 == 0:
+            two_hop = [f"10.2.{n // 50}.{n % 50 * 4 + k + 1}" for k in range(4)]
+            body = create_hello_body({
+                "htime_seconds": HELLO_INTERVAL, "willingness": WILL_DEFAULT,
+                "neighbor_groups": [(create_link_code(SYM_LINK, SYM_NEIGH), [NODE_IP] + two_hop)],
+            })
+            head = create_message_header(HELLO_MESSAGE, NEIGHB_HOLD_TIME, len(body), me, 1, 0, seq)
+        else:
+            body = create_tc_body(seq, [f"10.3.{n // 25}.{n % 25 * 8 + k + 1}" for k in range(8)])
+            head = create_message_header(TC_MESSAGE, TOP_HOLD_TIME, len(body), me, 255, 0, seq)
+        msg = head + body
+        packets.append((n, create_packet_header(len(msg), i % 65535) + msg))
+    return packets
+
+
+def run_once(runtime, packets, rate, num_neighbors):
+    node = OLSRNode(NODE_IP, port=0)
+    node.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    hello_times = []
+
+    def fake_send(msg_bytes):
+        if msg_bytes[0] == HELLO_MESSAGE:
+            hello_times.append(time.time())
+    node.send_packet = fake_send
+
+    thread = threading.Thread(target=node.start, args=(runtime,), daemon=True)
+    thread.start()
+    time.sleep(0.3)
+
+    senders = []
+    for addr in neighbor_addrs(num_neighbors):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((addr, 0))
+        senders.append(sock)
+    dest = ("127.0.0.1", node.port)
+    start = time.time()
+    burst = max(1, rate // 100)  # 每 10ms 发一批
+    for i in range(0, len(packets), burst):
+        for n, pkt in packets[i:i + burst]:
+            senders[n].sendto(pkt, dest)
+        delay = start + (i + burst) / rate - time.time()
+        if delay > 0:
+            time.sleep(delay)
+    send_done = time.time()
+
+    # 等到处理计数不再增长
+    last, last_change = -1, time.time()
+    while time.time() - last_change < 0.5:
+        if node.rx_packets != last:
+            last, last_change = node.rx_packets, time.time()
+        time.sleep(0.01)
+    elapsed = last_change - start
+    rx = node.receiver.snapshot()
+
+    node.stop()
+    thread.join(timeout=2)
+    for sock in senders:
+        sock.close()
+
+    gaps = [b - a for a, b in zip(hello_times, hello_times[1:]) if a >= start]
+    return {
+        "runtime": runtime,
+        "processed": node.rx_packets,
+        "dropped": len(packets) - node.rx_packets,
+        "send_s": send_done - start,
+        "pps": node.rx_packets / elapsed if elapsed > 0 else 0.0,
+        "max_hello_gap": max(gaps) if gaps else float('nan'),
+        "neighbors": len(node.neighbor_manager.neighbors),
+        "mpr": len(node.neighbor_manager.current_mpr_set),
+        "routes": len(node.routing_manager.routing_table),
+        "mean_batch": rx['mean_batch'],
+        "max_batch": rx['max_batch'],
+        "kernel_drops": rx['kernel_drops'],
+    }
+
+
+def main():
+    num_packets = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_neighbors = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rate = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    packets = build_traffic(num_packets, num_neighbors)
+
+    results = []
+    for runtime in ("thread", "asyncio"):
+        results.append(run_once(runtime, packets, rate, num_neighbors))
+
+    print(f"packets={num_packets} neighbors={num_neighbors} rate={rate}/s")
+    print(f"{'runtime':<8} {'processed':>9} {'dropped':>7} {'pps':>9} {'max_hello_gap':>13} {'neigh':>5} {'mpr':>4} "
+          f"{'routes':>6} {'batch':>6} {'max':>4} {'kdrop':>6}")
+    for r in results:
+        print(f"{r['runtime']:<8} {r['processed']:>9} {r['dropped']:>7} {r['pps']:>9.0f} "
+              f"{r['max_hello_gap']:>13.2f} {r['neighbors']:>5} {r['mpr']:>4} {r['routes']:>6} "
+              f"{r['mean_batch']:>6.1f} {r['max_batch']:>4} {str(r['kernel_drops']):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+'''
+启动时间回归检查
+
+每个 OLSR 节点进程启动时只应加载路由核心，不应加载绘图库 (networkx / matplotlib，见 topo_viz.py)
+或可选的数值后端 (numpy / scipy，见 csr_routing.py)。本脚本在全新的子进程里：
+1. 计时 import olsr_main
+2. 检查 import 之后 sys.modules 里没有上面这些重量级模块
+3. 计时从进程开始到发出第一个 HELLO (包含发送聚合的抖动窗口)
+任一项超出预算就以非零状态退出，可以直接放进 CI
+
+用法: python3 bench_startup.py [重复次数]
+'''
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = 150          # import olsr_main 的预算
+FIRST_HELLO_BUDGET_MS = 500     # 进程开始到第一个 HELLO 的预算
+HEAVY_MODULES = ('networkx', 'matplotlib', 'numpy', 'scipy')
+
+CHILD = r'''
+import json, sys, threading, time
+t0 = time.perf_counter()
+import olsr_main
+t_import = time.perf_counter() - t0
+heavy = [m for m in %r if m in sys.modules]
+
+node = olsr_main.OLSRNode("10.255.0.1", port=0)
+first = threading.Event()
+def fake_send(packet):
+    first.set()
+node._send_raw = fake_send
+node.tx_queue.send_raw = fake_send
+threading.Thread(target=node.start, daemon=True).start()
+first.wait(5)
+t_hello = time.perf_counter() - t0
+print(json.dumps({"import_ms": t_import * 1e3, "first_hello_ms": t_hello * 1e3, "heavy": heavy}))
+''' % (HEAVY_MODULES,)
+
+
+def run_child():
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=here,
+                         capture_output=True, text=True, timeout=30)
+    for line in out.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"子进程没有输出结果: {out.stderr}")
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_child() for _ in range(repeat)]
+
+    import_ms = min(r["import_ms"] for r in results)
+    hello_ms = min(r["first_hello_ms"] for r in results)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+
+    print(f"import olsr_main : {import_ms:7.1f} ms (预算 {IMPORT_BUDGET_MS} ms)")
+    print(f"first HELLO      : {hello_ms:7.1f} ms (预算 {FIRST_HELLO_BUDGET_MS} ms)")
+    print(f"重量级模块       : {', '.join(heavy) if heavy else '无'}")
+
+    failed = []
+    if heavy:
+        failed.append(f"启动时加载了 {heavy}")
+    if import_ms > IMPORT_BUDGET_MS:
+        failed.append("import 超出预算")
+    if hello_ms > FIRST_HELLO_BUDGET_MS:
+        failed.append("第一个 HELLO 超出预算")
+    if failed:
+        print("FAIL: " + "; ".join(failed))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+'''
+视频发送端：串行 (原 test_video_sender 的写法) 与三级流水线 (video_pipeline.py) 的对比
+
+合成的视频帧按目标帧率发送，对比实际发送帧率、帧间隔抖动和最大落后时间：
+- serial   : 同一线程里 读帧 -> 编码 -> 发送 -> 睡到下一帧
+- pipeline : 采集 / 编码池 / 发送 三级流水线，固定质量
+- adaptive : 流水线 + AdaptiveQuality
+有 OpenCV 时用真实的 JPEG 编码，否则用 zlib (同样在压缩时释放 GIL) 模拟编码开销；
+编码耗时随质量 / 分辨率变化，自适应控制的效果才能体现出来
+
+用法: python3 bench_video_pipeline.py [目标帧率] [帧数]
+'''
+import os
+import sys
+import time
+import zlib
+
+from video_pipeline import VideoPipeline, AdaptiveQuality, cv2_encode
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+WIDTH, HEIGHT = 1280, 720
+
+
+def make_frames(n):
+    if cv2 is not None:
+        rng = np.random.default_rng(1)
+        base = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+        return [np.roll(base, i * 7, axis=1) for i in range(n)]
+    base = os.urandom(WIDTH * HEIGHT)
+    return [base[i * 7:] + base[:i * 7] for i in range(n)]
+
+
+def zlib_encode(frame, quality, scale):
+    """没有 OpenCV 时的模拟编码：压缩级别随质量变化，缩放时只压缩对应比例的数据"""
+    level = max(1, min(9, quality // 10))
+    n = int(len(frame) * scale * scale)
+    return zlib.compress(frame[:n], level)
+
+
+def run_serial(frames, fps, encode):
+    interval = 1.0 / fps
+    next_time = time.perf_counter()
+    sent_times = []
+    max_lag = 0.0
+    t0 = time.perf_counter()
+    for frame in frames:
+        encode(frame, 60, 1.0)
+        now = time.perf_counter()
+        if next_time > now:
+            time.sleep(next_time - now)
+            now = time.perf_counter()
+        else:
+            max_lag = max(max_lag, now - next_time)
+            if now - next_time > interval:
+                next_time = now
+        next_time += interval
+        sent_times.append(now)
+    elapsed = time.perf_counter() - t0
+    intervals = [b - a for a, b in zip(sent_times, sent_times[1:])]
+    mean = sum(intervals) / len(intervals)
+    jitter = (sum((x - mean) ** 2 for x in intervals) / len(intervals)) ** 0.5
+    return {'fps': len(frames) / elapsed, 'interval_jitter_ms': jitter * 1e3,
+            'max_lag_ms': max_lag * 1e3, 'quality': 60, 'scale': 1.0}
+
+
+def run_pipeline(frames, fps, encode, adaptive):
+    it = iter(frames)
+    pipeline = VideoPipeline(lambda: next(it, None), lambda data: None, fps, encode=encode,
+                             adaptive=AdaptiveQuality() if adaptive else None)
+    return pipeline.run()
+
+
+def main():
+    fps = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    encode = cv2_encode if cv2 is not None else zlib_encode
+    frames = make_frames(n)
+
+    t0 = time.perf_counter()
+    encode(frames[0], 60, 1.0)
+    t_enc = time.perf_counter() - t0
+    print(f"编码器: {'OpenCV JPEG' if cv2 is not None else 'zlib (模拟)'}, 单帧编码 {t_enc * 1e3:.1f} ms, "
+          f"目标 {fps:.0f} fps (间隔 {1e3 / fps:.1f} ms), {n} 帧, CPU {os.cpu_count()}")
+    print(f"{'mode':>9} {'fps':>7} {'jitter ms':>10} {'max lag ms':>11} {'quality':>8} {'scale':>6}")
+    for name, run in (("serial", lambda: run_serial(frames, fps, encode)),
+                      ("pipeline", lambda: run_pipeline(frames, fps, encode, False)),
+                      ("adaptive", lambda: run_pipeline(frames, fps, encode, True))):
+        s = run()
+        print(f"{name:>9} {s['fps']:>7.1f} {s['interval_jitter_ms']:>10.2f} {s['max_lag_ms']:>11.1f} "
+              f"{s['quality']:>8} {s['scale']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,9 +19,77 @@ HNA_INTERVAL     = TC_INTERVAL  # 等同于 TC_INTERVAL (5秒)
 NEIGHB_HOLD_TIME = 3 * REFRESH_INTERVAL # 邻居记录的有效期
 TOP_HOLD_TIME    = 3 * TC_INTERVAL      # 拓扑信息的有效期
 DUP_HOLD_TIME    = 30                   # 重复消息记录（防止广播风暴）的保持时间
+DUP_WINDOW_SIZE  = 4096                 # 每个源节点的重复检测滑动窗口宽度（序列号个数）
+DUP_TIME_BUCKETS = 4                    # 重复检测位图按收到时间分成几段，整段超过 DUP_HOLD_TIME 后不再算重复
 MID_HOLD_TIME    = 3 * MID_INTERVAL     # MID记录的有效期
 HNA_HOLD_TIME    = 3 * HNA_INTERVAL     # HNA记录的有效期
 
+# 重算调度 (Recompute Scheduling):
+RECOMPUTE_WINDOW = 0.5                  # MPR/路由重算的合并窗口，窗口内最多重算一次
+
+# 收包批处理 (Batched Receive):
+RX_BATCH_BUDGET  = 64                   # 一批最多排空的数据报个数
+RX_BUFFER_SIZE   = 2048                 # 单个数据报的接收缓冲区大小
+
+# 发包聚合 (Send Aggregation):
+TX_AGGREGATION_WINDOW = 0.1             # 消息入队后最多等待的抖动时间 (秒)，0 表示不聚合
+TX_MTU           = 1500                 # 链路 MTU
+UDP_IP_OVERHEAD  = 28                   # IPv4 头 (20) + UDP 头 (8)
+
+# 数据面 (Data Plane):
+DATA_PORT_OFFSET = 1                    # 数据端口 = 控制端口 + 偏移，数据和控制流量分开
+DATA_TTL         = 64                   # 数据包初始 TTL
+DATA_BUFFER_SIZE = 65536                # 数据面预分配的收发缓冲区大小
+
+# 出口调度 (Egress Scheduling):
+EGRESS_QUEUE_LIMIT  = 256               # 每个下一跳的数据队列最多排队的包数
+EGRESS_POLICY       = 'drop-tail'       # 队满时的丢包策略：'drop-tail' 或 'head-drop'
+EGRESS_RETRY        = 0.002             # socket 发送缓冲区满时，隔多久再试 (秒)
+EGRESS_DRAIN_BUDGET = 64                # 一次 drain 最多发出的包数，之后让出锁给控制包
+
+# 视频流 (Video Streaming):
+VIDEO_CHUNK_SIZE     = 1200             # 每个分片的视频数据长度 (不含分片头)
+VIDEO_RING_SLOTS     = 8                # 接收端每个流的帧槽个数 (同时在途的帧数)
+VIDEO_MAX_FRAME_SIZE = 512 * 1024       # 单帧最大字节数，帧槽按此预分配
+VIDEO_FRAME_TIMEOUT  = 0.5              # 一帧从第一个分片到达起，多久收不齐就放弃 (秒)
+FEC_GROUP_SIZE       = 8                # FEC 每组的数据分片数 k
+VIDEO_ENCODE_WORKERS = 2                # 发送端编码池的并行度
+VIDEO_PIPELINE_DEPTH = 4                # 采集 -> 发送 之间最多在途 (编码中或待发送) 的帧数
+VIDEO_JPEG_QUALITY   = 60               # 初始 JPEG 质量
+VIDEO_MIN_QUALITY    = 30               # 自适应控制的质量下限
+VIDEO_MAX_QUALITY    = 85               # 自适应控制的质量上限
+VIDEO_MIN_SCALE      = 0.5              # 质量到下限后，分辨率最多缩小到的比例
+
+# 文件传输 (File Transfer):
+FILE_CHUNK_SIZE        = 1400           # 每个分片的数据长度，加上头部不超过以太网 MTU
+FILE_INITIAL_RATE      = 2_000_000      # 初始发送速率 (字节/秒)
+FILE_MIN_RATE          = 64 * 1024      # 速率下限
+FILE_MAX_RATE          = 500_000_000    # 速率上限
+FILE_FEEDBACK_INTERVAL = 0.02           # 接收端反馈 (丢包率 + NACK) 的周期 (秒)
+FILE_LOSS_LOW          = 0.005          # 超出基线的丢包率低于此值时加速
+FILE_LOSS_HIGH         = 0.02           # 超出基线的丢包率高于此值时减速
+
+# 日志 (Logging):
+LOG_LEVEL            = 'info'           # 默认日志级别，可用环境变量 OLSR_LOG 覆盖 (例如 "info,mpr=debug")
+LOG_RATE_LIMIT       = 10.0             # 同一条日志 (同一模块 + 同一模板) 每秒最多输出的条数
+LOG_RATE_BURST       = 20               # 同一条日志允许的突发条数
+LOG_QUEUE_SIZE       = 10000            # 后台写日志队列的长度，满了直接丢弃，不阻塞协议线程
+
+# 运行时统计 (Metrics):
+METRICS_BUCKETS      = 24               # 延迟直方图的桶数：第 i 个桶上界 2^i 微秒，最后一个桶约 8 秒以上
+
+# 内核路由安装 (Route Installation):
+ROUTE_TABLE          = 254              # 写入的内核路由表 (254 = main)，也可以用单独的表配合 ip rule
+ROUTE_PROTO          = 100              # 路由的 protocol 字段，用来识别本协议装的路由 (重启后清理残留)
+ROUTE_METRIC         = 20               # 路由的 metric (固定值，跳数变化不改内核路由)
+ROUTE_BATCH_BYTES    = 64 * 1024        # 一次 netlink sendmsg 最多携带的字节数
+ROUTE_RETRY_INTERVAL = 2.0              # 内核拒绝的路由 (例如接口还没 up) 隔多久重试一次 (秒)
+
+# 仿真 (Simulation):
+SIM_LINK_DELAY       = 0.002            # 虚拟信道的默认单跳传播时延 (秒)
+SIM_LINK_JITTER      = 0.001            # 单跳时延上的随机抖动 (秒)
+SIM_MAX_DATAGRAM     = 2048             # 仿真节点数据面缓冲区大小 (上千个节点时省内存)
+
 # msg_type 
 HELLO_MESSAGE = 1
 TC_MESSAGE    = 2
@@ -0,0 +1,259 @@
+'''
+本文件实现基于 CSR 邻接数组的路由后端，可以替代 DynamicSPF
+
+dijkstra.dijkstra 跑在 { 节点: [(邻居, 权重), ...] } 这样的 Python 元组列表上，
+每次都要重建整张字典。这里的做法：
+1. 各个管理器照常通过 add_edge / remove_edge 上报边的增删 (接口与 DynamicSPF 相同，带引用计数)
+2. update() 时把节点编成稠密下标，边表压成 CSR 数组 (indptr / indices)
+3. 当前所有边权都是 1.0，所以最短路就是 BFS：
+   - 'csr'   : NumPy 按层向量化 BFS，一层的所有出边一次 gather，下一跳随层传播；没有 NumPy 时退回纯 Python BFS
+   - 'scipy' : scipy.sparse.csgraph.shortest_path (unweighted) 求距离和前驱，再按距离顺序推出下一跳
+4. 输出和 DynamicSPF 一样的 { dest: {'next_hop', 'distance'} }，原地改写 routing_table 并返回变化的目的节点
+
+注意：等价路径 (距离相同的多条最短路) 之间，各后端选出的下一跳可能不同，距离一定相同
+'''
+from itertools import chain
+
+from olsr_log import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import shortest_path
+except ImportError:
+    csr_matrix = None
+
+log = get_logger('routing')
+
+
+class CSRGraph:
+    """
+    稠密下标上的 CSR 邻接数组
+    节点 u 的出边终点是 indices[indptr[u]:indptr[u + 1]]，source 是源节点的下标
+    有 NumPy 时用 unique / argsort 一次建好 (要求节点是 int 地址)，否则用纯 Python 计数排序
+    """
+    def __init__(self, edges, source):
+        if np is not None:
+            self._build_numpy(edges, source)
+        else:
+            self._build_python(edges, source)
+
+    def _build_numpy(self, edges, source):
+        m = len(edges)
+        flat = np.fromiter(chain.from_iterable(edges), dtype=np.int64, count=2 * m)
+        nodes, inverse = np.unique(np.append(flat, source), return_inverse=True)
+        src = inverse[:-1:2]
+        dst = inverse[1:-1:2]
+        order = np.argsort(src, kind='stable')
+        self.nodes = nodes.tolist()
+        self.source = int(inverse[-1])
+        self.indices = dst[order]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=len(nodes)))))
+
+    def _build_python(self, edges, source):
+        index = {source: 0}
+        nodes = [source]
+        pairs = []
+        for u, v in edges:
+            iu = index.get(u)
+            if iu is None:
+                iu = index[u] = len(nodes)
+                nodes.append(u)
+            iv = index.get(v)
+            if iv is None:
+                iv = index[v] = len(nodes)
+                nodes.append(v)
+            pairs.append((iu, iv))
+        n = len(nodes)
+
+        counts = [0] * (n + 1)
+        for iu, _ in pairs:
+            counts[iu + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+
+        indices = [0] * len(pairs)
+        fill = counts[:-1]
+        for iu, iv in pairs:
+            indices[fill[iu]] = iv
+            fill[iu] += 1
+        self.nodes = nodes
+        self.source = 0
+        self.indptr = counts
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def bfs_python(graph):
+    """纯 Python BFS，返回 (dist, next_hop) 两个按下标排列的列表，不可达为 -1"""
+    n = len(graph)
+    indptr, indices = graph.indptr, graph.indices
+    if not isinstance(indptr, list):
+        indptr, indices = indptr.tolist(), indices.tolist()
+    src = graph.source
+    dist = [-1] * n
+    nh = [-1] * n
+    dist[src] = 0
+    frontier = [src]
+    level = 0
+    while frontier:
+        level += 1
+        nxt = []
+        for u in frontier:
+            hop = nh[u]
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if dist[v] < 0:
+                    dist[v] = level
+                    nh[v] = v if u == src else hop
+                    nxt.append(v)
+        frontier = nxt
+    return dist, nh
+
+
+def bfs_numpy(graph):
+    """NumPy 按层向量化 BFS，返回 (dist, next_hop) 两个数组，不可达为 -1"""
+    n = len(graph)
+    indptr = np.asarray(graph.indptr, dtype=np.int64)
+    indices = np.asarray(graph.indices, dtype=np.int64)
+    src = graph.source
+    dist = np.full(n, -1, dtype=np.int64)
+    nh = np.full(n, -1, dtype=np.int64)
+    dist[src] = 0
+
+    # 第一层：源节点的出边，下一跳就是它们自己
+    first = np.unique(indices[indptr[src]:indptr[src + 1]])
+    first = first[first != src]
+    dist[first] = 1
+    nh[first] = first
+    frontier = first
+    level = 1
+
+    while frontier.size:
+        level += 1
+        starts = indptr[frontier]
+        lengths = indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            break
+        # 把这一层所有节点的出边一次 gather 出来
+        parents = np.repeat(frontier, lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        targets = indices[offsets]
+
+        fresh = dist[targets] < 0
+        targets = targets[fresh]
+        parents = parents[fresh]
+        # 同一个节点被多个父节点发现时取第一个
+        new_nodes, first_pos = np.unique(targets, return_index=True)
+        dist[new_nodes] = level
+        nh[new_nodes] = nh[parents[first_pos]]
+        frontier = new_nodes
+
+    return dist, nh
+
+
+def bfs_scipy(graph):
+    """scipy.sparse.csgraph 求距离和前驱，再按距离顺序推出下一跳"""
+    n = len(graph)
+    src = graph.source
+    data = np.ones(len(graph.indices), dtype=np.float64)
+    matrix = csr_matrix((data, np.asarray(graph.indices), np.asarray(graph.indptr)), shape=(n, n))
+    dist_f, pred = shortest_path(matrix, directed=True, unweighted=True,
+                                 indices=src, return_predecessors=True)
+
+    reachable = np.isfinite(dist_f)
+    dist = np.where(reachable, dist_f, -1).astype(np.int64)
+    nh = np.full(n, -1, dtype=np.int64)
+
+    order = np.argsort(dist_f, kind='stable')
+    order = order[reachable[order]][1:]   # 去掉源节点自己
+    if order.size:
+        levels = dist[order]
+        # 按层处理：一层内的节点只依赖上一层的下一跳
+        bounds = np.flatnonzero(np.diff(levels)) + 1
+        for layer in np.split(order, bounds):
+            parents = pred[layer]
+            nh[layer] = np.where(parents == src, layer, nh[parents])
+    return dist, nh
+
+
+class CSRRouting:
+    """
+    与 DynamicSPF 接口相同的路由后端：边增量照常上报，update() 时在 CSR 数组上整体重算
+    :param backend: 'csr' (NumPy 向量化 BFS，没有 NumPy 退回纯 Python) 或 'scipy'
+    """
+    def __init__(self, source, backend='csr'):
+        self.source = source
+        if backend == 'scipy' and csr_matrix is None:
+            log.warning("未安装 scipy，路由后端退回 csr")
+            backend = 'csr'
+        self.backend = backend
+        if backend == 'scipy':
+            self.bfs = bfs_scipy
+        else:
+            self.bfs = bfs_numpy if np is not None else bfs_python
+
+        self.edge_refs = {}     # { (u, v): count }，同一条边可能由多个来源宣告
+        self.routing_table = {}
+        self._dirty = False
+
+    def add_edge(self, u, v, weight=1.0):
+        key = (u, v)
+        count = self.edge_refs.get(key, 0)
+        self.edge_refs[key] = count + 1
+        if not count:
+            self._dirty = True
+
+    def remove_edge(self, u, v):
+        key = (u, v)
+        count = self.edge_refs.get(key, 0)
+        if count == 0:
+            return
+        if count > 1:
+            self.edge_refs[key] = count - 1
+            return
+        del self.edge_refs[key]
+        self._dirty = True
+
+    def has_pending(self):
+        return self._dirty
+
+    def compute(self):
+        """在当前边集上重算，返回一张新的路由表"""
+        graph = CSRGraph(self.edge_refs.keys(), self.source)
+
+        dist, nh = self.bfs(graph)
+        if not isinstance(dist, list):
+            dist, nh = dist.tolist(), nh.tolist()
+
+        names = graph.nodes
+        return {
+            names[i]: {'next_hop': names[nh[i]], 'distance': float(d)}
+            for i, d in enumerate(dist) if d > 0
+        }
+
+    def update(self):
+        """重算并原地改写 routing_table，返回变化的目的节点集合"""
+        if not self._dirty:
+            return set()
+        self._dirty = False
+
+        new_table = self.compute()
+        table = self.routing_table
+        changed = set()
+        for dest in list(table):
+            if dest not in new_table:
+                del table[dest]
+                changed.add(dest)
+        for dest, entry in new_table.items():
+            if table.get(dest) != entry:
+                table[dest] = entry
+                changed.add(dest)
+        return changed
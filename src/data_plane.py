@@ -0,0 +1,242 @@
+'''
+本文件实现 DATA_MESSAGE (Type 5) 的数据面转发引擎
+
+原来 process_packet 把数据消息交给 process_data_message，而 forward_unicast_data 只打印下一跳，
+从不真正发包，覆盖网络没法承载视频流。现在：
+1. 数据走单独的 socket / 端口 (控制端口 + DATA_PORT_OFFSET)，大流量的视频不会挤占 HELLO / TC 的接收
+2. 收包用 recvfrom_into 直接读进预分配的缓冲区，转发时原地改写 TTL / Hop 两个字节，
+   再把同一块缓冲区单播 sendto 给 routing_table[dest]['next_hop']，整个转发路径不复制数据
+3. 每个目的节点的下一跳 socket 地址缓存在 nh_cache 中，路由表有变化时只清掉变化的目的节点
+4. 设置了 egress (出口调度器，见 egress.py) 时，发出的包交给它排队 / 限速，控制报文优先；
+   只有真正排队时才会复制缓冲区
+5. 统计收发 / 投递 / 转发的包数和按原因分类的丢包数 (只增不减的计数，速率由查询方自己按两次快照计算，
+   例如 Prometheus 的 rate())
+
+数据包格式：Packet Header(4) + Message Header(12, Type=DATA_MESSAGE) + 目的地址(4) + 负载
+'''
+import logging
+import socket
+import struct
+
+from constants import DATA_MESSAGE, DATA_TTL, DATA_BUFFER_SIZE, RX_BATCH_BUDGET
+from msg_view import PKT_HEADER, MSG_HEADER, MSG_TTL_OFFSET, MSG_HOP_OFFSET
+from node_addr import int_to_ip
+from olsr_log import get_logger, Addr
+
+ADDR = struct.Struct('!I')  # 数据消息体开头的目的地址
+
+MSG_OFFSET = PKT_HEADER.size                    # 消息头在包中的偏移
+TTL_OFFSET = MSG_OFFSET + MSG_TTL_OFFSET
+HOP_OFFSET = MSG_OFFSET + MSG_HOP_OFFSET
+DEST_OFFSET = MSG_OFFSET + MSG_HEADER.size      # 目的地址的偏移
+PAYLOAD_OFFSET = DEST_OFFSET + ADDR.size        # 负载的偏移
+
+log = get_logger('data')
+
+DROP_REASONS = ('no_route', 'ttl', 'malformed', 'too_big', 'send_error', 'egress')
+
+
+class DataPlane:
+    def __init__(self, my_ip, sock, routing_table, peer_port, buffer_size=DATA_BUFFER_SIZE):
+        """
+        :param sock: 已绑定的数据 socket；仿真中为 None，收包由外部调用 handle，发包必须经出口调度器
+        :param routing_table: RoutingManager.routing_table (同一个字典，原地更新)
+        :param peer_port: 其他节点的数据端口
+        """
+        self.my_ip = my_ip
+        self.sock = sock
+        self.sendto = sock.sendto if sock is not None else None
+        self.routing_table = routing_table
+        self.peer_port = peer_port
+
+        # 预分配的收 / 发缓冲区
+        self.rx_buf = bytearray(buffer_size)
+        self.rx_view = memoryview(self.rx_buf)
+        self.tx_buf = bytearray(buffer_size)
+        self.tx_view = memoryview(self.tx_buf)
+        self.ctl_buf = bytearray(buffer_size)   # 控制端口上收到的数据消息 (handle_message) 专用
+        self.ctl_view = memoryview(self.ctl_buf)
+        self.max_payload = min(buffer_size, 0xFFFF) - PAYLOAD_OFFSET
+
+        # 下一跳缓存: { dest: (next_hop_ip_str, port) }
+        # 控制线程清缓存、数据线程填缓存，用代数防止把清理前查到的旧下一跳写回去 (不加锁，见 next_hop_addr)
+        self.nh_cache = {}
+        self._generation = 0
+
+        # 出口调度器 (EgressScheduler)，为 None 时直接 sendto
+        self.egress = None
+
+        # 本节点是目的地时的投递回调 deliver(originator_ip, payload_bytes)
+        self.on_deliver = None
+
+        self.pkt_seq = 0
+        self.msg_seq = 0
+
+        # --- 统计计数 ---
+        self.rx_packets = 0     # 收到的数据包
+        self.delivered = 0      # 投递给本节点的
+        self.forwarded = 0      # 转发出去的
+        self.sent = 0           # 本节点发起的
+        self.drops = dict.fromkeys(DROP_REASONS, 0)
+
+    # ==========================
+    # 下一跳缓存
+    # ==========================
+    def next_hop_addr(self, dest_ip):
+        addr = self.nh_cache.get(dest_ip)
+        if addr is None:
+            generation = self._generation
+            route = self.routing_table.get(dest_ip)
+            if route is None:
+                return None
+            addr = (int_to_ip(route['next_hop']), self.peer_port)
+            if generation == self._generation:
+                self.nh_cache[dest_ip] = addr
+                # 检查和写入之间控制线程可能刚好 invalidate 过 (代数先加一再清缓存)，
+                # 写入后再看一次代数，变了就撤掉，旧下一跳不会留在缓存里
+                if generation != self._generation:
+                    self.nh_cache.pop(dest_ip, None)
+        return addr
+
+    def invalidate(self, dests=None):
+        """路由变化时清掉对应目的节点的缓存，dests 为 None 时全部清空"""
+        self._generation += 1
+        if dests is None:
+            self.nh_cache.clear()
+            return
+        for dest in dests:
+            self.nh_cache.pop(dest, None)
+
+    # ==========================
+    # 发送
+    # ==========================
+    def send(self, dest_ip, payload, ttl=DATA_TTL):
+        """本节点发起一个数据包，在预分配的发送缓冲区里组包 (同一时刻只能有一个发送线程)"""
+        n = len(payload)
+        if n > self.max_payload:
+            self.drops['too_big'] += 1
+            return False
+        if dest_ip == self.my_ip:
+            self._deliver(self.my_ip, bytes(payload))
+            return True
+
+        addr = self.next_hop_addr(dest_ip)
+        if addr is None:
+            self.drops['no_route'] += 1
+            return False
+
+        total = PAYLOAD_OFFSET + n
+        self.pkt_seq = (self.pkt_seq + 1) & 0xFFFF
+        self.msg_seq = (self.msg_seq + 1) & 0xFFFF
+        buf = self.tx_buf
+        PKT_HEADER.pack_into(buf, 0, total, self.pkt_seq)
+        MSG_HEADER.pack_into(buf, MSG_OFFSET, DATA_MESSAGE, 0, total - MSG_OFFSET,
+                             self.my_ip, ttl, 0, self.msg_seq)
+        ADDR.pack_into(buf, DEST_OFFSET, dest_ip)
+        buf[PAYLOAD_OFFSET:total] = payload
+
+        if self._sendto(self.tx_view[:total], addr):
+            self.sent += 1
+            return True
+        return False
+
+    def _sendto(self, view, addr):
+        if self.egress is not None:
+            if self.egress.send_data(view, addr):
+                return True
+            self.drops['egress'] += 1  # 队满被丢弃或发送出错，出口调度器另有细分统计
+            return False
+        try:
+            self.sendto(view, addr)
+            return True
+        except OSError:
+            self.drops['send_error'] += 1
+            return False
+
+    # ==========================
+    # 接收与转发
+    # ==========================
+    def receive_once(self):
+        """阻塞接收一个数据包并处理 (线程模式)"""
+        n, _ = self.sock.recvfrom_into(self.rx_buf)
+        if n:
+            self.handle(self.rx_view, n)
+
+    def drain(self, budget=RX_BATCH_BUDGET):
+        """非阻塞地处理 socket 中已到达的数据包 (asyncio 模式的可读回调)"""
+        for _ in range(budget):
+            try:
+                n, _ = self.sock.recvfrom_into(self.rx_buf, 0, socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return
+            if n:
+                self.handle(self.rx_view, n)
+
+    def handle(self, view, n):
+        """
+        处理缓冲区 view[:n] 中的一个数据包：发给我的就投递，否则改写 TTL / Hop 后原地转发
+        view 必须是可写的 (预分配的接收缓冲区)
+        """
+        self.rx_packets += 1
+        if n < PAYLOAD_OFFSET:
+            self.drops['malformed'] += 1
+            return
+        msg_type, _, msg_size, orig_ip, ttl, hop, _ = MSG_HEADER.unpack_from(view, MSG_OFFSET)
+        if msg_type != DATA_MESSAGE or MSG_OFFSET + msg_size > n or msg_size < PAYLOAD_OFFSET - MSG_OFFSET:
+            self.drops['malformed'] += 1
+            return
+        end = MSG_OFFSET + msg_size
+        dest_ip, = ADDR.unpack_from(view, DEST_OFFSET)
+
+        # 1. 是发给我的吗？
+        if dest_ip == self.my_ip:
+            self._deliver(orig_ip, bytes(view[PAYLOAD_OFFSET:end]))
+            return
+
+        # 2. 单播转发：TTL 用完就丢
+        if ttl <= 1:
+            self.drops['ttl'] += 1
+            return
+        addr = self.next_hop_addr(dest_ip)
+        if addr is None:
+            self.drops['no_route'] += 1
+            return
+
+        view[TTL_OFFSET] = ttl - 1
+        view[HOP_OFFSET] = (hop + 1) & 0xFF
+        if self._sendto(view[:end], addr):
+            self.forwarded += 1
+
+    def handle_message(self, raw_msg):
+        """
+        控制端口上收到的 DATA_MESSAGE (兼容旧的发送方式)：
+        复制到专用缓冲区、补一个包头后走同样的处理流程
+        """
+        n = PKT_HEADER.size + len(raw_msg)
+        if n > len(self.ctl_buf):
+            self.drops['too_big'] += 1
+            return
+        PKT_HEADER.pack_into(self.ctl_buf, 0, n, 0)
+        self.ctl_buf[PKT_HEADER.size:n] = raw_msg
+        self.handle(self.ctl_view, n)
+
+    def _deliver(self, orig_ip, payload):
+        self.delivered += 1
+        if self.on_deliver is not None:
+            self.on_deliver(orig_ip, payload)
+        elif log.isEnabledFor(logging.DEBUG):
+            log.debug("收到来自 %s 的数据, 长度 %d", Addr(orig_ip), len(payload))
+
+    # ==========================
+    # 统计
+    # ==========================
+    def stats(self):
+        """累计计数 (不修改任何状态，多个查询方互不影响)"""
+        return {
+            'rx_packets': self.rx_packets,
+            'delivered': self.delivered,
+            'forwarded': self.forwarded,
+            'sent': self.sent,
+            'drops': dict(self.drops),
+            'nh_cache': len(self.nh_cache),
+        }
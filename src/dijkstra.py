@@ -1,7 +1,5 @@
 import heapq #导入堆排序包，用于实现优先队列
 from typing import Dict, List, Tuple, Any #导入提示变量类型的包，主要还是为了方便阅读代码
-import networkx as nx
-import matplotlib.pyplot as plt
 INF = float('inf')
 def dijkstra(graph: Dict[Any, List[Tuple[Any, float]]], source: Any):  #创建dijkstra算法求解函数，输入为图和源节点；其中图的表示方法为邻接表
     dist = {node: INF for node in graph} #利用字典推导式的方法初始化到各个节点的距离字典值权重为无穷大
@@ -30,24 +28,10 @@ def reconstruct_path(parent: Dict[Any, Any], source: Any, target: Any) -> List[A
     path.reverse() #调转列表
     return path
 def draw_graph(graph, path=None): #绘制图的函数，输入为图和路径
-    G = nx.DiGraph()
-    plt.figure(figsize=(10, 8))
-    plt.title("Graph with Shortest Path Highlighted")
-    # Add edges with weights
-    for u in graph:
-        for v, w in graph[u]:
-            G.add_edge(u, v, weight=w) #遍历邻接表，添加有向边和权重
-    pos = nx.circular_layout(G, center=(0,0))  # layout for positioning 这里使用默认使用spring layout布局（seed=42），也可以使用circular_layout(环形，节点少的时候效果不错)、shell_layout、kamada_kawai_layout、Spectral Layout等布局
-    # Draw nodes and edges
-    nx.draw(G, pos, with_labels=True, node_color='skyblue', node_size=1500, font_size=12, arrowsize=20)
-    # Draw edge weights
-    edge_labels = nx.get_edge_attributes(G, 'weight')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='black')
-    # Highlight shortest path
-    if path and len(path) > 1:
-        path_edges = list(zip(path, path[1:]))
-        nx.draw_networkx_edges(G, pos, edgelist=path_edges, edge_color='red', width=2.5)
-    plt.show()
+    # networkx / matplotlib 只有画图时才需要，已移到可选的可视化工具 topo_viz.py 中按需加载，
+    # 路由核心 import 本模块时不再加载这些绘图库
+    from topo_viz import draw_graph as _draw_graph
+    _draw_graph(graph, path)
 # if __name__ == "__main__":
 #     graph = {
 #         'uav1': [('uav2', 2), ('uav3', 5)],
@@ -0,0 +1,193 @@
+'''
+本文件实现一个增量式（动态）最短路径引擎，用来替代每次收到 HELLO/TC 都全量重建图 + 跑 dijkstra 的做法
+
+思路（参考 Ramalingam-Reps 动态最短路）：
+1. 图和最短路径树 (dist / parent / children) 在两次计算之间一直保留
+2. 各个管理器 (NeighborManager / TopologyManager) 只上报边的增删增量 add_edge / remove_edge
+3. update() 时只修复受影响的部分:
+   - 删除的是树边 u->v  =>  以 v 为根的整棵子树失效，重新从子树外的前驱节点挂回去
+   - 新增的边 u->v 能让 v 变短  =>  从 v 开始向外做 Dijkstra 式松弛
+4. 下一跳 next_hop 作为最短路径树的副产品直接维护：
+   父节点是自己 -> 下一跳就是该节点本身；否则继承父节点的下一跳，不再逐个目的地回溯 parent 链
+'''
+import heapq
+
+INF = float('inf')
+
+
+class DynamicSPF:
+    def __init__(self, source):
+        self.source = source
+
+        # 图：正向/反向邻接表 { u: { v: weight } }
+        self.succ = {source: {}}
+        self.pred = {source: {}}
+        # 同一条边可能由多个来源宣告（二跳表和拓扑表都可能有 n->t），用引用计数保证只删最后一次
+        self.edge_refs = {}  # { (u, v): count }
+
+        # 最短路径树
+        self.dist = {source: 0}
+        self.parent = {source: None}
+        self.children = {source: set()}
+        self.next_hop = {}
+
+        # 路由表: { dest: {'next_hop': ip, 'distance': n} }，原地增量更新
+        self.routing_table = {}
+
+        # 自上次 update() 以来的边增量
+        self._added = set()
+        self._removed = set()
+
+    # ==========================
+    # 边增量接口 (由各个管理器调用)
+    # ==========================
+    def add_edge(self, u, v, weight=1.0):
+        key = (u, v)
+        count = self.edge_refs.get(key, 0)
+        self.edge_refs[key] = count + 1
+        if count:
+            return  # 边已经存在，只增加引用计数
+
+        self.succ.setdefault(u, {})[v] = weight
+        self.pred.setdefault(v, {})[u] = weight
+        self._added.add(key)
+        self._removed.discard(key)
+
+    def remove_edge(self, u, v):
+        key = (u, v)
+        count = self.edge_refs.get(key, 0)
+        if count == 0:
+            return
+        if count > 1:
+            self.edge_refs[key] = count - 1
+            return
+
+        del self.edge_refs[key]
+        del self.succ[u][v]
+        del self.pred[v][u]
+        self._removed.add(key)
+        self._added.discard(key)
+
+    def has_pending(self):
+        """是否有尚未处理的边增量"""
+        return bool(self._added or self._removed)
+
+    # ==========================
+    # 增量修复
+    # ==========================
+    def update(self):
+        """
+        处理累积的边增量，修复最短路径树和路由表
+        :return: 集合, 路由表中发生变化 (新增/删除/下一跳或距离变化) 的目的节点
+        """
+        if not self._added and not self._removed:
+            return set()
+
+        dist = self.dist
+        parent = self.parent
+        touched = set()
+        heap = []
+
+        # --- 1. 删除的树边：整棵子树失效 ---
+        affected = set()
+        for (u, v) in self._removed:
+            if parent.get(v) != u:
+                continue  # 不是树边，删掉不影响最短路径
+            self._set_parent(v, None)
+            stack = [v]
+            while stack:
+                x = stack.pop()
+                affected.add(x)
+                dist[x] = INF
+                for c in self.children.get(x, ()):
+                    parent[c] = None
+                    stack.append(c)
+                self.children[x] = set()
+
+        # 失效节点先从子树外的前驱节点取一个候选距离
+        for x in affected:
+            best, best_p = INF, None
+            for p, w in self.pred.get(x, {}).items():
+                nd = dist.get(p, INF) + w
+                if nd < best:
+                    best, best_p = nd, p
+            if best_p is not None:
+                dist[x] = best
+                self._set_parent(x, best_p)
+                heapq.heappush(heap, (best, x))
+        touched |= affected
+
+        # --- 2. 新增的边：能让终点变短就松弛 ---
+        for (u, v) in self._added:
+            w = self.succ.get(u, {}).get(v)
+            if w is None:
+                continue
+            nd = dist.get(u, INF) + w
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                self._set_parent(v, u)
+                heapq.heappush(heap, (nd, v))
+
+        self._added.clear()
+        self._removed.clear()
+
+        # --- 3. 从种子出发做 Dijkstra 式传播 ---
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d != dist.get(x):
+                continue  # 过期的堆项
+            self._refresh_next_hop(x, touched)
+            for v, w in self.succ.get(x, {}).items():
+                nd = d + w
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    self._set_parent(v, x)
+                    heapq.heappush(heap, (nd, v))
+
+        # --- 4. 只改写路由表里变化的条目 ---
+        changed = set()
+        for x in touched:
+            if x == self.source:
+                continue
+            d = dist.get(x, INF)
+            if d == INF:
+                self.next_hop.pop(x, None)
+                if self.routing_table.pop(x, None) is not None:
+                    changed.add(x)
+                continue
+            entry = {'next_hop': self.next_hop[x], 'distance': d}
+            if self.routing_table.get(x) != entry:
+                self.routing_table[x] = entry
+                changed.add(x)
+        return changed
+
+    def _set_parent(self, x, p):
+        """修改树边时同步维护 children"""
+        old = self.parent.get(x)
+        if old is not None:
+            self.children[old].discard(x)
+        self.parent[x] = p
+        if p is not None:
+            self.children.setdefault(p, set()).add(x)
+
+    def _refresh_next_hop(self, x, touched):
+        """
+        根据父节点确定 x 的下一跳；若发生变化，向下传播给仍挂在 x 下面的子孙
+        """
+        p = self.parent.get(x)
+        if p is None:
+            return
+        nh = x if p == self.source else self.next_hop.get(p)
+        touched.add(x)
+        if self.next_hop.get(x) == nh:
+            return
+        self.next_hop[x] = nh
+
+        stack = list(self.children.get(x, ()))
+        while stack:
+            c = stack.pop()
+            if self.next_hop.get(c) == nh:
+                continue
+            self.next_hop[c] = nh
+            touched.add(c)
+            stack.extend(self.children.get(c, ()))
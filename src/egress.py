@@ -0,0 +1,276 @@
+'''
+本文件实现出口调度器 (Egress Scheduler)
+
+原来所有流量都直接 sendto 出去，泛洪的 TC、HELLO 和视频 DATA_MESSAGE 走同一条路径，没有任何排队策略，
+链路拥塞时 HELLO 可能被拖到邻居按 NEIGHB_HOLD_TIME 把我们判为过期。现在所有出口都经过这里：
+1. 严格优先级：控制报文 (HELLO / TC / 转发的泛洪消息) 总是先于数据发出
+2. 数据按下一跳分成有界 FIFO 队列，队满时按策略丢包：
+   - 'drop-tail' : 丢弃新到的包
+   - 'head-drop' : 丢弃队头最老的包 (对视频这类实时流更合适，新数据比旧数据有用)
+3. 可选的按下一跳令牌桶限速 (字节/秒 + 突发字节数)
+4. 快速路径：控制队列为空、该下一跳队列为空、令牌足够时直接发送，不复制缓冲区；
+   只有被限速或 socket 发送缓冲区满 (BlockingIOError) 时才复制进队列，由 drain() 稍后发出
+5. 统计各队列深度、历史最大深度和按原因分类的丢包数
+'''
+import threading
+import time
+from collections import deque
+
+from constants import EGRESS_QUEUE_LIMIT, EGRESS_POLICY, EGRESS_RETRY, EGRESS_DRAIN_BUDGET
+
+POLICIES = ('drop-tail', 'head-drop')
+
+
+class TokenBucket:
+    """令牌桶：rate 字节/秒，最多攒 burst 字节"""
+    def __init__(self, rate, burst, now=None):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.last = now if now is not None else time.time()
+
+    def _refill(self, now):
+        if now > self.last:
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+    def consume(self, n, now):
+        self._refill(now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def ready_at(self, n, now):
+        """攒够 n 字节令牌的时刻"""
+        self._refill(now)
+        return now + max(0.0, n - self.tokens) / self.rate
+
+
+class HopQueue:
+    """一个下一跳的有界 FIFO"""
+    __slots__ = ('packets', 'bucket', 'max_depth', 'drops', 'sent')
+
+    def __init__(self):
+        self.packets = deque()
+        self.bucket = None
+        self.max_depth = 0
+        self.drops = 0
+        self.sent = 0
+
+
+class EgressScheduler:
+    def __init__(self, control_send, data_send, queue_limit=EGRESS_QUEUE_LIMIT, policy=EGRESS_POLICY, clock=time.time):
+        """
+        :param control_send: 发出一个控制包 control_send(packet)
+        :param data_send: 发出一个数据包 data_send(packet, addr)，发送缓冲区满时应抛 BlockingIOError
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"unknown egress policy: {policy}")
+        self.control_send = control_send
+        self.data_send = data_send
+        self.queue_limit = queue_limit
+        self.policy = policy
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.control = deque()      # 被阻塞的控制包
+        self.queues = {}            # { next_hop_addr: HopQueue }
+        self.rates = {}             # { next_hop_addr: (rate, burst) }，单独配置的令牌桶
+        self.default_rate = None    # 所有下一跳默认的 (rate, burst)，None 表示不限速
+        self.deadline = None        # 下一次需要 drain 的时刻
+
+        # 有包排队时的通知 on_wakeup(deadline)，由运行时设置
+        self.on_wakeup = None
+
+        # --- 统计计数 ---
+        self.control_sent = 0
+        self.data_sent = 0
+        self.drops = {'tail': 0, 'head': 0, 'error': 0}
+
+    # ==========================
+    # 配置
+    # ==========================
+    def set_pacing(self, addr, rate, burst=None):
+        """
+        给某个下一跳 (addr 为 None 时是所有下一跳的默认值) 配置令牌桶，rate 为 None 表示取消限速
+        burst 默认为 0.1 秒的流量
+        """
+        conf = None if rate is None else (rate, burst if burst is not None else max(rate * 0.1, 65536))
+        with self.lock:
+            if addr is None:
+                self.default_rate = conf
+                for queue in self.queues.values():
+                    queue.bucket = None
+                return
+            if conf is None:
+                self.rates.pop(addr, None)
+            else:
+                self.rates[addr] = conf
+            queue = self.queues.get(addr)
+            if queue is not None:
+                queue.bucket = None
+
+    def _queue(self, addr):
+        queue = self.queues.get(addr)
+        if queue is None:
+            queue = self.queues[addr] = HopQueue()
+        if queue.bucket is None:
+            conf = self.rates.get(addr, self.default_rate)
+            if conf is not None:
+                queue.bucket = TokenBucket(*conf, now=self.clock())
+        return queue
+
+    # ==========================
+    # 入口
+    # ==========================
+    def send_control(self, packet):
+        """控制包：严格优先，能发就立即发"""
+        with self.lock:
+            if not self.control:
+                try:
+                    self.control_send(packet)
+                    self.control_sent += 1
+                    return True
+                except BlockingIOError:
+                    pass
+            self.control.append(bytes(packet))
+            self._wake(self.clock() + EGRESS_RETRY)
+        return True
+
+    def send_data(self, packet, addr):
+        """
+        数据包：放进该下一跳的队列 (或走快速路径直接发出)
+        :return: 发出或入队返回 True，被丢弃返回 False
+        """
+        now = self.clock()
+        with self.lock:
+            queue = self._queue(addr)
+            n = len(packet)
+            if not self.control and not queue.packets and (queue.bucket is None or queue.bucket.consume(n, now)):
+                try:
+                    self.data_send(packet, addr)
+                    queue.sent += 1
+                    self.data_sent += 1
+                    return True
+                except BlockingIOError:
+                    if queue.bucket is not None:
+                        queue.bucket.tokens += n  # 没发出去，令牌退回
+                except OSError:
+                    self.drops['error'] += 1
+                    queue.drops += 1
+                    return False
+
+            if len(queue.packets) >= self.queue_limit:
+                queue.drops += 1
+                if self.policy == 'drop-tail':
+                    self.drops['tail'] += 1
+                    return False
+                queue.packets.popleft()
+                self.drops['head'] += 1
+            queue.packets.append(bytes(packet))
+            if len(queue.packets) > queue.max_depth:
+                queue.max_depth = len(queue.packets)
+
+            # 队列原来非空时已经有一个待处理的 drain 时刻
+            if len(queue.packets) == 1:
+                deadline = now + EGRESS_RETRY
+                if queue.bucket is not None:
+                    deadline = max(deadline, queue.bucket.ready_at(n, now))
+                self._wake(deadline)
+            return True
+
+    def _wake(self, deadline):
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+            if self.on_wakeup is not None:
+                self.on_wakeup(deadline)
+
+    # ==========================
+    # 排队包的发送
+    # ==========================
+    def next_deadline(self):
+        return self.deadline
+
+    def drain(self, now=None, budget=EGRESS_DRAIN_BUDGET):
+        """
+        发出排队的包：先清空控制队列，再在各下一跳队列间轮转，每轮每个队列一个包
+        一次最多发 budget 个，发完后释放锁，让新到的控制包能插进来
+        :return: 下一次需要 drain 的时刻，没有排队的包时返回 None
+        """
+        if now is None:
+            now = self.clock()
+        with self.lock:
+            self.deadline = None
+            sent = 0
+
+            # 1. 控制包严格优先
+            while self.control and sent < budget:
+                try:
+                    self.control_send(self.control[0])
+                except BlockingIOError:
+                    return self._set_deadline(now + EGRESS_RETRY)
+                except OSError:
+                    self.drops['error'] += 1
+                self.control.popleft()
+                self.control_sent += 1
+                sent += 1
+            if self.control:
+                return self._set_deadline(now)
+
+            # 2. 数据队列轮转
+            deadline = None
+            active = [addr for addr, q in self.queues.items() if q.packets]
+            while active and sent < budget:
+                still = []
+                for addr in active:
+                    queue = self.queues[addr]
+                    packet = queue.packets[0]
+                    bucket = queue.bucket
+                    if bucket is not None and not bucket.consume(len(packet), now):
+                        ready = bucket.ready_at(len(packet), now)
+                        deadline = ready if deadline is None else min(deadline, ready)
+                        continue
+                    try:
+                        self.data_send(packet, addr)
+                        queue.sent += 1
+                        self.data_sent += 1
+                    except BlockingIOError:
+                        if bucket is not None:
+                            bucket.tokens += len(packet)
+                        return self._set_deadline(now + EGRESS_RETRY)
+                    except OSError:
+                        self.drops['error'] += 1
+                        queue.drops += 1
+                    queue.packets.popleft()
+                    sent += 1
+                    if queue.packets:
+                        still.append(addr)
+                active = still
+
+            if active:
+                deadline = now  # 预算用完，还有能发的包
+            return self._set_deadline(deadline)
+
+    def _set_deadline(self, deadline):
+        self.deadline = deadline
+        return deadline
+
+    # ==========================
+    # 统计
+    # ==========================
+    def stats(self):
+        with self.lock:
+            return {
+                'control_sent': self.control_sent,
+                'control_queued': len(self.control),
+                'data_sent': self.data_sent,
+                'data_queued': sum(len(q.packets) for q in self.queues.values()),
+                'drops': dict(self.drops),
+                'policy': self.policy,
+                'queues': {
+                    f"{addr[0]}:{addr[1]}": {'depth': len(q.packets), 'max_depth': q.max_depth,
+                                             'sent': q.sent, 'drops': q.drops}
+                    for addr, q in self.queues.items()
+                },
+            }
@@ -0,0 +1,89 @@
+'''
+本文件实现所有协议元组集合共用的过期调度器 (最小堆 + 惰性删除)
+
+原来 LinkSet / NeighborManager / TopologyManager / DuplicateSet 各自的 cleanup() 每 2 秒在全局锁下
+把整个字典扫一遍，不管有没有东西过期。现在：
+1. 元组创建时登记一次 (过期时刻, 处理函数, 元组对象)
+2. run_due(now) 只弹出已经到期的堆项，交给对应管理器的处理函数：
+   - 处理函数返回 None            : 元组已删除 (或早已被替换)，堆项作废
+   - 处理函数返回新的过期时刻     : 元组期间被刷新过，按新时刻重新入堆
+   这样刷新过期时间不需要动堆，每个存活元组在堆里始终只有一项
+3. 处理函数里可以直接触发回调 (例如 "链路丢失")，路由不用再等下一轮 cleanup
+'''
+import heapq
+import time
+
+
+class ExpiryScheduler:
+    def __init__(self, clock=time.time):
+        """
+        :param clock: 时钟函数，默认 time.time；仿真 (sim.py) 中换成虚拟时钟。
+                      共用这个调度器的各个管理器也从这里取当前时间
+        """
+        self.clock = clock
+        self.heap = []      # [(expire_at, seq, handler, obj)]
+        self._seq = 0       # 同一时刻的堆项按登记顺序弹出，也避免比较 handler/obj
+
+        # 最早过期时刻变化时的通知 (由运行时设置，用来提前唤醒等待中的清理循环)
+        self.on_earliest_changed = None
+
+        # 运行时统计 (metrics.Metrics)，设置后记录每类处理函数的耗时：
+        # _expire_link -> cleanup_link，整轮 run_due 记为 cleanup
+        self.metrics = None
+        self._histograms = {}   # { 处理函数名: LatencyHistogram }
+
+        # --- 统计计数 ---
+        self.expired = 0        # 处理函数被调用的次数
+        self.rescheduled = 0    # 元组被刷新后重新入堆的次数
+
+    def schedule(self, expire_at, handler, obj):
+        """登记一个元组：到 expire_at 之后调用 handler(obj, now)"""
+        earliest = self.heap[0][0] if self.heap else None
+        self._seq += 1
+        heapq.heappush(self.heap, (expire_at, self._seq, handler, obj))
+        if self.on_earliest_changed is not None and (earliest is None or expire_at < earliest):
+            self.on_earliest_changed(expire_at)
+
+    def run_due(self, now=None):
+        """处理所有 expire_at < now 的堆项，返回处理的个数"""
+        if now is None:
+            now = self.clock()
+        heap = self.heap
+        if not heap or heap[0][0] >= now:
+            return 0
+        metrics = self.metrics
+        if metrics is not None:
+            clock = time.perf_counter
+            started = clock()
+        count = 0
+        while heap and heap[0][0] < now:
+            _, _, handler, obj = heapq.heappop(heap)
+            count += 1
+            if metrics is None:
+                next_time = handler(obj, now)
+            else:
+                t0 = clock()
+                next_time = handler(obj, now)
+                self._histogram(handler).record(clock() - t0)
+            if next_time is not None:
+                self._seq += 1
+                heapq.heappush(heap, (next_time, self._seq, handler, obj))
+                self.rescheduled += 1
+        self.expired += count
+        if metrics is not None:
+            metrics.observe('cleanup', clock() - started)
+        return count
+
+    def _histogram(self, handler):
+        hist = self._histograms.get(handler.__name__)
+        if hist is None:
+            name = 'cleanup_' + handler.__name__.replace('_expire_', '', 1)
+            hist = self._histograms[handler.__name__] = self.metrics.histogram(name)
+        return hist
+
+    def next_deadline(self):
+        """最早的过期时刻，堆为空时返回 None"""
+        return self.heap[0][0] if self.heap else None
+
+    def __len__(self):
+        return len(self.heap)
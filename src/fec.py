@@ -0,0 +1,178 @@
+'''
+本文件实现视频流的前向纠错 (FEC) 编解码
+
+多跳有损链路上，一帧只要丢一个分片就整帧作废，帧完成率随跳数迅速下降。
+FEC 把一帧的数据分片按 k 个一组，每组额外发送 r 个修复分片，组内任意丢失不超过 r 个分片都能
+在接收端直接恢复，不需要重传：
+1. r == 1 : XOR 奇偶校验，修复分片是组内所有数据分片的异或 (纯 Python，用大整数异或)
+2. r >= 2 : GF(2^8) 上的系统 Reed-Solomon 码 (Cauchy 矩阵)，编解码用 NumPy 查表向量化，需要 NumPy
+组内数据分片不足 k 个 (最后一组) 时当作缩短码处理；所有分片都补零到相同长度
+
+编码矩阵：修复分片 j = sum_i C[j][i] * 数据分片 i，C[j][i] = 1 / (x_i ^ y_j)，x_i = i，y_j = k + j
+Cauchy 矩阵的任意方子阵都可逆，所以 k + r 个分片中的任意 k 个都能解出原始数据
+'''
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from constants import FEC_GROUP_SIZE
+
+
+def fec_params(overhead, k=FEC_GROUP_SIZE):
+    """由冗余比例 (修复分片数 / 数据分片数) 得到 (k, r)，overhead 为 0 时不启用 FEC"""
+    if overhead <= 0:
+        return 0, 0
+    r = max(1, math.ceil(overhead * k))
+    if k + r > 255:
+        raise ValueError(f"FEC 组太大: k={k}, r={r}")
+    return k, r
+
+
+# ==========================
+# XOR 奇偶校验 (r == 1)
+# ==========================
+def xor_parity(chunks, size):
+    """组内数据分片的异或，chunks 为等长 (size) 的缓冲区列表"""
+    acc = 0
+    for chunk in chunks:
+        acc ^= int.from_bytes(chunk, 'little')
+    return acc.to_bytes(size, 'little')
+
+
+def xor_recover(present, size):
+    """组内只缺一个分片时，其余数据分片和奇偶分片的异或就是它"""
+    return xor_parity(present, size)
+
+
+# ==========================
+# GF(2^8) Reed-Solomon (r >= 2)
+# ==========================
+_GF_EXP = [0] * 512
+_GF_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _GF_EXP[_i] = _x
+    _GF_LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11d    # 本原多项式 x^8 + x^4 + x^3 + x^2 + 1
+for _i in range(255, 512):
+    _GF_EXP[_i] = _GF_EXP[_i - 255]
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return _GF_EXP[_GF_LOG[a] + _GF_LOG[b]]
+
+
+def gf_inv(a):
+    return _GF_EXP[255 - _GF_LOG[a]]
+
+
+def cauchy_matrix(k, r):
+    return [[gf_inv(i ^ (k + j)) for i in range(k)] for j in range(r)]
+
+
+def gf_invert(matrix):
+    """GF(2^8) 上的高斯-约当消元求逆 (矩阵很小，纯 Python 即可)"""
+    n = len(matrix)
+    a = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = next(i for i in range(col, n) if a[i][col])
+        a[col], a[pivot] = a[pivot], a[col]
+        inv = gf_inv(a[col][col])
+        a[col] = [gf_mul(v, inv) for v in a[col]]
+        for i in range(n):
+            f = a[i][col]
+            if i != col and f:
+                a[i] = [v ^ gf_mul(f, p) for v, p in zip(a[i], a[col])]
+    return [row[n:] for row in a]
+
+
+class ReedSolomon:
+    """GF(2^8) 系统 Cauchy Reed-Solomon 码，k 个数据分片 + r 个修复分片"""
+    _mul_table = None
+
+    def __init__(self, k, r):
+        if np is None:
+            raise ImportError("Reed-Solomon FEC (r >= 2) 需要 NumPy: pip install numpy")
+        if ReedSolomon._mul_table is None:
+            exp = np.array(_GF_EXP, dtype=np.uint8)
+            log = np.array(_GF_LOG, dtype=np.int64)
+            table = exp[(log[:, None] + log[None, :]) % 255]
+            table[0, :] = 0
+            table[:, 0] = 0
+            ReedSolomon._mul_table = table
+        self.mul = ReedSolomon._mul_table
+        self.k = k
+        self.r = r
+        self.matrix = cauchy_matrix(k, r)
+
+    def _combine(self, coeffs, rows):
+        """sum_i coeffs[i] * rows[i]，rows 为 (m, L) 的 uint8 数组"""
+        out = np.zeros(rows.shape[1], dtype=np.uint8)
+        mul = self.mul
+        for c, row in zip(coeffs, rows):
+            if c == 1:
+                out ^= row
+            elif c:
+                out ^= mul[c][row]
+        return out
+
+    def encode(self, data):
+        """data: (k, L) uint8 数组，返回 (r, L) 的修复分片"""
+        return np.stack([self._combine(coeffs, data) for coeffs in self.matrix])
+
+    def decode(self, present, size):
+        """
+        :param present: { 分片下标: 内容 }，下标 < k 为数据分片，k + j 为第 j 个修复分片，至少 k 个
+        :return: { 缺失的数据分片下标: 恢复出的 bytes }
+        """
+        k = self.k
+        missing = [i for i in range(k) if i not in present]
+        if not missing:
+            return {}
+        chosen = sorted(present)[:k]
+        rows = np.stack([np.frombuffer(present[i], dtype=np.uint8, count=size) for i in chosen])
+        gen = [[int(i == c) for c in range(k)] if i < k else self.matrix[i - k] for i in chosen]
+        inv = gf_invert(gen)
+        return {i: self._combine(inv[i], rows).tobytes() for i in missing}
+
+
+_codecs = {}
+
+
+def get_codec(k, r):
+    """按 (k, r) 缓存的 Reed-Solomon 编解码器 (最后一组是缩短码，k 会更小)"""
+    codec = _codecs.get((k, r))
+    if codec is None:
+        codec = _codecs[(k, r)] = ReedSolomon(k, r)
+    return codec
+
+
+def encode_group(chunks, size, r):
+    """为一组等长的数据分片生成 r 个修复分片 (bytes 列表)"""
+    if r == 1:
+        return [xor_parity(chunks, size)]
+    data = np.stack([np.frombuffer(c, dtype=np.uint8, count=size) for c in chunks])
+    return [row.tobytes() for row in get_codec(len(chunks), r).encode(data)]
+
+
+def decode_group(present, k, r, size):
+    """
+    由组内收到的分片恢复缺失的数据分片
+    :param present: { 组内下标: 内容 }，下标 < k 为数据分片，k + j 为第 j 个修复分片
+    :return: { 缺失的数据分片下标: bytes }，收到的分片不足 k 个时返回 None
+    """
+    if len(present) < k:
+        return None
+    missing = [i for i in range(k) if i not in present]
+    if not missing:
+        return {}
+    if r == 1:
+        return {missing[0]: xor_recover(present.values(), size)}
+    return get_codec(k, r).decode(present, size)
@@ -0,0 +1,489 @@
+'''
+本文件实现基于 UDP 的可靠文件传输 (批量传输模式)
+
+process_video_data.send_video_udp 按到达顺序发送 60KB 的原始块，块间固定 sleep(0.002)，最后发一个
+EOF_MARKER；receive_video_udp 按到达顺序写文件，任何丢包或乱序都会悄悄损坏文件，固定 sleep 又限死了吞吐。
+现在：
+1. 每个分片带序号 (seq)，分片大小不超过 MTU (FILE_CHUNK_SIZE)，避免 IP 分片放大丢包
+2. 接收端按 START 里的文件大小预分配文件并 mmap，分片直接写到 seq * chunk_size 的偏移处，
+   用位图记录已收分片，乱序 / 重复都不影响结果
+3. 接收端每 FILE_FEEDBACK_INTERVAL 发一次反馈 (NACK)：区间内测得的丢包率 + 缺失分片区间列表，
+   发送端只重传缺失的分片 (重传优先于新数据)，同一分片短时间内不会重复重传
+4. 发送端用令牌桶控制发送速率，速率按反馈的丢包率调整：超出基线的丢包低于 FILE_LOSS_LOW 时乘性增加，
+   高于 FILE_LOSS_HIGH 时按丢包率乘性减小。基线是平滑丢包率的 (缓慢回升的) 最小值，
+   链路本身的随机丢包不会把速率一路压到最低，只有发送过快引起的额外丢包才会降速
+5. 新数据发完后发送端定期发 FIN，接收端回复完整的缺失列表，全部收齐后回 DONE；报告有效吞吐 (goodput)
+
+报文格式：FT_HEADER = type(1) | flags(1) | transfer_id(2) | seq(4)，后接
+  START    : file_size(8) | chunk_size(2)
+  DATA     : 分片数据
+  FEEDBACK : received(4) | loss_ppm(4) | count(2) | count 个 (start(4), length(2)) 缺失区间
+  FIN / DONE : 无
+'''
+import mmap
+import os
+import random
+import select
+import socket
+import struct
+import time
+from collections import deque
+
+from constants import (FILE_CHUNK_SIZE, FILE_INITIAL_RATE, FILE_MIN_RATE, FILE_MAX_RATE, FILE_FEEDBACK_INTERVAL,
+                       FILE_LOSS_LOW, FILE_LOSS_HIGH)
+from egress import TokenBucket
+from olsr_log import get_logger
+
+log = get_logger('file')
+
+FT_HEADER = struct.Struct('!BBHI')
+START_BODY = struct.Struct('!QH')
+FEEDBACK_BODY = struct.Struct('!IIH')
+RANGE = struct.Struct('!IH')
+
+FT_START = 1
+FT_DATA = 2
+FT_FEEDBACK = 3
+FT_FIN = 4
+FT_DONE = 5
+
+MAX_RANGES = (FILE_CHUNK_SIZE - FEEDBACK_BODY.size) // RANGE.size   # 一个反馈包最多携带的缺失区间数
+
+
+class FileSender:
+    """
+    :param sock: UDP socket (发送和接收反馈共用)
+    :param dest: 接收端 (ip, port)
+    :param loss: 模拟的发送端随机丢包率，仅用于测试 / 基准
+    """
+    def __init__(self, sock, dest, path, chunk_size=FILE_CHUNK_SIZE, rate=FILE_INITIAL_RATE,
+                 transfer_id=None, loss=0.0, seed=None):
+        self.sock = sock
+        self.dest = dest
+        self.path = path
+        self.chunk_size = chunk_size
+        self.transfer_id = random.getrandbits(16) if transfer_id is None else transfer_id
+        self.loss = loss
+        self.rng = random.Random(seed)
+
+        self.file_size = os.path.getsize(path)
+        self.n_chunks = (self.file_size + chunk_size - 1) // chunk_size
+        self.bucket = TokenBucket(rate, max(rate * FILE_FEEDBACK_INTERVAL, 4 * chunk_size))
+
+        self.buf = bytearray(FT_HEADER.size + chunk_size)
+        self.view = memoryview(self.buf)
+        self.retransmit = deque()   # 待重传的分片序号 (按 NACK 到达顺序)
+        self.last_retx = {}         # { seq: 上次重传时刻 }，避免同一分片被重复 NACK 时连续重传
+
+        # --- 统计计数 ---
+        self.packets = 0
+        self.retransmissions = 0
+        self.feedbacks = 0
+        self.send_blocked = 0       # 发送缓冲区满、分片退回重发的次数
+        self.last_loss = 0.0
+        self.smoothed_loss = None
+        self.base_loss = 1.0        # 链路本身的丢包基线
+        self.min_rate = self.max_rate = rate
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def _send(self, n):
+        """发出 buf 的前 n 字节；发送缓冲区满时返回 False，由调用方把分片放回队列并退避"""
+        if self.loss and self.rng.random() < self.loss:
+            return True
+        try:
+            self.sock.sendto(self.view[:n], self.dest)
+        except (BlockingIOError, InterruptedError):
+            return False
+        return True
+
+    def _send_control(self, msg_type, body=b''):
+        """发控制报文，发不出去 (缓冲区满 / 超时) 返回 False，调用方下一轮再发"""
+        try:
+            self.sock.sendto(FT_HEADER.pack(msg_type, 0, self.transfer_id, 0) + body, self.dest)
+        except (BlockingIOError, InterruptedError, socket.timeout):
+            return False
+        return True
+
+    def _send_chunk(self, mm, seq):
+        offset = seq * self.chunk_size
+        end = min(offset + self.chunk_size, self.file_size)
+        FT_HEADER.pack_into(self.buf, 0, FT_DATA, 0, self.transfer_id, seq)
+        n = FT_HEADER.size + end - offset
+        self.buf[FT_HEADER.size:n] = mm[offset:end]
+        if not self._send(n):
+            return False
+        self.packets += 1
+        return True
+
+    def _backoff(self):
+        """发送缓冲区满：退还这个分片的令牌，等 socket 可写 (最多 5ms)"""
+        self.send_blocked += 1
+        self.bucket.tokens = min(self.bucket.burst, self.bucket.tokens + self.chunk_size)
+        select.select([], [self.sock], [], 0.005)
+
+    def _poll_feedback(self, now):
+        """非阻塞地读完已到达的反馈，返回是否收到 DONE"""
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return False
+            if len(data) < FT_HEADER.size:
+                continue
+            msg_type, _, transfer_id, _ = FT_HEADER.unpack_from(data, 0)
+            if transfer_id != self.transfer_id:
+                continue
+            if msg_type == FT_DONE:
+                return True
+            if msg_type == FT_FEEDBACK:
+                self._handle_feedback(data, now)
+
+    def _handle_feedback(self, data, now):
+        if len(data) < FT_HEADER.size + FEEDBACK_BODY.size:
+            return  # 截断的反馈，丢掉
+        self.feedbacks += 1
+        _, loss_ppm, count = FEEDBACK_BODY.unpack_from(data, FT_HEADER.size)
+        count = min(count, (len(data) - FT_HEADER.size - FEEDBACK_BODY.size) // RANGE.size)
+        loss = loss_ppm / 1e6
+        self.last_loss = loss
+        smoothed = loss if self.smoothed_loss is None else 0.8 * self.smoothed_loss + 0.2 * loss
+        self.smoothed_loss = smoothed
+        self.base_loss = min(smoothed, self.base_loss + 0.001)
+
+        # 速率控制：按超出基线的丢包率乘性增 / 减
+        excess = loss - self.base_loss
+        rate = self.bucket.rate
+        if excess > FILE_LOSS_HIGH:
+            rate *= max(0.5, 1.0 - excess)
+        elif excess < FILE_LOSS_LOW:
+            rate *= 1.25
+        rate = min(FILE_MAX_RATE, max(FILE_MIN_RATE, rate))
+        self.bucket.rate = rate
+        self.bucket.burst = max(rate * FILE_FEEDBACK_INTERVAL, 4 * self.chunk_size)
+        self.min_rate = min(self.min_rate, rate)
+        self.max_rate = max(self.max_rate, rate)
+
+        # 缺失分片排进重传队列 (距上次重传不到两个反馈周期的跳过，它可能还在路上)
+        pos = FT_HEADER.size + FEEDBACK_BODY.size
+        holdoff = 2 * FILE_FEEDBACK_INTERVAL
+        for _ in range(count):
+            start, length = RANGE.unpack_from(data, pos)
+            pos += RANGE.size
+            for seq in range(start, min(start + length, self.n_chunks)):
+                if now - self.last_retx.get(seq, 0.0) > holdoff:
+                    self.last_retx[seq] = now
+                    self.retransmit.append(seq)
+
+    def _handshake(self, deadline):
+        body = START_BODY.pack(self.file_size, self.chunk_size)
+        while time.time() < deadline:
+            self._send_control(FT_START, body)
+            wait = time.time() + 0.2
+            while time.time() < wait:
+                try:
+                    data, _ = self.sock.recvfrom(65535)
+                except socket.timeout:
+                    break
+                if len(data) >= FT_HEADER.size:
+                    msg_type, _, transfer_id, _ = FT_HEADER.unpack_from(data, 0)
+                    if transfer_id == self.transfer_id and msg_type in (FT_FEEDBACK, FT_DONE):
+                        return True
+        return False
+
+    def run(self, timeout=300.0):
+        """发送整个文件，直到接收端确认收齐 (或超时)，返回统计"""
+        t0 = time.time()
+        deadline = t0 + timeout
+        self.sock.settimeout(0.05)
+        if not self._handshake(deadline):
+            raise TimeoutError("接收端没有响应 START")
+        self.sock.setblocking(False)
+
+        done = False
+        next_seq = 0
+        last_fin = 0.0
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.file_size else b''
+            try:
+                while not done and time.time() < deadline:
+                    now = time.time()
+                    done = self._poll_feedback(now)
+                    if done:
+                        break
+
+                    if self.retransmit or next_seq < self.n_chunks:
+                        if not self.bucket.consume(self.chunk_size, now):
+                            time.sleep(min(0.005, self.bucket.ready_at(self.chunk_size, now) - now))
+                            continue
+                        if self.retransmit:
+                            seq = self.retransmit.popleft()
+                            if self._send_chunk(mm, seq):
+                                self.retransmissions += 1
+                            else:
+                                self.retransmit.appendleft(seq)
+                                self._backoff()
+                        elif self._send_chunk(mm, next_seq):
+                            next_seq += 1
+                        else:
+                            self._backoff()
+                    else:
+                        # 新数据发完了：定期发 FIN，请接收端报告剩余的缺失分片
+                        if now - last_fin > FILE_FEEDBACK_INTERVAL and self._send_control(FT_FIN):
+                            last_fin = now
+                        time.sleep(0.001)
+            finally:
+                if self.file_size:
+                    mm.close()
+
+        elapsed = time.time() - t0
+        return {
+            'complete': done,
+            'bytes': self.file_size,
+            'chunks': self.n_chunks,
+            'packets': self.packets,
+            'retransmissions': self.retransmissions,
+            'feedbacks': self.feedbacks,
+            'send_blocked': self.send_blocked,
+            'loss_base': self.base_loss if self.feedbacks else 0.0,
+            'elapsed': elapsed,
+            'goodput_mbps': self.file_size * 8 / elapsed / 1e6 if done and elapsed > 0 else 0.0,
+            'rate_final_mbps': self.rate * 8 / 1e6,
+            'rate_min_mbps': self.min_rate * 8 / 1e6,
+            'rate_max_mbps': self.max_rate * 8 / 1e6,
+        }
+
+
+class FileReceiver:
+    """
+    :param sock: 已绑定的 UDP socket
+    :param save_path: 保存路径，收到 START 后按文件大小预分配并 mmap
+    """
+    def __init__(self, sock, save_path):
+        self.sock = sock
+        self.save_path = save_path
+        self.peer = None
+        self.transfer_id = None
+        self.file = None
+        self.mm = None
+        self.have = None
+        self.chunk_size = 0
+        self.file_size = 0
+        self.n_chunks = 0
+
+        # --- 统计计数 ---
+        self.received = 0           # 收到的不重复分片
+        self.duplicates = 0
+        self.malformed = 0          # 长度不对的 START / DATA，直接丢弃
+        self.packets = 0
+        self.highest = -1           # 收到过的最大序号
+        self.feedbacks = 0
+        self._interval_advance = 0  # 本反馈周期内最大序号的推进量
+        self._interval_gaps = 0     # 本反馈周期内新出现的空洞 (跳过的序号)
+        self._scan_from = 0         # 在此之前的分片都已收齐
+
+    def _open(self, file_size, chunk_size):
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+        self.n_chunks = (file_size + chunk_size - 1) // chunk_size
+        self.have = bytearray(self.n_chunks)
+        self.file = open(self.save_path, 'w+b')
+        self.file.truncate(file_size)
+        if file_size:
+            self.mm = mmap.mmap(self.file.fileno(), file_size)
+
+    def _close(self):
+        if self.mm is not None:
+            self.mm.flush()
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def complete(self):
+        return self.have is not None and self.received == self.n_chunks
+
+    def _send(self, msg_type, body=b''):
+        try:
+            self.sock.sendto(FT_HEADER.pack(msg_type, 0, self.transfer_id, 0) + body, self.peer)
+        except (BlockingIOError, InterruptedError, socket.timeout):
+            pass    # 反馈 / DONE 丢了发送端会再发 FIN，下一轮再报告
+
+    def missing_ranges(self, upto):
+        """[_scan_from, upto) 中缺失分片的区间 (start, length)，最多 MAX_RANGES 个"""
+        have = self.have
+        i = have.find(0, self._scan_from, upto)
+        if i < 0:
+            self._scan_from = upto
+            return []
+        self._scan_from = i
+        ranges = []
+        while 0 <= i < upto and len(ranges) < MAX_RANGES:
+            j = have.find(1, i, upto)
+            if j < 0:
+                j = upto
+            while j - i > 0xFFFF:
+                ranges.append((i, 0xFFFF))
+                i += 0xFFFF
+            ranges.append((i, j - i))
+            i = have.find(0, j, upto)
+        return ranges[:MAX_RANGES]
+
+    def send_feedback(self, final=False):
+        """反馈：本周期测得的丢包率 + 缺失区间；final (收到 FIN) 时报告到文件末尾的所有缺失"""
+        advance = self._interval_advance
+        loss = self._interval_gaps / advance if advance else 0.0
+        self._interval_advance = self._interval_gaps = 0
+        upto = self.n_chunks if final else self.highest + 1
+        ranges = self.missing_ranges(upto)
+        body = FEEDBACK_BODY.pack(self.received, int(min(loss, 1.0) * 1e6), len(ranges))
+        body += b''.join(RANGE.pack(s, n) for s, n in ranges)
+        self._send(FT_FEEDBACK, body)
+        self.feedbacks += 1
+
+    def handle(self, data, addr):
+        """处理一个报文，返回是否已收齐整个文件"""
+        if len(data) < FT_HEADER.size:
+            return False
+        msg_type, _, transfer_id, seq = FT_HEADER.unpack_from(data, 0)
+
+        if msg_type == FT_START:
+            if self.transfer_id is None:
+                if len(data) < FT_HEADER.size + START_BODY.size:
+                    self.malformed += 1
+                    return False
+                file_size, chunk_size = START_BODY.unpack_from(data, FT_HEADER.size)
+                if chunk_size == 0:
+                    self.malformed += 1
+                    return False
+                self.transfer_id = transfer_id
+                self.peer = addr
+                self._open(file_size, chunk_size)
+                log.info("开始接收 %d 字节 (%d 片) 来自 %s:%d", file_size, self.n_chunks, addr[0], addr[1])
+            if transfer_id == self.transfer_id:
+                self.send_feedback()
+            return False
+
+        if transfer_id != self.transfer_id:
+            return False
+        if self.complete():
+            self._send(FT_DONE)
+            return True
+
+        if msg_type == FT_DATA:
+            self.packets += 1
+            if seq >= self.n_chunks:
+                return False
+            if self.have[seq]:
+                self.duplicates += 1
+                return False
+            offset = seq * self.chunk_size
+            payload = memoryview(data)[FT_HEADER.size:]
+            if len(payload) != min(self.chunk_size, self.file_size - offset):
+                self.malformed += 1     # 长度和分片位置对不上，丢掉，等重传
+                return False
+            self.mm[offset:offset + len(payload)] = payload
+            self.have[seq] = 1
+            self.received += 1
+            if seq > self.highest:
+                self._interval_gaps += seq - self.highest - 1
+                self._interval_advance += seq - self.highest
+                self.highest = seq
+        elif msg_type == FT_FIN:
+            self.send_feedback(final=True)
+
+        if self.complete():
+            self._send(FT_DONE)
+            return True
+        return False
+
+    def run(self, timeout=300.0, linger=0.5):
+        """接收直到文件收齐 (或超时)，返回统计"""
+        t0 = time.time()
+        deadline = t0 + timeout
+        self.sock.settimeout(FILE_FEEDBACK_INTERVAL)
+        next_feedback = None
+        started = None
+        try:
+            while time.time() < deadline:
+                try:
+                    data, addr = self.sock.recvfrom(65535)
+                except socket.timeout:
+                    data = None
+                now = time.time()
+                if data is not None:
+                    if self.handle(data, addr):
+                        break
+                    if started is None and self.transfer_id is not None:
+                        started = now
+                        next_feedback = now + FILE_FEEDBACK_INTERVAL
+                if next_feedback is not None and now >= next_feedback:
+                    self.send_feedback()
+                    next_feedback = now + FILE_FEEDBACK_INTERVAL
+            finished = time.time()
+
+            # 收齐后再逗留一会儿，DONE 丢了的话发送端还会发 FIN
+            end = finished + linger if self.complete() else finished
+            while time.time() < end:
+                try:
+                    data, addr = self.sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                self.handle(data, addr)
+        finally:
+            self._close()
+
+        elapsed = finished - (started or t0)
+        return {
+            'complete': self.complete(),
+            'bytes': self.file_size,
+            'received_chunks': self.received,
+            'packets': self.packets,
+            'duplicates': self.duplicates,
+            'malformed': self.malformed,
+            'feedbacks': self.feedbacks,
+            'elapsed': elapsed,
+            'goodput_mbps': self.file_size * 8 / elapsed / 1e6 if self.complete() and elapsed > 0 else 0.0,
+        }
+
+
+def send_file(path, dest_ip, dest_port, **kwargs):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        return FileSender(sock, (dest_ip, dest_port), path, **kwargs).run()
+    finally:
+        sock.close()
+
+
+def receive_file(save_path, listen_port, timeout=300.0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind(("0.0.0.0", listen_port))
+    try:
+        return FileReceiver(sock, save_path).run(timeout)
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reliable UDP file transfer")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    p_send = sub.add_parser("send")
+    p_send.add_argument("path")
+    p_send.add_argument("dest_ip")
+    p_send.add_argument("dest_port", type=int)
+    p_send.add_argument("--rate", type=float, default=FILE_INITIAL_RATE, help="初始发送速率 (字节/秒)")
+    p_recv = sub.add_parser("recv")
+    p_recv.add_argument("save_path")
+    p_recv.add_argument("listen_port", type=int)
+    args = parser.parse_args()
+    import olsr_log
+    olsr_log.configure()
+    if args.mode == "send":
+        print(send_file(args.path, args.dest_ip, args.dest_port, rate=args.rate))
+    else:
+        print(receive_file(args.save_path, args.listen_port))
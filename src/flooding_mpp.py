@@ -1,49 +1,161 @@
 # src/flooding_mpp.py 
 """
-DuplicateTuple 结构：
+重复检测 (RFC 3626 Section 3.4) 按源节点 (Originator) 组织：
 D_addr: 消息的源头地址 (Originator Address)。
-D_seq_num: 消息序列号 (Message Sequence Number)。
-D_retransmitted: 布尔值，标记这条消息我是否已经转发过。
-D_time: 过期时间
+D_seq_num: 消息序列号 (Message Sequence Number)，用滑动窗口位图表示是否收到过。
+D_retransmitted: 布尔值，标记这条消息我是否已经转发过，同样用一张位图表示。
+D_time: 粗粒度维护：位图按收到时间分成 DUP_TIME_BUCKETS 段，一段从开始起超过 DUP_HOLD_TIME 就整段丢弃，
+        其中的序列号不再算重复 (源节点重启后序列号落回窗口里也能马上被接受)；
+        窗口本身按源节点整体维护，该源节点 DUP_HOLD_TIME 内没有新消息就整个删除。
+
+原来每个 (originator, seq) 都有一个 DuplicateTuple 对象并保留 30 秒，内存随消息数增长；
+现在每个源节点只有一个 DuplicateWindow，内存随源节点数增长。
 """
 # 这个模块实现了用于跟踪已接收消息的重复检测机制，防止消息的重复处理和转发。主要的两个类也就是命名为duplicate
 
 
-import time
-from constants import DUP_HOLD_TIME # 通常是 30秒
+from constants import DUP_HOLD_TIME, DUP_WINDOW_SIZE, DUP_TIME_BUCKETS # 通常是 30秒 / 4096 个序列号 / 4 段
+from expiry_scheduler import ExpiryScheduler
+from topology_manager import is_seq_newer
+
+SEQ_MODULO = 65536  # 16 位序列号空间
+
+class DuplicateWindow:
+    """
+    单个源节点的序列号滑动窗口
+    第 i 位对应序列号 (top - i) mod 65536，窗口宽度为 DUP_WINDOW_SIZE
+    seen 记录"收到过"，retransmitted 记录"已转发过"
+    seen 是 buckets 里各段位图的并集；每段 [开始时间, 位图] 记录这段时间内新收到的序列号，
+    段从开始起超过 DUP_HOLD_TIME 就丢弃 (所以一条记录最多保留 DUP_HOLD_TIME，最少保留其 (N-1)/N)
+    """
+    __slots__ = ('originator_ip', 'top', 'buckets', 'seen', 'retransmitted', 'expiration_time')
 
-class DuplicateTuple:
     def __init__(self, originator_ip, msg_seq_num, current_time):
         self.originator_ip = originator_ip
-        self.msg_seq_num = msg_seq_num
-        self.retransmitted = False
+        self.top = msg_seq_num     # 窗口内最新的序列号
+        self.buckets = []          # [[开始时间, 位图], ...]，从旧到新
+        self.seen = 0              # 收到过的位图 (各段的并集)
+        self.retransmitted = 0     # 已转发的位图 (只保留仍在 seen 里的位)
         self.expiration_time = current_time + DUP_HOLD_TIME
 
+    def offset(self, msg_seq_num):
+        """
+        序列号在窗口中的位偏移；比 top 新返回负数，早于窗口返回 None
+        新旧判断与 is_seq_newer 一样处理回绕
+        早于窗口说明源节点重启过 (序列号从头开始)，不是重放
+        """
+        if is_seq_newer(msg_seq_num, self.top):
+            return -((msg_seq_num - self.top) % SEQ_MODULO)
+        off = (self.top - msg_seq_num) % SEQ_MODULO
+        if off >= DUP_WINDOW_SIZE:
+            return None
+        return off
+
+    def advance(self, msg_seq_num, shift):
+        """窗口前移 shift 位，让 msg_seq_num 成为新的 top"""
+        mask = (1 << DUP_WINDOW_SIZE) - 1
+        for bucket in self.buckets:
+            bucket[1] = (bucket[1] << shift) & mask
+        self.seen = (self.seen << shift) & mask
+        self.retransmitted = (self.retransmitted << shift) & mask
+        self.top = msg_seq_num
+
+    def reset(self, msg_seq_num):
+        """源节点重启：清空所有位图，窗口从 msg_seq_num 重新开始"""
+        self.buckets = []
+        self.seen = 0
+        self.retransmitted = 0
+        self.top = msg_seq_num
+
+    def age(self, current_time):
+        """丢弃开始时间早于 DUP_HOLD_TIME 之前的段，重新计算 seen (没有段过期时只比较一次)"""
+        buckets = self.buckets
+        if not buckets or buckets[0][0] + DUP_HOLD_TIME > current_time:
+            return
+        while buckets and buckets[0][0] + DUP_HOLD_TIME <= current_time:
+            del buckets[0]
+        seen = 0
+        for _, bits in buckets:
+            seen |= bits
+        self.seen = seen
+        self.retransmitted &= seen
+
+    def add(self, off, current_time):
+        """在当前段里记下偏移 off 处的序列号，当前段已满 DUP_HOLD_TIME / DUP_TIME_BUCKETS 则新开一段"""
+        buckets = self.buckets
+        if not buckets or current_time >= buckets[-1][0] + DUP_HOLD_TIME / DUP_TIME_BUCKETS:
+            buckets.append([current_time, 0])
+        bit = 1 << off
+        buckets[-1][1] |= bit
+        self.seen |= bit
+
+
 class DuplicateSet:
-    def __init__(self):
-        # 格式: { (originator_ip, seq_num): DuplicateTuple }
-        self.entries = {}
+    def __init__(self, expiry=None):
+        # 共享的过期调度器 (由 OLSRNode 传入，单独使用时自建一个)
+        self.expiry = expiry if expiry is not None else ExpiryScheduler()
+        # 格式: { originator_ip: DuplicateWindow }，originator_ip 为 int 地址
+        self.windows = {}
 
-    def is_duplicate(self, originator_ip, msg_seq_num):
-        """检查消息是否已存在"""
-        return (originator_ip, msg_seq_num) in self.entries
+    def is_duplicate(self, originator_ip, msg_seq_num, current_time):
+        """
+        检查消息是否已存在
+        早于窗口 (落后 DUP_WINDOW_SIZE 以上) 的序列号按源节点重启处理，不算重复；
+        窗口内但已超过 DUP_HOLD_TIME 的记录同样不算重复
+        """
+        window = self.windows.get(originator_ip)
+        if window is None:
+            return False
+        window.age(current_time)
+        off = window.offset(msg_seq_num)
+        if off is None:
+            return False
+        return off >= 0 and bool(window.seen >> off & 1)
 
     def record_message(self, originator_ip, msg_seq_num, current_time):
         """记录新消息"""
-        key = (originator_ip, msg_seq_num)
-        if key not in self.entries:
-            self.entries[key] = DuplicateTuple(originator_ip, msg_seq_num, current_time)
-        return self.entries[key]
+        window = self.windows.get(originator_ip)
+        if window is None:
+            window = DuplicateWindow(originator_ip, msg_seq_num, current_time)
+            self.windows[originator_ip] = window
+            self.expiry.schedule(window.expiration_time, self._expire_window, window)
+        else:
+            window.age(current_time)
+
+        off = window.offset(msg_seq_num)
+        if off is None:
+            # 序列号跳回到窗口之外：源节点重启了，窗口从这个序列号重新开始
+            window.reset(msg_seq_num)
+            off = 0
+        elif off < 0:
+            window.advance(msg_seq_num, -off)
+            off = 0
+        window.add(off, current_time)
+        window.expiration_time = current_time + DUP_HOLD_TIME
+        return window
 
     def mark_retransmitted(self, originator_ip, msg_seq_num):
         """标记消息已被转发"""
-        key = (originator_ip, msg_seq_num)
-        if key in self.entries:
-            self.entries[key].retransmitted = True
-
-    def cleanup(self):
-        """清理过期记录"""
-        now = time.time()
-        keys_to_remove = [k for k, v in self.entries.items() if v.expiration_time < now]
-        for k in keys_to_remove:
-            del self.entries[k]
\ No newline at end of file
+        window = self.windows.get(originator_ip)
+        if window is None:
+            return
+        off = window.offset(msg_seq_num)
+        if off is not None and off >= 0 and window.seen >> off & 1:
+            window.retransmitted |= 1 << off
+
+    def is_retransmitted(self, originator_ip, msg_seq_num):
+        """消息是否已经被我转发过"""
+        window = self.windows.get(originator_ip)
+        if window is None:
+            return False
+        off = window.offset(msg_seq_num)
+        return off is not None and off >= 0 and bool(window.retransmitted >> off & 1)
+
+    def _expire_window(self, window, now):
+        """过期调度器的处理函数：源节点一直有新消息则顺延，否则删除整个窗口"""
+        if self.windows.get(window.originator_ip) is not window:
+            return None
+        if window.expiration_time >= now:
+            return window.expiration_time
+        del self.windows[window.originator_ip]
+        return None
@@ -1,6 +1,7 @@
 import struct
 import socket
 from pkt_msg_fmt import encode_mantissa,decode_mantissa
+from node_addr import to_addr
 
 """
 本文件主要设计hello_body的打包和解包,也就是hello_info和hello_body的相互转换
@@ -50,10 +51,8 @@ def create_hello_body(hello_info):
         # RFC 6.1: Link Code(1), Reserved(1), Link Message Size(2)
         lm_header = struct.pack('!BBH', link_code, 0, link_msg_size)#这里的link_code是一个整型，直接打包会自动转换
         
-        # 打包所有 IP
-        ips_bytes = b''
-        for ip_str in ip_list_strings:
-            ips_bytes += socket.inet_aton(ip_str)
+        # 打包所有 IP (内部地址是 32 位整数，一次 pack 完整个列表；兼容传入字符串)
+        ips_bytes = struct.pack(f'!{len(ip_list_strings)}I', *map(to_addr, ip_list_strings))
             
         link_messages_part += lm_header + ips_bytes
 
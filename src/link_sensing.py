@@ -2,6 +2,10 @@ import time
 import socket
 from constants import *
 from pkt_msg_fmt import create_link_code
+from expiry_scheduler import ExpiryScheduler
+from olsr_log import get_logger, Addr
+
+log = get_logger('link')
 
 
 class LinkTuple: #此类主要用于判断邻居节点对称与否，以及过期与否
@@ -11,40 +15,54 @@ class LinkTuple: #此类主要用于判断邻居节点对称与否，以及过
         self.l_asym_time = 0  # 异步过期时间戳 代表接收链路的有效期
         self.l_sym_time = 0   # 对称过期时间戳 代表双向握手成功的有效期
         self.l_time = 0       # 记录过期时间戳 (通常取上面两者的最大值 + 保持时间)
+        self.reported_sym = False  # 上次处理时链路是否对称，用于判断对称性失效时要不要发出"链路丢失"
 
-    def is_symmetric(self):
+    def is_symmetric(self, now=None):
         """判断当前链路是否对称"""
-        return time.time() < self.l_sym_time
+        if now is None:
+            now = time.time()
+        return now < self.l_sym_time
 
-    def is_asymmetric(self):
+    def is_asymmetric(self, now=None):
         """判断当前链路是否仅为非对称（我听到他，但他没听到我）""" 
-        return (time.time() < self.l_asym_time) and (not self.is_symmetric())
+        if now is None:
+            now = time.time()
+        return (now < self.l_asym_time) and (not self.is_symmetric(now))
 
 # 类似于邻居相关信息数据库的类来存储链路信息，操作信息的增删  
 # 常量定义 (基于 RFC 18.3)
 # NEIGHB_HOLD_TIME = 6.0  # 3 * HELLO_INTERVAL
 
 class LinkSet:
-    def __init__(self, my_ip=None):
-        self.links = {}  # 格式: { '192.168.1.5': LinkTuple对象类, ... }，这里面保存邻居节点的ip信息，是否对称节点
+    def __init__(self, my_ip=None, expiry=None):
+        self.links = {}  # 格式: { 邻居地址(int): LinkTuple对象类, ... }，这里面保存邻居节点的ip信息，是否对称节点
         self.my_ip = my_ip # 请替换为你的真实IP
 
+        # 共享的过期调度器 (由 OLSRNode 传入，单独使用时自建一个)
+        self.expiry = expiry if expiry is not None else ExpiryScheduler()
+
+        # 链路丢失回调 on_link_lost(neighbor_ip, removed)
+        # removed=False: 链路从对称退化为非对称；removed=True: 链路记录整体过期被删除
+        self.on_link_lost = None
+
     def process_hello(self, sender_ip, hello_info, validity_time):# 其中的hello_info就是hello_body解包以后的信息内容，本身是一个字典，这一部分打包解包在hello_msg_fmt文件里面
         """
         核心逻辑：根据收到的 HELLO 处理链路状态
         参考 RFC 3626 Section 7.1.1
         """
-        current_time = time.time()
+        current_time = self.expiry.clock()
         # validity_time = hello_info['htime_seconds'] * 3  这里不再使用固定值 而是传入
         # 通常 Validity Time = 3 * Htime [cite: 1685, 1710] 对方存在有效时间限制，也就是对方只要存在，我们就认为他存在这个时间，每发一次hello就更新，认为会继续存在这么长时间，这也就是为什么收到hello就更新asym_time:收到说明肯定存在
 
         # 1. 如果是新邻居，创建记录 [cite: 816-827]
         if sender_ip not in self.links:
-            print(f"[LinkSet] 发现新邻居: {sender_ip}")
+            log.info("发现新邻居: %s", Addr(sender_ip))
             new_link = LinkTuple(sender_ip)
             # 新邻居默认为非对称，L_SYM_time 设为过期
             new_link.l_sym_time = current_time - 1 
             self.links[sender_ip] = new_link #ip与对象的键值对构成的字典
+            new_link.l_time = current_time + validity_time
+            self.expiry.schedule(new_link.l_time, self._expire_link, new_link)
         
         link = self.links[sender_ip] #取出sender_ip对应的LinkTuple类的对象，对他进行操作
 
@@ -63,20 +81,41 @@ class LinkSet:
                     link.l_sym_time = current_time - 1 # 对方说丢失了，我们也标记为非对称
                 elif l_type == 1 or l_type == 2: # ASYM_LINK or SYM_LINK [cite: 846]
                     link.l_sym_time = current_time + validity_time # 确认为对称！
-                    print(f"[LinkSet] 与 {sender_ip} 建立对称链路！")
+                    if not link.reported_sym:
+                        # 只在链路变为对称时记一次，之后每个 HELLO 只是刷新
+                        log.info("与 %s 建立对称链路", Addr(sender_ip))
                 break
         
         # 4. 更新记录总过期时间 L_time [cite: 848-850]
         link.l_time = max(link.l_sym_time, link.l_asym_time)
+        link.reported_sym = link.l_sym_time > current_time
+
+    def _expire_link(self, link, now):
+        """
+        过期调度器的处理函数：链路对称性失效或整条记录过期时调用
+        返回下一次需要检查的时刻；记录已删除则返回 None
+        """
+        if self.links.get(link.neighbor_ip) is not link:
+            return None  # 早已被删除/替换
+
+        if link.l_time < now:
+            log.info("邻居 %s 已过期，删除记录", Addr(link.neighbor_ip))
+            del self.links[link.neighbor_ip]
+            self._link_lost(link.neighbor_ip, True)
+            return None
+
+        if link.l_sym_time >= now:
+            return link.l_sym_time  # 仍然对称，到对称时间再看
+
+        if link.reported_sym:
+            # 对称时间到了但没被 HELLO 刷新：链路丢失 (退化为非对称)
+            link.reported_sym = False
+            self._link_lost(link.neighbor_ip, False)
+        return link.l_time
 
-    def cleanup(self):
-        """定期清理过期邻居"""
-        current_time = time.time()
-        expired_ips = [ip for ip, link in self.links.items() if link.l_time < current_time]
-        # 创建一个过期ip构成的列表
-        for ip in expired_ips:
-            print(f"[LinkSet] 邻居 {ip} 已过期，删除记录。")
-            del self.links[ip]
+    def _link_lost(self, neighbor_ip, removed):
+        if self.on_link_lost is not None:
+            self.on_link_lost(neighbor_ip, removed)
 
     # 基于链路状态生成hello消息的邻居相关内容，这里自己本身与哪些节点相连的初始化信息应该要么初始设定，要么应该从电台设备爬相关信息，要么是通过hello消息本身去更新过来
     """
@@ -99,7 +138,7 @@ class LinkSet:
         sym_neighbors = []   # 类型 1: SYM_NEIGH
         asym_neighbors = []  # 类型 0: NOT_NEIGH (但链路是 ASYM)
         
-        current_time = time.time()
+        current_time = self.expiry.clock()
         
         # 遍历所有邻居，分类
         for link in self.links.values():#这个value()的返回值为linktuple类的对象
@@ -107,7 +146,7 @@ class LinkSet:
                 continue # 已过期忽略
             
             # 1. 处理对称邻居 (Symmetric)
-            if link.is_symmetric():
+            if link.is_symmetric(current_time):
                 # 如果该邻居在 MPR 集合中，标记为 MPR_NEIGH [cite: 948]
                 if link.neighbor_ip in mpr_set:
                     mpr_neighbors.append(link.neighbor_ip)
@@ -115,7 +154,7 @@ class LinkSet:
                     sym_neighbors.append(link.neighbor_ip)
             
             # 2. 处理非对称邻居 (Asymmetric)
-            elif link.is_asymmetric():
+            elif link.is_asymmetric(current_time):
                 asym_neighbors.append(link.neighbor_ip)
         
         neighbor_groups = []
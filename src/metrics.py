@@ -0,0 +1,308 @@
+'''
+本文件实现 OLSRNode 的运行时统计 (延迟直方图 + 计数器) 和本地统计查询接口
+
+节点在无人机上无界面运行，原来看不到时间花在哪里。现在：
+1. LatencyHistogram：按 2 的幂分桶 (第 i 个桶上界 2^i 微秒)，记录一次只需要一次 bit_length 和两次加法，
+   可以常开；输出 count / sum / max 和由桶估算的 p50 / p90 / p99
+2. Metrics：按名字管理直方图和计数器，计数器按标签细分 (例如 rx_messages 按消息类型)
+   热路径上先用 histogram(name) / counter(name) 取到对象，之后直接 record / 自增，不再查名字；
+   消息类型在快照时才转成名字 (hello / tc / data ...)
+   OLSRNode 记录 process_packet / process_hello / process_tc、recalculate_mpr / recalculate_routing_table、
+   各元组集合的过期清理 (cleanup_link / cleanup_two_hop / cleanup_mpr_selector / cleanup_record (拓扑集) /
+   cleanup_window (重复集)，整轮为 cleanup) 的耗时，收到 / 重复 / 转发 / 丢弃的消息按类型计数
+3. InstrumentedLock：替换 OLSRNode.lock，记录等锁时间 (lock_wait) 和持锁时间 (lock_hold)
+4. StatsServer：Unix 域 socket 或 127.0.0.1 上的 TCP 端口，连上后发一行请求：
+   "json" (默认) 返回 JSON 快照，"prometheus" 返回 Prometheus 文本格式；
+   也接受 HTTP GET (/metrics 返回 Prometheus 文本，其他路径返回 JSON)，可以直接让 Prometheus 抓取
+
+用法 (查询): python3 metrics.py <socket 路径 | 端口> [json|prometheus]
+'''
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+from constants import METRICS_BUCKETS, HELLO_MESSAGE, TC_MESSAGE, MID_MESSAGE, HNA_MESSAGE, DATA_MESSAGE
+
+MSG_TYPE_NAMES = {HELLO_MESSAGE: 'hello', TC_MESSAGE: 'tc', MID_MESSAGE: 'mid', HNA_MESSAGE: 'hna',
+                  DATA_MESSAGE: 'data'}
+
+
+class LatencyHistogram:
+    __slots__ = ('buckets', 'count', 'sum', 'max')
+
+    def __init__(self, n_buckets=METRICS_BUCKETS):
+        self.buckets = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        i = int(seconds * 1e6).bit_length()
+        try:
+            self.buckets[i] += 1
+        except IndexError:
+            self.buckets[-1] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @staticmethod
+    def bound(i):
+        """第 i 个桶的上界 (秒)"""
+        return (1 << i) / 1e6
+
+    def quantile(self, q):
+        """由桶估算的分位数 (取所在桶的上界，最后一个桶取观测到的最大值)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        last = len(self.buckets) - 1
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                return self.max if i == last else min(self.bound(i), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': list(self.buckets),
+        }
+
+
+class Metrics:
+    def __init__(self, label_names=MSG_TYPE_NAMES):
+        self.histograms = {}    # { 名字: LatencyHistogram }
+        self.counters = {}      # { 名字: { 标签: 次数 } }，不带标签的计数记在标签 None 上
+        self.label_names = label_names
+        self.started = time.time()
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = LatencyHistogram()
+        return hist
+
+    def counter(self, name):
+        values = self.counters.get(name)
+        if values is None:
+            values = self.counters[name] = {}
+        return values
+
+    def observe(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def count(self, name, label=None, n=1):
+        values = self.counter(name)
+        values[label] = values.get(label, 0) + n
+
+    def snapshot(self):
+        counters = {}
+        for name, values in list(self.counters.items()):
+            if list(values) == [None]:
+                counters[name] = values[None]
+            else:
+                counters[name] = {self.label_names.get(label, str(label)): n for label, n in list(values.items())}
+        return {
+            'uptime': time.time() - self.started,
+            'latency': {name: h.snapshot() for name, h in list(self.histograms.items())},
+            'counters': counters,
+        }
+
+
+class InstrumentedLock:
+    """带等锁 / 持锁时间统计的互斥锁，可直接替换 threading.Lock 用在 with 语句里"""
+    def __init__(self, metrics):
+        self._lock = threading.Lock()
+        self.metrics = metrics
+        self.wait = metrics.histogram('lock_wait')
+        self.hold = metrics.histogram('lock_hold')
+        self._acquired_at = 0.0
+
+    def __enter__(self):
+        t0 = time.perf_counter()
+        self._lock.acquire()
+        now = time.perf_counter()
+        self._acquired_at = now
+        self.wait.record(now - t0)
+        return self
+
+    def __exit__(self, *exc):
+        self.hold.record(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+        return False
+
+    def acquire(self, blocking=True, timeout=-1):
+        return self._lock.acquire(blocking, timeout)
+
+    def release(self):
+        self._lock.release()
+
+
+# ==========================
+# Prometheus 文本格式
+# ==========================
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def to_prometheus(snap, prefix='olsr'):
+    """把 OLSRNode.metrics_snapshot() 的结果转成 Prometheus 文本格式"""
+    lines = []
+    node = _label(snap.get('node', ''))
+
+    lines.append(f'# TYPE {prefix}_latency_seconds histogram')
+    for op, h in sorted(snap['latency'].items()):
+        seen = 0
+        for i, n in enumerate(h['buckets'][:-1]):
+            seen += n
+            lines.append(f'{prefix}_latency_seconds_bucket{{node="{node}",op="{_label(op)}",'
+                         f'le="{LatencyHistogram.bound(i):.6g}"}} {seen}')
+        lines.append(f'{prefix}_latency_seconds_bucket{{node="{node}",op="{_label(op)}",le="+Inf"}} {h["count"]}')
+        lines.append(f'{prefix}_latency_seconds_sum{{node="{node}",op="{_label(op)}"}} {h["sum"]:.9f}')
+        lines.append(f'{prefix}_latency_seconds_count{{node="{node}",op="{_label(op)}"}} {h["count"]}')
+
+    for name, value in sorted(snap['counters'].items()):
+        lines.append(f'# TYPE {prefix}_{name}_total counter')
+        if isinstance(value, dict):
+            for label, n in sorted(value.items(), key=lambda kv: str(kv[0])):
+                lines.append(f'{prefix}_{name}_total{{node="{node}",type="{_label(label)}"}} {n}')
+        else:
+            lines.append(f'{prefix}_{name}_total{{node="{node}"}} {value}')
+
+    lines.append(f'# TYPE {prefix}_table_size gauge')
+    for table, size in sorted(snap.get('tables', {}).items()):
+        lines.append(f'{prefix}_table_size{{node="{node}",table="{_label(table)}"}} {size}')
+
+    # 其余模块的统计 (recompute / tx / rx / egress / data / route_install) 里的数值项按 gauge 输出
+    for section in ('recompute', 'tx', 'rx', 'egress', 'data', 'route_install'):
+        values = snap.get(section)
+        if not isinstance(values, dict):
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            lines.append(f'{prefix}_{section}_{key}{{node="{node}"}} {value}')
+    lines.append(f'{prefix}_uptime_seconds{{node="{node}"}} {snap["uptime"]:.3f}')
+    return "\n".join(lines) + "\n"
+
+
+# ==========================
+# 本地统计查询接口
+# ==========================
+class _StatsHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(1024).decode('ascii', 'replace').strip()
+        http = line.startswith('GET ')
+        if http:
+            path = line.split()[1] if len(line.split()) > 1 else '/'
+            while self.rfile.readline(1024).strip():
+                pass  # 丢掉 HTTP 请求头
+            fmt = 'prometheus' if path.startswith('/metrics') else 'json'
+        else:
+            fmt = 'prometheus' if line.lower() in ('prometheus', 'prom', 'metrics') else 'json'
+
+        snap = self.server.collect()
+        if fmt == 'prometheus':
+            body, ctype = to_prometheus(snap), 'text/plain; version=0.0.4'
+        else:
+            body, ctype = json.dumps(snap, indent=1) + "\n", 'application/json'
+        data = body.encode()
+        if http:
+            self.wfile.write(f'HTTP/1.0 200 OK\r\nContent-Type: {ctype}\r\n'
+                             f'Content-Length: {len(data)}\r\n\r\n'.encode())
+        self.wfile.write(data)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StatsServer:
+    """
+    在后台线程里提供统计查询：path 为 Unix 域 socket 路径，或 port 为 127.0.0.1 上的 TCP 端口 (0 表示随机)
+    快照在节点的上下文里取：asyncio 模式交给事件循环执行，线程模式在 node.lock 里执行
+    """
+    def __init__(self, node, path=None, port=None):
+        self.node = node
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            self.server = _UnixServer(path, _StatsHandler)
+            self.address = path
+        else:
+            self.server = _TcpServer(('127.0.0.1', port or 0), _StatsHandler)
+            self.address = self.server.server_address
+        self.path = path
+        self.server.collect = self.collect
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def collect(self):
+        node = self.node
+        loop = getattr(node.runtime, 'loop', None)
+        if loop is not None and hasattr(loop, 'call_soon_threadsafe') and loop.is_running():
+            future = Future()
+
+            def run():
+                try:
+                    future.set_result(node.metrics_snapshot())
+                except Exception as e:
+                    future.set_exception(e)
+            loop.call_soon_threadsafe(run)
+            return future.result(timeout=5)
+        with node.lock:
+            return node.metrics_snapshot()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def query(address, fmt='json', timeout=5.0):
+    """查询统计接口：address 为 Unix 域 socket 路径或本机 TCP 端口"""
+    if isinstance(address, int) or str(address).isdigit():
+        sock = socket.create_connection(('127.0.0.1', int(address)), timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    with sock:
+        sock.sendall(fmt.encode() + b"\n")
+        chunks = []
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            chunks.append(data)
+    return b"".join(chunks).decode()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("用法: python3 metrics.py <socket 路径 | 端口> [json|prometheus]")
+        sys.exit(1)
+    print(query(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'json'), end='')
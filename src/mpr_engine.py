@@ -0,0 +1,205 @@
+'''
+本文件实现增量式 MPR 选择引擎
+
+原来 recalculate_mpr 每次都要重建 candidates、调 get_reachability_map()
+(里面 get_symmetric_neighbors / get_strict_2hop_neighbors 各扫一遍 two_hop_set)，再从头跑 select_mpr。
+现在把 MPR 选择需要的数据作为常驻索引，由 NeighborManager 在元组增删时逐条更新：
+1. coverage  : { 对称邻居: set(它能覆盖的严格二跳) }
+2. providers : { 严格二跳: set(能覆盖它的对称邻居) }，反向索引
+3. sole      : 只有一个提供者的严格二跳 (RFC 8.3.1 步骤 2 的 "唯一路径")
+一条二跳元组出现/消失时只改动这一对 (邻居, 二跳) 相关的索引项；
+邻居对称状态翻转时只改动经过它 / 指向它的那些元组。
+
+select() 直接在索引上执行和 select_mpr 完全相同的规则：
+- 步骤 1/2 直接取 WILL_ALWAYS 邻居和 sole 的提供者
+- 步骤 3 用惰性最大堆维护每个候选的剩余覆盖数，选中一个 MPR 后
+  只对它新覆盖的二跳的提供者做减法，不再每轮对所有候选重新求交集
+- 步骤 4 冗余删除与 select_mpr 共用 remove_redundant_mprs
+打平规则 (覆盖数 > 意愿值 > 初始度数 > 邻居加入顺序) 与 select_mpr 一致，结果完全相同
+'''
+import heapq
+
+from constants import WILL_ALWAYS, WILL_NEVER
+from mpr_selector import remove_redundant_mprs
+
+
+class MPREngine:
+    def __init__(self, my_ip):
+        self.my_ip = my_ip
+
+        # --- 原始数据 ---
+        self.willingness = {}   # { 邻居: 意愿值 }
+        self.rank = {}          # { 邻居: 加入顺序 }，和 NeighborManager.neighbors 的字典顺序一致
+        self._next_rank = 0
+        self.sym = set()        # 对称邻居
+        self.links = {}         # { 邻居: set(二跳) }，所有二跳元组，不论邻居是否对称
+        self.via = {}           # { 二跳: set(邻居) }
+
+        # --- 常驻索引 ---
+        self.coverage = {}      # { 对称邻居: set(严格二跳) }
+        self.providers = {}     # { 严格二跳: set(对称邻居) }
+        self.sole = set()       # 只有一个提供者的严格二跳
+
+    # ==========================
+    # 索引维护
+    # ==========================
+    def _is_strict(self, two_hop_ip):
+        return two_hop_ip != self.my_ip and two_hop_ip not in self.sym
+
+    def _cover(self, neighbor_ip, two_hop_ip):
+        self.coverage[neighbor_ip].add(two_hop_ip)
+        provs = self.providers.setdefault(two_hop_ip, set())
+        provs.add(neighbor_ip)
+        if len(provs) == 1:
+            self.sole.add(two_hop_ip)
+        else:
+            self.sole.discard(two_hop_ip)
+
+    def _uncover(self, neighbor_ip, two_hop_ip):
+        self.coverage[neighbor_ip].discard(two_hop_ip)
+        provs = self.providers.get(two_hop_ip)
+        if provs is None:
+            return
+        provs.discard(neighbor_ip)
+        if len(provs) == 1:
+            self.sole.add(two_hop_ip)
+        else:
+            self.sole.discard(two_hop_ip)
+            if not provs:
+                del self.providers[two_hop_ip]
+
+    # ==========================
+    # 增量接口 (由 NeighborManager 调用)
+    # ==========================
+    def add_neighbor(self, neighbor_ip, willingness):
+        if neighbor_ip not in self.rank:
+            self.rank[neighbor_ip] = self._next_rank
+            self._next_rank += 1
+        self.willingness[neighbor_ip] = willingness
+
+    def set_willingness(self, neighbor_ip, willingness):
+        self.willingness[neighbor_ip] = willingness
+
+    def set_symmetric(self, neighbor_ip, is_sym):
+        """邻居对称状态翻转"""
+        if is_sym == (neighbor_ip in self.sym):
+            return
+        if is_sym:
+            self.sym.add(neighbor_ip)
+            # 它成了对称邻居，就不再是任何人的严格二跳
+            for p in list(self.providers.get(neighbor_ip, ())):
+                self._uncover(p, neighbor_ip)
+            self.coverage[neighbor_ip] = set()
+            for t in self.links.get(neighbor_ip, ()):
+                if self._is_strict(t):
+                    self._cover(neighbor_ip, t)
+        else:
+            for t in list(self.coverage[neighbor_ip]):
+                self._uncover(neighbor_ip, t)
+            del self.coverage[neighbor_ip]
+            self.sym.discard(neighbor_ip)
+            # 它可能重新成为严格二跳
+            if self._is_strict(neighbor_ip):
+                for p in self.via.get(neighbor_ip, ()):
+                    if p in self.sym:
+                        self._cover(p, neighbor_ip)
+
+    def remove_neighbor(self, neighbor_ip):
+        self.set_symmetric(neighbor_ip, False)
+        self.willingness.pop(neighbor_ip, None)
+        self.rank.pop(neighbor_ip, None)
+
+    def add_two_hop(self, neighbor_ip, two_hop_ip):
+        self.links.setdefault(neighbor_ip, set()).add(two_hop_ip)
+        self.via.setdefault(two_hop_ip, set()).add(neighbor_ip)
+        if neighbor_ip in self.sym and self._is_strict(two_hop_ip):
+            self._cover(neighbor_ip, two_hop_ip)
+
+    def remove_two_hop(self, neighbor_ip, two_hop_ip):
+        targets = self.links.get(neighbor_ip)
+        if targets is None or two_hop_ip not in targets:
+            return
+        targets.discard(two_hop_ip)
+        if not targets:
+            del self.links[neighbor_ip]
+        provs = self.via[two_hop_ip]
+        provs.discard(neighbor_ip)
+        if not provs:
+            del self.via[two_hop_ip]
+        if neighbor_ip in self.sym:
+            self._uncover(neighbor_ip, two_hop_ip)
+
+    # ==========================
+    # 选择
+    # ==========================
+    def select(self):
+        """
+        在常驻索引上执行 RFC 3626 Section 8.3.1，结果与
+        select_mpr(candidates, coverage_map) 完全相同
+        """
+        coverage = self.coverage
+        providers = self.providers
+        willingness = self.willingness
+        mpr_set = set()
+        covered = set()
+
+        # --- 步骤 1: 必须选 WILL_ALWAYS ---
+        for ip in self.sym:
+            if willingness[ip] == WILL_ALWAYS:
+                mpr_set.add(ip)
+                covered |= coverage[ip]
+
+        # --- 步骤 2: 唯一路径提供者 ---
+        for t in self.sole:
+            if t not in covered:
+                mpr_set.add(next(iter(providers[t])))
+        for ip in mpr_set:
+            covered |= coverage[ip]
+
+        # --- 步骤 3: 贪婪，惰性最大堆维护剩余覆盖数 ---
+        if len(covered) < len(providers):
+            self._greedy(mpr_set, covered)
+
+        # --- 步骤 4: 冗余删除 ---
+        return remove_redundant_mprs(mpr_set, willingness, coverage, self.rank)
+
+    def _greedy(self, mpr_set, covered):
+        coverage = self.coverage
+        providers = self.providers
+        willingness = self.willingness
+        residual = {}
+        heap = []
+        for ip in self.sym:
+            if ip in mpr_set or willingness[ip] == WILL_NEVER:
+                continue
+            reach = len(coverage[ip]) - len(coverage[ip] & covered) if covered else len(coverage[ip])
+            if reach == 0:
+                continue
+            residual[ip] = reach
+            heap.append((-reach, -willingness[ip], -len(coverage[ip]), self.rank[ip], ip))
+        heapq.heapify(heap)
+
+        remaining = len(providers) - len(covered)
+        while remaining and heap:
+            neg_reach, neg_will, neg_degree, rank, ip = heapq.heappop(heap)
+            reach = residual[ip]
+            if reach != -neg_reach:
+                # 堆项已过期 (剩余覆盖数只会减少)，按当前值重新入堆
+                if reach > 0:
+                    heapq.heappush(heap, (-reach, neg_will, neg_degree, rank, ip))
+                continue
+
+            mpr_set.add(ip)
+            for t in coverage[ip]:
+                if t in covered:
+                    continue
+                covered.add(t)
+                remaining -= 1
+                # 只有覆盖 t 的那些候选剩余覆盖数会变
+                for p in providers[t]:
+                    if p in residual:
+                        residual[p] -= 1
+
+    def coverage_map(self):
+        """select_mpr 所需的 coverage_map，用于对照检查"""
+        return {ip: set(targets) for ip, targets in self.coverage.items()}
@@ -1,8 +1,11 @@
+import heapq
+
 from constants import WILL_ALWAYS, WILL_NEVER
 
-def select_mpr(candidates, coverage_map):
+
+def select_mpr_legacy(candidates, coverage_map):
     """
-    执行 RFC 3626 Section 8.3.1 的 MPR 选择算法
+    执行 RFC 3626 Section 8.3.1 的 MPR 选择算法 (原来的集合实现，不含步骤 4，保留用于基准对比)
     
     :param candidates: 字典 {neighbor_ip: willingness}, 包含所有候选的对称 1跳邻居
     :param coverage_map: 字典 {neighbor_ip: set(2hop_ips)}, 每个邻居能覆盖的严格 2跳邻居集合
@@ -120,4 +123,116 @@ def select_mpr(candidates, coverage_map):
     
     # 这部分可以适当优化
 
-    return mpr_set
\ No newline at end of file
+    return mpr_set
+
+
+# ======================================================================
+# 高性能实现：位集 + 惰性最大堆 + RFC 步骤 4
+# ======================================================================
+# 上面的 select_mpr_legacy 中 build_reverse_map 是 O(|N2| x |N|) 次集合查找，
+# 贪婪循环每一轮都要对每个候选重新求 len(coverage & strict_2hop_set)，最坏 O(|N|^2 x |N2|)，
+# 邻居多 (蜂群里 60+ 个) 时很慢。下面的 select_mpr：
+# 1. 给严格二跳编一个稠密下标，每个邻居的覆盖集合变成一个 Python 整数位集，交/并/差都是整数位运算
+# 2. "唯一路径" 用 once / twice 两个位集一次扫描求出
+# 3. 贪婪用惰性最大堆，键为 (覆盖数, 意愿值, 初始度数)，弹出时覆盖数过期就按当前值重新入堆
+# 4. 实现 RFC 3626 8.3.1 的可选步骤 4：冗余 MPR 删除
+
+def _popcount(x):
+    return x.bit_count()
+
+
+def remove_redundant_mprs(mpr_set, willingness, coverage_map, rank):
+    """
+    RFC 3626 Section 8.3.1 步骤 4 (优化)：
+    按意愿值升序 (同意愿值按 rank 顺序) 检查每个 MPR，如果去掉它以后所有严格二跳仍然至少被一个 MPR 覆盖，
+    且它的意愿值不是 WILL_ALWAYS，就把它从 MPR 集合中删除
+    :param willingness: {neighbor_ip: willingness}
+    :param coverage_map: {neighbor_ip: set(2hop_ips)}
+    :param rank: {neighbor_ip: 顺序}，用于意愿值相同时的确定顺序
+    """
+    counts = {}
+    for ip in mpr_set:
+        for t in coverage_map.get(ip, ()):
+            counts[t] = counts.get(t, 0) + 1
+
+    for ip in sorted(mpr_set, key=lambda ip: (willingness.get(ip, WILL_NEVER), rank.get(ip, -1))):
+        if willingness.get(ip) == WILL_ALWAYS:
+            continue
+        covered = coverage_map.get(ip, ())
+        if all(counts[t] > 1 for t in covered):
+            mpr_set.discard(ip)
+            for t in covered:
+                counts[t] -= 1
+    return mpr_set
+
+
+def select_mpr(candidates, coverage_map):
+    """
+    执行 RFC 3626 Section 8.3.1 的 MPR 选择算法 (位集 + 惰性堆实现，含步骤 4)
+    步骤 1-3 的结果与 select_mpr_legacy 完全相同，之后再做冗余删除
+
+    :param candidates: 字典 {neighbor_ip: willingness}, 包含所有候选的对称 1跳邻居
+    :param coverage_map: 字典 {neighbor_ip: set(2hop_ips)}, 每个邻居能覆盖的严格 2跳邻居集合
+    :return: 集合 set(mpr_ips), 被选为 MPR 的节点 IP
+    """
+    mpr_set = set()
+    rank = {ip: i for i, ip in enumerate(candidates)}
+
+    # 严格二跳编稠密下标，覆盖集合转成整数位集
+    index = {}
+    bits = {}
+    for ip, covered_nodes in coverage_map.items():
+        mask = 0
+        for t in covered_nodes:
+            i = index.get(t)
+            if i is None:
+                i = index[t] = len(index)
+            mask |= 1 << i
+        bits[ip] = mask
+    full = (1 << len(index)) - 1
+
+    # --- 步骤 1: 必须选 Willingness = WILL_ALWAYS 的节点 ---
+    covered = 0
+    for ip, will in candidates.items():
+        if will == WILL_ALWAYS:
+            mpr_set.add(ip)
+            covered |= bits.get(ip, 0)
+
+    # --- 步骤 2: 选择"唯一路径"提供者 ---
+    # once: 至少被一个邻居覆盖；twice: 至少被两个邻居覆盖
+    once = twice = 0
+    for mask in bits.values():
+        twice |= once & mask
+        once |= mask
+    sole = once & ~twice & ~covered
+    if sole:
+        for ip, mask in bits.items():
+            if mask & sole:
+                mpr_set.add(ip)
+                covered |= mask
+
+    # --- 步骤 3: 贪婪，惰性最大堆 ---
+    if covered != full:
+        heap = []
+        for ip, will in candidates.items():
+            if ip in mpr_set or will == WILL_NEVER:
+                continue
+            mask = bits.get(ip, 0)
+            reach = _popcount(mask & ~covered)
+            if reach:
+                heap.append((-reach, -will, -_popcount(mask), rank[ip], ip))
+        heapq.heapify(heap)
+
+        while heap and covered != full:
+            neg_reach, neg_will, neg_degree, r, ip = heapq.heappop(heap)
+            reach = _popcount(bits[ip] & ~covered)
+            if reach != -neg_reach:
+                # 覆盖数已经变小，按当前值重新入堆
+                if reach:
+                    heapq.heappush(heap, (-reach, neg_will, neg_degree, r, ip))
+                continue
+            mpr_set.add(ip)
+            covered |= bits[ip]
+
+    # --- 步骤 4: 冗余删除 ---
+    return remove_redundant_mprs(mpr_set, candidates, coverage_map, rank)
@@ -0,0 +1,195 @@
+'''
+本文件是基于 memoryview 的零拷贝解析层
+
+原来的 process_packet / parse_hello_body / parse_tc_body 对每个包头、每个 Link Message、每个 4 字节地址都要
+切一次 bytes，再用格式字符串调 struct.unpack 和 socket.inet_ntoa，一个数据包就要产生几十次内存分配。
+这里的做法：
+1. 所有 struct 格式预编译为 struct.Struct 对象，统一用 unpack_from 直接在 memoryview 上读，不切片
+2. 只读的消息视图 (MessageView / HelloView / TCView) 只解析固定头部；
+   地址列表在处理函数第一次真正用到时才解码，并缓存结果
+3. HelloView / TCView 支持 hello_info['neighbor_groups'] 这种字典式访问，原有处理函数不用改
+4. 地址直接解码为 32 位整数 (见 node_addr.py)，不再经过 inet_ntoa 字符串
+'''
+import struct
+from functools import lru_cache
+
+from pkt_msg_fmt import decode_mantissa
+
+# ==========================
+# 预编译的 struct 对象
+# ==========================
+PKT_HEADER = struct.Struct('!HH')             # Packet Length(2), Packet Seq(2)
+MSG_HEADER = struct.Struct('!BBHIBBH')        # Type, Vtime, Size, Originator(int), TTL, Hop, Seq
+HELLO_FIXED = struct.Struct('!HBB')           # Reserved(2), Htime(1), Willingness(1)
+LINK_MSG_HEADER = struct.Struct('!BBH')       # Link Code(1), Reserved(1), Link Message Size(2)
+TC_FIXED = struct.Struct('!HH')               # ANSN(2), Reserved(2)
+
+# 消息头中 TTL / Hop Count 字段的字节偏移，转发时原地改写
+MSG_TTL_OFFSET = 8
+MSG_HOP_OFFSET = 9
+
+
+@lru_cache(maxsize=512)
+def _addr_struct(count):
+    """count 个连续 IPv4 地址的预编译 struct，一次 unpack_from 取出全部地址"""
+    return struct.Struct(f'!{count}I')
+
+
+def decode_addresses(buf, offset, count):
+    """从 buf[offset:] 解码 count 个 IPv4 地址为 32 位整数"""
+    if count <= 0:
+        return []
+    return list(_addr_struct(count).unpack_from(buf, offset))
+
+
+class MessageView:
+    """
+    单条 OLSR 消息的只读视图 (Message Header + Body)
+    只保存在原始缓冲区里的偏移，不复制数据
+    """
+    __slots__ = ('buf', 'offset', 'msg_type', 'vtime', 'size',
+                 'orig_ip', 'ttl', 'hop', 'seq')
+
+    def __init__(self, buf, offset):
+        self.buf = buf
+        self.offset = offset
+        (self.msg_type, self.vtime, self.size, self.orig_ip,
+         self.ttl, self.hop, self.seq) = MSG_HEADER.unpack_from(buf, offset)
+
+    @property
+    def validity_time(self):
+        return decode_mantissa(self.vtime)
+
+    @property
+    def body(self):
+        """消息体的 memoryview (不复制)"""
+        return self.buf[self.offset + MSG_HEADER.size:self.offset + self.size]
+
+    @property
+    def raw(self):
+        """整条消息 (Header + Body) 的 memoryview，用于转发"""
+        return self.buf[self.offset:self.offset + self.size]
+
+    def hello(self):
+        return HelloView(self.buf, self.offset + MSG_HEADER.size, self.offset + self.size)
+
+    def tc(self):
+        return TCView(self.buf, self.offset + MSG_HEADER.size, self.offset + self.size)
+
+
+def iter_messages(data):
+    """
+    遍历一个 UDP 包中的所有消息，逐条产出 MessageView
+    消息长度非法 (小于消息头或越界) 时停止解析
+    """
+    buf = memoryview(data)
+    end = len(buf)
+    cursor = PKT_HEADER.size
+    header_size = MSG_HEADER.size
+
+    while end - cursor >= header_size:
+        msg = MessageView(buf, cursor)
+        if msg.size < header_size or cursor + msg.size > end:
+            break
+        yield msg
+        cursor += msg.size
+
+
+class HelloView:
+    """
+    HELLO 消息体视图
+    固定头部立即解析；neighbor_groups 在第一次访问时才解码，兼容 hello_info 字典的读法
+    """
+    __slots__ = ('buf', 'start', 'end', 'htime_seconds', 'willingness', '_groups')
+
+    def __init__(self, buf, start, end):
+        if end - start < HELLO_FIXED.size:
+            raise ValueError("HELLO body too short")
+        self.buf = buf
+        self.start = start
+        self.end = end
+        _, htime_byte, self.willingness = HELLO_FIXED.unpack_from(buf, start)
+        self.htime_seconds = decode_mantissa(htime_byte)
+        self._groups = None
+
+    def iter_link_messages(self):
+        """逐个产出 (link_code, 地址起始偏移, 地址个数)，不解码地址"""
+        buf = self.buf
+        end = self.end
+        cursor = self.start + HELLO_FIXED.size
+        lm_header_size = LINK_MSG_HEADER.size
+
+        while end - cursor >= lm_header_size:
+            link_code, _, lm_size = LINK_MSG_HEADER.unpack_from(buf, cursor)
+            if lm_size < lm_header_size:
+                break
+            lm_end = min(cursor + lm_size, end)
+            count = (lm_end - cursor - lm_header_size) // 4
+            yield link_code, cursor + lm_header_size, count
+            cursor += lm_size
+
+    @property
+    def neighbor_groups(self):
+        if self._groups is None:
+            self._groups = [
+                (link_code, decode_addresses(self.buf, offset, count))
+                for link_code, offset, count in self.iter_link_messages()
+            ]
+        return self._groups
+
+    # --- 兼容 hello_info 字典的访问方式 ---
+    def __getitem__(self, key):
+        if key == 'neighbor_groups':
+            return self.neighbor_groups
+        if key == 'htime_seconds':
+            return self.htime_seconds
+        if key == 'willingness':
+            return self.willingness
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class TCView:
+    """
+    TC 消息体视图
+    ANSN 立即解析；advertised_neighbors 在第一次访问时才解码
+    """
+    __slots__ = ('buf', 'start', 'end', 'ansn', '_neighbors')
+
+    def __init__(self, buf, start, end):
+        if end - start < TC_FIXED.size:
+            raise ValueError("TC body too short")
+        self.buf = buf
+        self.start = start
+        self.end = end
+        self.ansn, _ = TC_FIXED.unpack_from(buf, start)
+        self._neighbors = None
+
+    @property
+    def neighbor_count(self):
+        return (self.end - self.start - TC_FIXED.size) // 4
+
+    @property
+    def advertised_neighbors(self):
+        if self._neighbors is None:
+            self._neighbors = decode_addresses(self.buf, self.start + TC_FIXED.size, self.neighbor_count)
+        return self._neighbors
+
+    # --- 兼容 tc_info 字典的访问方式 ---
+    def __getitem__(self, key):
+        if key == 'advertised_neighbors':
+            return self.advertised_neighbors
+        if key == 'ansn':
+            return self.ansn
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
@@ -1,8 +1,13 @@
-import time
-
+import logging
 
 from constants import *
 from mpr_selector import select_mpr
+from mpr_engine import MPREngine
+from expiry_scheduler import ExpiryScheduler
+from olsr_log import get_logger, Addr, Addrs
+
+log = get_logger('neighbor')
+mpr_log = get_logger('mpr')
 
 
 # from neigh_detec import NeighborTuple, TwoHopTuple 
@@ -27,15 +32,43 @@ class MPRSelectorTuple:
 
 # 管理一跳邻居节点以及二跳邻居
 class NeighborManager:
-    def __init__(self, my_ip):
+    def __init__(self, my_ip, expiry=None):
         self.my_ip = my_ip
-        self.neighbors = {}      # { 'ip': NeighborTuple }
-        self.two_hop_set = {}    # { ('neighbor_ip', 'two_hop_ip'): TwoHopTuple }
+        # 共享的过期调度器 (由 OLSRNode 传入，单独使用时自建一个)
+        self.expiry = expiry if expiry is not None else ExpiryScheduler()
+        self.neighbors = {}      # { 邻居地址(int): NeighborTuple }
+        self.two_hop_set = {}    # { (邻居地址, 二跳地址): TwoHopTuple }，地址均为 int
         self.current_mpr_set = set()     # 选为mpr节点的集合
         # 【新增】MPR Selector Set
         # 格式: { 'selector_ip': MPRSelectorTuple }
         self.mpr_selectors = {}  #自己被哪些节点选作了mpr节点
 
+        # 增量 MPR 引擎：覆盖关系、反向映射等作为常驻索引随元组增删更新 (见 mpr_engine.py)
+        self.mpr_engine = MPREngine(my_ip)
+
+        # 路由引擎 (DynamicSPF)，由 RoutingManager 注册，用于接收 我->邻居、邻居->二跳 这两类边的增删
+        self.route_listener = None
+
+        # 重算标记：由 RecomputeScheduler 读取并决定何时真正重算
+        self.mpr_dirty = False         # MPR 选择的输入发生了变化
+        self.critical_change = False   # 出现新的对称链路或链路丢失，需要立即重算
+
+    def _edge_added(self, u, v):
+        if self.route_listener is not None:
+            self.route_listener.add_edge(u, v)
+
+    def _edge_removed(self, u, v):
+        if self.route_listener is not None:
+            self.route_listener.remove_edge(u, v)
+
+    def _set_neighbor_edges(self, neighbor_ip, added):
+        """邻居对称状态翻转时，我->邻居 以及 邻居->二跳 的边一起加入/撤出路由图"""
+        notify = self._edge_added if added else self._edge_removed
+        notify(self.my_ip, neighbor_ip)
+        for (n_ip, two_hop_ip) in self.two_hop_set:
+            if n_ip == neighbor_ip:
+                notify(n_ip, two_hop_ip)
+
     def update_neighbor_status(self, neighbor_ip, willingness, is_link_sym):
         """
         这里只是更新邻居状态
@@ -47,23 +80,36 @@ class NeighborManager:
         """
         if neighbor_ip not in self.neighbors:# 判断某邻居ip是不是在neighbors这个字典的键里面
             self.neighbors[neighbor_ip] = NeighborTuple(neighbor_ip) #不在的话就用这个ip生成一个邻居元组作为值放到邻居节点的字典里面去
+            self.mpr_engine.add_neighbor(neighbor_ip, willingness)
         
         neigh = self.neighbors[neighbor_ip]# 取出邻居tuple，然后更新传入参数对应的几个值
-        neigh.willingness = willingness
+        if neigh.willingness != willingness:
+            neigh.willingness = willingness
+            self.mpr_engine.set_willingness(neighbor_ip, willingness)
+            self.mpr_dirty = True
+        old_status = neigh.status
         
         # 只要有一个对称链路，邻居状态就是 SYM
         if is_link_sym:
             neigh.status = 1 # SYM_NEIGH
         else:
             neigh.status = 0 # NOT_NEIGH
+
+        if neigh.status != old_status:
+            self._set_neighbor_edges(neighbor_ip, neigh.status == 1)
+            self.mpr_engine.set_symmetric(neighbor_ip, neigh.status == 1)
+            self.mpr_dirty = True
+            self.critical_change = True
             
-        print(f"[NeighborSet] 更新邻居 {neighbor_ip}: Status={neigh.status}, Will={neigh.willingness}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("更新邻居 %s: Status=%d, Will=%d", Addr(neighbor_ip), neigh.status, neigh.willingness)
 
     def process_2hop_neighbors(self, sender_ip, hello_info, validity_time, current_time):
         """
         处理 HELLO 消息(中的neighbor_groups)以更新 2跳邻居集
         """
         # validity_time = hello_info['htime_seconds'] * 3  这里不再使用固定值 而是传入
+        debug = log.isEnabledFor(logging.DEBUG)     # 循环里的 debug 日志只在开启时才构造 Addr
         for link_code, ip_list in hello_info['neighbor_groups']:
             # 解析 Link Code (Bit 2-3 是 Neighbor Type)
             neigh_type = (link_code >> 2) & 0x03
@@ -74,19 +120,37 @@ class NeighborManager:
                     if two_hop_ip == self.my_ip: continue # 排除自己
                     #否则的话就是自己的二跳邻居，然后构筑二跳邻居存储的字典
                     key = (sender_ip, two_hop_ip)
-                    if key not in self.two_hop_set:
-                        print(f"[2-Hop] 发现: me -> {sender_ip} -> {two_hop_ip}")
-                        self.two_hop_set[key] = TwoHopTuple(sender_ip, two_hop_ip)# 写入字典
+                    two_hop = self.two_hop_set.get(key)
+                    if two_hop is None:
+                        if debug:
+                            log.debug("发现二跳邻居: me -> %s -> %s", Addr(sender_ip), Addr(two_hop_ip))
+                        two_hop = TwoHopTuple(sender_ip, two_hop_ip)
+                        self.two_hop_set[key] = two_hop# 写入字典
+                        self.expiry.schedule(current_time + validity_time, self._expire_two_hop, two_hop)
+                        self.mpr_engine.add_two_hop(sender_ip, two_hop_ip)
+                        if self._is_sym(sender_ip):
+                            self._edge_added(sender_ip, two_hop_ip)
+                        self.mpr_dirty = True
                     
-                    self.two_hop_set[key].expiration_time = current_time + validity_time
+                    # 刷新过期时间即可，过期调度器到期时会发现它被刷新过并重新入堆
+                    two_hop.expiration_time = current_time + validity_time
 
             # 规则 2: 如果对方说 NOT_NEIGH(0)，删除记录
             elif neigh_type == 0:
                 for two_hop_ip in ip_list:
                     key = (sender_ip, two_hop_ip)
                     if key in self.two_hop_set:
-                        print(f"[2-Hop] 链路断开: {sender_ip} -x-> {two_hop_ip}")
+                        if debug:
+                            log.debug("二跳链路断开: %s -x-> %s", Addr(sender_ip), Addr(two_hop_ip))
                         del self.two_hop_set[key]
+                        self.mpr_engine.remove_two_hop(sender_ip, two_hop_ip)
+                        if self._is_sym(sender_ip):
+                            self._edge_removed(sender_ip, two_hop_ip)
+                        self.mpr_dirty = True
+
+    def _is_sym(self, neighbor_ip):
+        neigh = self.neighbors.get(neighbor_ip)
+        return neigh is not None and neigh.status == 1
 
 
     # 下面获取一些要来进行MPR选择算法计算的数据内容：一跳对称邻居有哪些。二跳有哪些。需要注意只有对称的邻居才能够进行收发，才能够选作MPR节点
@@ -135,10 +199,26 @@ class NeighborManager:
         """
         准备数据并调用算法
         """
-        print("[MPR] 开始重算 MPR...")
+        mpr_log.debug("开始重算 MPR")
+        self.mpr_dirty = False
+        
+        # 覆盖关系、反向映射已经由增删元组时增量维护，这里直接在索引上选择
+        # (结果与 recalculate_mpr_full 从头计算完全相同)
+        new_mpr_set = self.mpr_engine.select()
         
+        if new_mpr_set != self.current_mpr_set:
+            mpr_log.info("MPR 集合更新: %s -> %s", Addrs(self.current_mpr_set), Addrs(new_mpr_set))
+            self.current_mpr_set = new_mpr_set
+        elif mpr_log.isEnabledFor(logging.DEBUG):
+            # Addrs 会复制整个集合，只在 debug 级别才构造
+            mpr_log.debug("MPR 集合未变: %s", Addrs(self.current_mpr_set))
+            
+        return self.current_mpr_set
+    
+    
+    def recalculate_mpr_full(self):
+        """从头准备数据并调用 select_mpr (原来的做法)，只返回结果，不修改 current_mpr_set，用于对照检查"""
         # 1. 准备 candidates 字典 {ip: willingness}
-        # 直接在这里遍历，替代了原先的冗余的 _get_symmetric_neighbors_data
         # 这个和前面的获取一跳邻居集合保持一致，不过这里是字典是键值对
         candidates = {
             ip: neigh.willingness 
@@ -146,21 +226,11 @@ class NeighborManager:
             if neigh.status == 1
         }
         # 2. 准备 coverage_map 字典 {neighbor_ip: set(strict_2hop_ips)}
-        # 这里是直接调用的前面的覆盖关系映射的函数
         coverage_map = self.get_reachability_map()
         
         # 3. 调用独立算法模块
-        new_mpr_set = select_mpr(candidates, coverage_map)
-        
-        if new_mpr_set != self.current_mpr_set:
-            print(f"[MPR] MPR集合更新: {self.current_mpr_set} -> {new_mpr_set}")
-            self.current_mpr_set = new_mpr_set
-        else:
-            print(f"[MPR] MPR集合未变: {self.current_mpr_set}")
-            
-        return self.current_mpr_set
-    
-    
+        return select_mpr(candidates, coverage_map)
+
     # 处理MPR selector更新
     def process_mpr_selector(self, sender_ip, hello_info, validity_time, current_time):
         """
@@ -182,30 +252,66 @@ class NeighborManager:
         
         # 更新 MPR Selector Set
         if am_i_selected:
-            if sender_ip not in self.mpr_selectors:
-                print(f"[MPR Selector] {sender_ip} 选我做 MPR 了！")
-                self.mpr_selectors[sender_ip] = MPRSelectorTuple(sender_ip)
+            selector = self.mpr_selectors.get(sender_ip)
+            if selector is None:
+                mpr_log.info("%s 选我做 MPR", Addr(sender_ip))
+                selector = MPRSelectorTuple(sender_ip)
+                self.mpr_selectors[sender_ip] = selector
+                self.expiry.schedule(current_time + validity_time, self._expire_mpr_selector, selector)
             
             # 更新过期时间 [cite: 1051]
-            self.mpr_selectors[sender_ip].expiration_time = current_time + validity_time
+            selector.expiration_time = current_time + validity_time
         
         # 注意：如果对方没再选我（hello里没我有我但类型变了），这里暂时依靠过期机制删除
         # RFC 并没有要求立即删除，而是依赖 Timer Expiration (RFC 8.4.1)
     
-    def cleanup(self):
-        """清理过期记录"""
-        now = time.time()
-        # 清理 2跳
-        keys_to_remove = [k for k, v in self.two_hop_set.items() if v.expiration_time < now]
-        for k in keys_to_remove:
-            del self.two_hop_set[k]
-        # (可选) 这里也可以添加清理 neighbors 的逻辑，不过 neighbor 通常跟随 link 状态变化
-        
-        # 清理 MPR Selectors
-        sel_to_remove = [k for k, v in self.mpr_selectors.items() if v.expiration_time < now]
-        for k in sel_to_remove:
-            print(f"[MPR Selector] {k} 的选择已过期")
-            del self.mpr_selectors[k]
+    # ==========================
+    # 过期处理 (由共享的 ExpiryScheduler 在到期时调用)
+    # ==========================
+    def _expire_two_hop(self, two_hop, now):
+        """二跳元组到期：被刷新过则返回新的过期时刻，否则删除"""
+        key = (two_hop.neighbor_main_addr, two_hop.two_hop_addr)
+        if self.two_hop_set.get(key) is not two_hop:
+            return None
+        if two_hop.expiration_time >= now:
+            return two_hop.expiration_time
+
+        del self.two_hop_set[key]
+        self.mpr_engine.remove_two_hop(key[0], key[1])
+        if self._is_sym(key[0]):
+            self._edge_removed(key[0], key[1])
+        self.mpr_dirty = True
+        return None
+
+    def _expire_mpr_selector(self, selector, now):
+        """MPR Selector 元组到期"""
+        if self.mpr_selectors.get(selector.main_addr) is not selector:
+            return None
+        if selector.expiration_time >= now:
+            return selector.expiration_time
+
+        mpr_log.info("%s 的 MPR 选择已过期", Addr(selector.main_addr))
+        del self.mpr_selectors[selector.main_addr]
+        return None
+
+    def remove_neighbor(self, neighbor_ip):
+        """
+        链路记录被删除时同步删除该邻居 (RFC 8.5)：
+        邻居元组、经由它的二跳元组、它对我的 MPR 选择一并删除
+        """
+        neigh = self.neighbors.pop(neighbor_ip, None)
+        if neigh is None:
+            return
+        if neigh.status == 1:
+            # 先撤出路由图中的 我->邻居、邻居->二跳 边
+            self._set_neighbor_edges(neighbor_ip, False)
+            self.critical_change = True
+        for key in [k for k in self.two_hop_set if k[0] == neighbor_ip]:
+            del self.two_hop_set[key]
+            self.mpr_engine.remove_two_hop(key[0], key[1])
+        self.mpr_engine.remove_neighbor(neighbor_ip)
+        self.mpr_selectors.pop(neighbor_ip, None)
+        self.mpr_dirty = True
 
 
 
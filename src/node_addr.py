@@ -0,0 +1,38 @@
+'''
+本文件定义协议内部统一使用的节点地址表示：32 位无符号整数 (网络字节序解释)
+
+原来所有状态表 (LinkSet / NeighborManager / TopologyManager / DuplicateSet / 路由图) 都用点分十进制字符串做 key，
+收包时 inet_ntoa 转成字符串，发包时又 inet_aton 转回字节。现在：
+- 解码器 (msg_view) 直接把 4 字节地址 unpack 成 int，一直用到路由表
+- 编码器 (create_hello_body / create_tc_body / create_message_header) 直接把 int 打包
+- 只有在日志打印和对外接口 (命令行参数、recvfrom 返回的地址、导出路由表) 处才与字符串互转
+'''
+import socket
+import struct
+from functools import lru_cache
+
+_ADDR = struct.Struct('!I')
+
+
+@lru_cache(maxsize=4096)
+def ip_to_int(ip_str):
+    """'192.168.1.5' -> 3232235781"""
+    return _ADDR.unpack(socket.inet_aton(ip_str))[0]
+
+
+@lru_cache(maxsize=4096)
+def int_to_ip(addr):
+    """3232235781 -> '192.168.1.5' (用于日志和对外接口)"""
+    return socket.inet_ntoa(_ADDR.pack(addr))
+
+
+def to_addr(ip):
+    """对外接口的入参既可以是字符串也可以是 int，统一转成内部的 int 表示"""
+    if isinstance(ip, str):
+        return ip_to_int(ip)
+    return ip
+
+
+def fmt_addrs(addrs):
+    """地址集合/列表 -> 便于日志阅读的字符串列表"""
+    return sorted(int_to_ip(a) for a in addrs)
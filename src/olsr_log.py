@@ -0,0 +1,219 @@
+'''
+本文件实现协议栈的日志子系统 (基于标准库 logging)
+
+原来每收到一个 HELLO 就有好几次 print，每次路由重算都把整张路由表打印一遍，而且都在 OLSRNode.lock 里执行；
+stdout 重定向到文件时 (mininet_test.py 就是这么做的) 这些都是锁内的阻塞 I/O。现在：
+1. 按模块分 logger (olsr.link / olsr.neighbor / olsr.mpr / olsr.topology / olsr.routing / olsr.node /
+   olsr.data / olsr.runtime)，每个模块可以单独设置级别，例如 "info,mpr=debug,routing=debug"
+2. 延迟格式化：调用处只传模板和参数 (地址用 Addr / Addrs 包一层)，级别不够时 logger 直接返回，
+   不拼字符串也不转点分十进制；默认级别 (info) 下收包路径上的日志全部是 debug，不做任何格式化。
+   收包 / 重算路径上的 debug 调用还要先判断 log.isEnabledFor(logging.DEBUG)，
+   连 Addr / Addrs 对象也不构造 (Addrs 会复制整个集合)
+3. 限速 / 聚合：同一模块的同一模板按令牌桶限速，被抑制的条数附在下一条输出的日志后面
+4. 异步输出：调用方只把 LogRecord 放进有界队列 (满了就丢，计数)，格式化和写文件都在后台线程里做
+没有调用 configure() 时 (例如作为库使用、仿真)，按 logging 的默认行为只输出 warning 以上的日志
+
+注意：传给日志的参数在后台线程里才格式化，调用方之后不能再修改它们 (Addrs 会先复制一份)
+'''
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+from node_addr import int_to_ip, fmt_addrs
+from constants import LOG_LEVEL, LOG_RATE_LIMIT, LOG_RATE_BURST, LOG_QUEUE_SIZE
+
+ROOT = 'olsr'
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'off': logging.CRITICAL + 10,
+}
+
+_listener = None    # 当前的后台输出线程 (QueueListener)
+_handler = None     # 挂在 olsr logger 上的 AsyncQueueHandler
+
+
+def get_logger(name):
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+class Addr:
+    """地址的延迟格式化：日志真正输出时才转成点分十进制"""
+    __slots__ = ('addr',)
+
+    def __init__(self, addr):
+        self.addr = addr
+
+    def __str__(self):
+        return int_to_ip(self.addr)
+
+
+class Addrs:
+    """地址集合的延迟格式化 (先复制一份，调用方之后修改集合不影响日志)"""
+    __slots__ = ('addrs',)
+
+    def __init__(self, addrs):
+        self.addrs = tuple(addrs)
+
+    def __str__(self):
+        return str(fmt_addrs(self.addrs))
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按 (logger 名, 消息模板) 限速：每个 key 一个令牌桶，rate 条/秒，最多攒 burst 条
+    被抑制的条数记在 key 上，下一条放行的日志带上 record.suppressed
+    """
+    def __init__(self, rate=LOG_RATE_LIMIT, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}       # { (name, msg): [tokens, last, suppressed] }
+        self.suppressed = 0     # 被抑制的总条数
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = record.created
+        state = self.buckets.get(key)
+        if state is None:
+            state = self.buckets[key] = [float(self.burst), now, 0]
+        tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+        state[1] = now
+        if tokens < 1.0:
+            state[0] = tokens
+            state[2] += 1
+            self.suppressed += 1
+            return False
+        state[0] = tokens - 1.0
+        if state[2]:
+            record.suppressed = state[2]
+            state[2] = 0
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把 LogRecord 放进队列：不在调用线程里格式化 (QueueHandler 默认的 prepare 会格式化)，
+    队列满了直接丢弃，绝不阻塞协议线程
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f' (另有 {suppressed} 条相同日志被抑制)'
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON，便于机器处理"""
+    def format(self, record):
+        entry = {
+            'ts': record.created,
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def parse_spec(spec):
+    """
+    "info,mpr=debug,routing=warning" -> (INFO, {'mpr': DEBUG, 'routing': WARNING})
+    """
+    level = LEVELS[LOG_LEVEL]
+    modules = {}
+    for part in (spec or '').split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        name, sep, value = part.partition('=')
+        if not sep:
+            name, value = None, name
+        if value not in LEVELS:
+            raise ValueError(f"unknown log level: {value}")
+        if name is None:
+            level = LEVELS[value]
+        else:
+            modules[name] = LEVELS[value]
+    return level, modules
+
+
+def configure(spec=None, path=None, fmt='text', stream=None, rate=LOG_RATE_LIMIT, burst=LOG_RATE_BURST):
+    """
+    配置 olsr.* 的日志输出 (可以重复调用，后一次覆盖前一次)
+    :param spec: 级别说明，例如 "info,mpr=debug"；None 时取环境变量 OLSR_LOG，再没有就是 LOG_LEVEL
+    :param path: 写到文件，None 时写到 stream (默认 stderr)
+    :param fmt: 'text' 或 'json'
+    :param rate: 同一条日志每秒最多输出的条数，0 表示不限速
+    """
+    global _listener, _handler
+    shutdown()
+    if spec is None:
+        spec = os.environ.get('OLSR_LOG', LOG_LEVEL)
+    level, modules = parse_spec(spec)
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(level)
+    root.propagate = False
+    for name, logger in list(logging.Logger.manager.loggerDict.items()):
+        if name.startswith(ROOT + '.') and isinstance(logger, logging.Logger):
+            logger.setLevel(logging.NOTSET)  # 清掉上一次 configure 的模块级别
+    for name, module_level in modules.items():
+        get_logger(name).setLevel(module_level)
+
+    target = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _handler = AsyncQueueHandler(log_queue)
+    if rate:
+        _handler.addFilter(RateLimitFilter(rate, burst))
+    root.addHandler(_handler)
+    _listener = logging.handlers.QueueListener(log_queue, target)
+    _listener.start()
+    return _handler
+
+
+def shutdown():
+    """停止后台输出线程 (队列里剩下的日志会先写完)"""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger(ROOT).removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown)
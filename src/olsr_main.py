@@ -1,10 +1,10 @@
 '''
 本文件为运行olsr应用层覆盖网络的主程序入口
 '''
+import logging
 import time
-import socket
-import struct
 import threading
+import signal
 import random
 
 # --- 引入各个功能模块 ---
@@ -13,60 +13,170 @@ from neigh_manager import NeighborManager  # 确保文件名匹配
 from topology_manager import TopologyManager
 from routing_manager import RoutingManager
 from flooding_mpp import DuplicateSet
+from recompute_scheduler import RecomputeScheduler
+from expiry_scheduler import ExpiryScheduler
+from batch_rx import BatchReceiver
+from tx_aggregator import TxAggregator
+from data_plane import DataPlane
+from egress import EgressScheduler
+from transport import UdpTransport
+from metrics import Metrics, InstrumentedLock
 
 # --- 引入消息格式处理 ---
-from pkt_msg_fmt import create_packet_header, create_message_header, decode_mantissa
-from hello_msg_body import create_hello_body, parse_hello_body
-from tc_msg_body import create_tc_body, parse_tc_body
+from pkt_msg_fmt import create_message_header
+from hello_msg_body import create_hello_body
+from tc_msg_body import create_tc_body
+from msg_view import iter_messages, PKT_HEADER, MSG_HEADER, MSG_TTL_OFFSET, MSG_HOP_OFFSET
+from node_addr import ip_to_int, int_to_ip, to_addr
+from olsr_log import get_logger, Addr, Addrs
 from constants import *
 
+log = get_logger('node')
+
 class OLSRNode:
-    def __init__(self, my_ip, port=5005):
+    def __init__(self, my_ip, port=5005, route_backend='dynamic', transport=None, clock=time.time):
+        """
+        :param transport: 收发接口，默认 UdpTransport(port)
+        :param clock: 时钟函数，仿真时传入虚拟时钟；所有定时 / 过期判断都用它
+        """
+        # 对外接口传入点分十进制字符串，内部统一使用 32 位整数地址 (见 node_addr.py)
+        my_ip = to_addr(my_ip)
         self.my_ip = my_ip
-        self.port = port
         self.running = True
         
         # --- 1. 初始化网络接口 ---
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.sock.bind(('0.0.0.0', self.port))
+        # 默认绑定真实的 UDP socket；仿真时传入 sim.SimTransport (见 transport.py)
+        self.transport = transport if transport is not None else UdpTransport(port)
+        self.clock = clock
+        self.sock = self.transport.sock
+        self.data_sock = self.transport.data_sock
+        self.port = self.transport.port
+        self.data_port = self.transport.data_port
+        # 批量收包：一次唤醒排空 socket 中已到达的数据报 (见 batch_rx.py)；没有 socket 时由外部调用 process_batch
+        self.receiver = BatchReceiver(self.sock) if self.sock is not None else None
+        # 发送出口：线程模式直接用 transport，asyncio 模式下换成 asyncio transport.sendto
+        self.sendto = self.transport.sendto
+        self.runtime = None  # asyncio 模式下的 AsyncRuntime
+
+        # 运行时统计：各处理函数的延迟直方图 + 按消息类型的计数 (见 metrics.py)，常开
+        self.metrics = Metrics()
+        self.stats_server = None
+        # 热路径上直接用的直方图 / 计数器 (按消息类型计数)
+        self._h_packet = self.metrics.histogram('process_packet')
+        self._h_hello = self.metrics.histogram('process_hello')
+        self._h_tc = self.metrics.histogram('process_tc')
+        self._c_rx = self.metrics.counter('rx_messages')
+        self._c_dup = self.metrics.counter('duplicates')
+        self._c_fwd = self.metrics.counter('forwarded')
         
         # --- 2. 初始化各个管理器 ---
-        self.link_set = LinkSet()
-        self.link_set.my_ip = my_ip
+        # 所有元组集合共用一个过期调度器，只处理真正到期的元组
+        self.expiry = ExpiryScheduler(clock)
+        self.expiry.metrics = self.metrics
+        self.expiry_wakeup = threading.Event()
+        self.expiry.on_earliest_changed = lambda t: self.expiry_wakeup.set()
+
+        self.link_set = LinkSet(my_ip, self.expiry)
+        self.link_set.on_link_lost = self.handle_link_lost
         
-        self.neighbor_manager = NeighborManager(my_ip)
+        self.neighbor_manager = NeighborManager(my_ip, self.expiry)
         
-        self.topology_manager = TopologyManager(my_ip)
+        self.topology_manager = TopologyManager(my_ip, self.expiry)
         
         self.routing_manager = RoutingManager(
             my_ip, 
             self.neighbor_manager, 
-            self.topology_manager
+            self.topology_manager,
+            backend=route_backend
         )
         
-        self.duplicate_set = DuplicateSet()
+        self.duplicate_set = DuplicateSet(self.expiry)
+
+        # 数据面：按路由表单播转发 DATA_MESSAGE，路由变化时清下一跳缓存 (见 data_plane.py)
+        self.data_plane = DataPlane(my_ip, self.data_sock, self.routing_manager.routing_table, self.data_port,
+                                    buffer_size=self.transport.max_datagram)
+        self.routing_manager.on_routes_changed = self._on_routes_changed
+
+        # 内核路由导出：默认不装 (覆盖网络只用自己的数据面)，enable_route_install() 后每次重算提交一个事务
+        self.route_installer = None
+
+        # 出口调度器：控制报文严格优先，数据按下一跳有界排队，可选令牌桶限速 (见 egress.py)
+        self.egress = EgressScheduler(self._broadcast, self._send_data_raw, clock=clock)
+        self.egress_wakeup = threading.Event()
+        self.egress.on_wakeup = lambda t: self.egress_wakeup.set()
+        self.data_plane.egress = self.egress
+
+        # MPR / 路由重算调度器：窗口内合并多次重算请求
+        self.recompute_scheduler = RecomputeScheduler(
+            self.neighbor_manager,
+            self.routing_manager,
+            clock=clock,
+            metrics=self.metrics
+        )
+
+        # 发送聚合队列：短抖动窗口内的 HELLO / TC / 转发消息合并成尽量少的包 (见 tx_aggregator.py)
+        self.tx_queue = TxAggregator(self._send_raw, self.get_next_pkt_seq, clock=clock)
+        self.tx_wakeup = threading.Event()
+        self.tx_queue.on_deadline = lambda t: self.tx_wakeup.set()
 
         # ===【新增】初始化全局锁 ===
-        self.lock = threading.Lock()
+        # 带等锁 / 持锁时间统计 (lock_wait / lock_hold)；asyncio 模式下换成空锁
+        self.lock = InstrumentedLock(self.metrics)
 
         # --- 3. 状态变量 ---
         self.pkt_seq_num = 0    # 包序列号
         self.msg_seq_num = 0    # 消息序列号
         self.ansn = 0           # TC 序列号 (Advertised Neighbor Sequence Number)
+        self.rx_packets = 0     # 已处理的 UDP 包数
 
-    def start(self):
-        """启动 OLSR 节点"""
-        print(f"[*] OLSR Node {self.my_ip} started on port {self.port}")
-        
-        # 启动后台线程
-        threading.Thread(target=self.loop_hello, daemon=True).start()
-        threading.Thread(target=self.loop_tc, daemon=True).start()
-        threading.Thread(target=self.loop_cleanup, daemon=True).start()
-        
-        # 主线程进入接收循环
-        self.receive_loop()
+    def start(self, runtime='thread'):
+        """
+        启动 OLSR 节点
+        :param runtime: 'thread' (守护线程 + 全局锁) 或 'asyncio' (单线程事件循环，见 async_runtime.py)
+        """
+        try:
+            if runtime == 'asyncio':
+                import asyncio
+                from async_runtime import AsyncRuntime
+                self.runtime = AsyncRuntime(self)
+                asyncio.run(self.runtime.run())
+                return
+
+            log.info("OLSR Node %s started on port %d", Addr(self.my_ip), self.port)
+
+            # 启动后台线程
+            threading.Thread(target=self.loop_hello, daemon=True).start()
+            threading.Thread(target=self.loop_tc, daemon=True).start()
+            threading.Thread(target=self.loop_expiry, daemon=True).start()
+            threading.Thread(target=self.loop_recompute, daemon=True).start()
+            threading.Thread(target=self.loop_tx, daemon=True).start()
+            threading.Thread(target=self.loop_data, daemon=True).start()
+            threading.Thread(target=self.loop_egress, daemon=True).start()
+
+            # 主线程进入接收循环
+            self.receive_loop()
+        finally:
+            # 退出时删掉装进内核的路由
+            if self.route_installer is not None:
+                with self.lock:
+                    self.route_installer.close()
+                    self.route_installer = None
+
+    def stop(self):
+        """停止节点 (可以从其他线程调用)"""
+        self.running = False
+        if self.runtime is not None:
+            self.runtime.stop()
+            return
+        self.expiry_wakeup.set()
+        self.tx_wakeup.set()
+        self.egress_wakeup.set()
+        # 给自己发一个空包，唤醒阻塞在 recvfrom 上的接收循环
+        try:
+            self.sock.sendto(b'', ('127.0.0.1', self.port))
+            self.data_sock.sendto(b'', ('127.0.0.1', self.data_port))
+        except OSError:
+            pass
 
     # ==========================
     # 接收与分发 (Receive & Dispatch)
@@ -74,86 +184,111 @@ class OLSRNode:
     def receive_loop(self):
         while self.running:
             try:
-                data, addr = self.sock.recvfrom(2048)
-                sender_ip = addr[0]
-                if sender_ip == self.my_ip: continue # 忽略自己
-                
-                self.process_packet(data, sender_ip)
+                batch = self.receiver.receive_batch()
+                self.process_batch(batch)
             except Exception as e:
-                print(f"[Error] Receive: {e}")
+                log.error("收包出错: %s", e)
 
-    def process_packet(self, data, sender_ip):
-        """解析 UDP 包并分发消息"""
-        if len(data) < 4: return
-        
-        # 1. 解析包头
-        pkt_len, pkt_seq = struct.unpack('!HH', data[:4])
-        cursor = 4
-        
+    def process_batch(self, batch):
+        """
+        处理一批数据报 [(data, addr), ...]
+        整批只加一次锁；批内的 MPR / 路由重算请求合并到批末最多执行一次
+        """
+        scheduler = self.recompute_scheduler
+        metrics = self.metrics
+        h_packet = self._h_packet
+        clock = time.perf_counter
+        with self.lock:
+            scheduler.begin_batch()
+            try:
+                for data, addr in batch:
+                    sender_ip = ip_to_int(addr[0])
+                    if sender_ip == self.my_ip: # 忽略自己
+                        metrics.count('dropped_packets', 'own')
+                        continue
+                    t0 = clock()
+                    try:
+                        self._process_packet(data, sender_ip)
+                    except Exception as e:
+                        metrics.count('dropped_packets', 'error')
+                        log.error("收包出错: %s", e)
+                    h_packet.record(clock() - t0)
+            finally:
+                scheduler.end_batch()
 
-        # 2. 遍历消息
+    def process_packet(self, data, sender_ip):
+        """解析 UDP 包并分发消息 (基于 memoryview 的零拷贝视图，见 msg_view.py)"""
         with self.lock:
-            while cursor < len(data):
-                if len(data) - cursor < 12: break
-                
-                # 解析消息头
-                msg_head = data[cursor:cursor+12]
-                msg_type, vtime, msg_size, orig_bytes, ttl, hop, msg_seq = \
-                    struct.unpack('!BBH4sBBH', msg_head)
-                
-                orig_ip = socket.inet_ntoa(orig_bytes) #将字节流的发送者ip转换为字符串形式，这里便是直接获取我自己有哪些可以收到hello消息邻居的
+            t0 = time.perf_counter()
+            self._process_packet(data, sender_ip)
+            self._h_packet.record(time.perf_counter() - t0)
+
+    def _process_packet(self, data, sender_ip):
+        """process_packet 的实际逻辑，调用方负责持有 self.lock"""
+        if len(data) < PKT_HEADER.size:
+            self.metrics.count('dropped_packets', 'short')
+            return
+
+        # 遍历消息 (计数按消息类型)
+        self.rx_packets += 1
+        c_rx = self._c_rx
+        for msg in iter_messages(data):
+            msg_type = msg.msg_type
+            c_rx[msg_type] = c_rx.get(msg_type, 0) + 1
+            
+            if msg_type == DATA_MESSAGE:
+                # 这是一个数据包 (旧的发送方式走了控制端口)，交给数据面处理
+                # 消息体包含了 [目的IP] + [视频数据]
+                self.data_plane.handle_message(msg.raw)
+            elif msg_type in [HELLO_MESSAGE, TC_MESSAGE]:
+                orig_ip = msg.orig_ip # 消息源地址，已解码为 int
+                msg_seq = msg.seq
                 
-                if msg_type == DATA_MESSAGE:
-                    # 这是一个数据包，交给专门的函数处理
-                    # msg_body_bytes 包含了 [目的IP] + [视频数据]
-                    self.process_data_message(orig_ip, msg_body_bytes, ttl)
-                elif msg_type in [HELLO_MESSAGE, TC_MESSAGE]:
+                # --- 去重检查 ---
+                now = self.clock()
+                if not self.duplicate_set.is_duplicate(orig_ip, msg_seq, now):
+                    self.duplicate_set.record_message(orig_ip, msg_seq, now)
                     # =================【解码 vtime】=================
-                    validity_time = decode_mantissa(vtime)
-
-                    # 提取消息体
-                    body_start = cursor + 12
-                    body_end = cursor + msg_size
-                    if body_end > len(data): break
-                    msg_body_bytes = data[body_start:body_end]
+                    validity_time = msg.validity_time
                     
-                    # --- 去重检查 ---
-                    if not self.duplicate_set.is_duplicate(orig_ip, msg_seq):
-                        self.duplicate_set.record_message(orig_ip, msg_seq, time.time())
-                        
-                        # --- 分发处理 ---
+                    # --- 分发处理 ---
+                    # 视图只解析固定头部，地址列表在处理函数真正用到时才解码
+                    t0 = time.perf_counter()
+                    try:
                         if msg_type == HELLO_MESSAGE: # Type 1
-                            # 解析为字典 hello_info
-                            hello_info = parse_hello_body(msg_body_bytes)
-                            if hello_info:
-                                self.process_hello(sender_ip, hello_info, validity_time)
-                                
+                            self.process_hello(sender_ip, msg.hello(), validity_time)
+                            self._h_hello.record(time.perf_counter() - t0)
                         elif msg_type == TC_MESSAGE: # Type 2
-                            tc_info = parse_tc_body(msg_body_bytes)
-                            if tc_info:
-                                self.process_tc(orig_ip, tc_info, validity_time)
-
-                    # --- 转发检查 (MPR Flooding) ---
-                    # 即使处理过内容，如果之前没转发过且我是MPR，仍需转发
-                    if self.check_forwarding_condition(sender_ip, orig_ip, msg_seq, ttl):
-                        # 传入完整的单条消息数据 (Header + Body) 进行转发处理
-                        full_msg_data = data[cursor:body_end]
-                        self.forward_message(full_msg_data, ttl, hop)
+                            self.process_tc(orig_ip, msg.tc(), validity_time)
+                            self._h_tc.record(time.perf_counter() - t0)
+                    except ValueError:
+                        self.metrics.count('dropped', msg_type) # 消息体太短，忽略
+                else:
+                    c_dup = self._c_dup
+                    c_dup[msg_type] = c_dup.get(msg_type, 0) + 1
 
-                    cursor += msg_size
+                # --- 转发检查 (MPR Flooding) ---
+                # 即使处理过内容，如果之前没转发过且我是MPR，仍需转发
+                if self.check_forwarding_condition(sender_ip, orig_ip, msg_seq, msg.ttl):
+                    # 传入完整的单条消息数据 (Header + Body) 进行转发处理
+                    self.forward_message(msg.raw, msg.ttl, msg.hop)
+                    c_fwd = self._c_fwd
+                    c_fwd[msg_type] = c_fwd.get(msg_type, 0) + 1
+            else:
+                self.metrics.count('dropped', msg_type) # 不支持的消息类型
 
     # ==========================
     # 逻辑处理 (Logic Processing)
     # ==========================
     def process_hello(self, sender_ip, hello_info, validity_time):
         """处理 HELLO 消息字典"""
-        current_time = time.time()
+        current_time = self.clock()
         
         # 1. 链路感知
         self.link_set.process_hello(sender_ip, hello_info, validity_time)
         
         link = self.link_set.links.get(sender_ip)
-        is_sym = link.is_symmetric() if link else False
+        is_sym = link.is_symmetric(current_time) if link else False
         
         # 2. 邻居维护
         self.neighbor_manager.update_neighbor_status(
@@ -165,22 +300,25 @@ class OLSRNode:
             self.neighbor_manager.process_2hop_neighbors(sender_ip, hello_info, validity_time, current_time)
             self.neighbor_manager.process_mpr_selector(sender_ip, hello_info, validity_time, current_time)
             
-            # 4. 触发重算
-            self.neighbor_manager.recalculate_mpr()
-            # 拓扑变动，重算路由
-            self.routing_manager.recalculate_routing_table()
+        # 4. 请求重算 (MPR + 路由)，由调度器决定立即执行还是合并到窗口末尾
+        # 邻居从对称变为非对称 (链路丢失) 也要走这里
+        self.recompute_scheduler.request(current_time)
 
     def process_tc(self, originator_ip, tc_info, validity_time):
         """处理 TC 消息字典"""
-        self.topology_manager.process_tc_message(originator_ip, tc_info, validity_time, time.time())
-        # 拓扑变动，重算路由
-        self.routing_manager.recalculate_routing_table()
+        current_time = self.clock()
+        self.topology_manager.process_tc_message(originator_ip, tc_info, validity_time, current_time)
+        # 拓扑变动，请求重算路由
+        self.recompute_scheduler.request(current_time)
 
     # ==========================
     # 发送与转发 (Sending & Forwarding)
     # ==========================
     def generate_and_send_hello(self):
         """生成并发送 HELLO"""
+        # 0. 先执行被推迟的重算，保证宣告出去的 MPR 集合是最新的
+        self.recompute_scheduler.flush()
+
         # 1. 获取邻居组 (带 MPR 标记)
         mpr_set = self.neighbor_manager.current_mpr_set
         groups = self.link_set.get_hello_groups(mpr_set)
@@ -203,7 +341,7 @@ class OLSRNode:
         )
         
         self.send_packet(header + hello_body)
-        print(f"[Send] HELLO ({len(groups)} groups)")
+        log.debug("发送 HELLO (%d groups)", len(groups))
 
     def generate_and_send_tc(self):
         """生成并发送 TC (仅当我是 MPR)"""
@@ -222,7 +360,8 @@ class OLSRNode:
         )
         
         self.send_packet(header + tc_body)
-        print(f"[Send] TC (Selectors: {selectors})")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("发送 TC (Selectors: %s)", Addrs(selectors))
 
     def check_forwarding_condition(self, sender_ip, orig_ip, seq, ttl):
         """判断是否转发 (RFC 3.4.1)"""
@@ -230,35 +369,42 @@ class OLSRNode:
         if orig_ip == self.my_ip: return False
         
         # 检查是否已转发过
-        if self.duplicate_set.is_duplicate(orig_ip, seq):
-            if self.duplicate_set.entries[(orig_ip, seq)].retransmitted:
-                return False
+        if self.duplicate_set.is_retransmitted(orig_ip, seq):
+            return False
 
         # MPR 规则：Sender 必须选我做了 MPR
         return sender_ip in self.neighbor_manager.mpr_selectors
 
     def forward_message(self, msg_data, old_ttl, old_hop):
         """修改 TTL/Hop 并转发"""
-        # 解包头部前12字节修改
-        fmt = '!BBH4sBBH'
-        lst = list(struct.unpack(fmt, msg_data[:12]))
-        lst[4] -= 1 # TTL - 1
-        lst[5] += 1 # Hop + 1
-        new_head = struct.pack(fmt, *lst)
+        # 复制一份消息后直接原地改写 TTL / Hop 两个字节，不再整体解包重打包
+        out = bytearray(msg_data)
+        out[MSG_TTL_OFFSET] = old_ttl - 1 # TTL - 1
+        out[MSG_HOP_OFFSET] = old_hop + 1 # Hop + 1
         
         # 标记为已转发
         # (解析 Originator 和 Seq)
-        orig_ip = socket.inet_ntoa(lst[3])
-        seq = lst[6]
+        _, _, _, orig_ip, _, _, seq = MSG_HEADER.unpack_from(out, 0)
         self.duplicate_set.mark_retransmitted(orig_ip, seq)
         
-        print(f"[Forward] 转发来自 {orig_ip} 的消息")
-        self.send_packet(new_head + msg_data[12:])
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("转发来自 %s 的消息", Addr(orig_ip))
+        self.send_packet(out)
 
     def send_packet(self, msg_bytes):
-        """封装包头并广播"""
-        pkt_head = create_packet_header(len(msg_bytes), self.get_next_pkt_seq())
-        self.sock.sendto(pkt_head + msg_bytes, ('<broadcast>', self.port))
+        """消息进入发送聚合队列，由 tx_queue 封装包头并广播"""
+        self.tx_queue.enqueue(msg_bytes)
+
+    def _send_raw(self, packet):
+        """已封装好包头的完整控制包交给出口调度器，优先于数据发出"""
+        self.egress.send_control(packet)
+
+    def _broadcast(self, packet):
+        self.sendto(packet, ('<broadcast>', self.port))
+
+    def _send_data_raw(self, packet, addr):
+        """非阻塞单播一个数据包，发送缓冲区满时抛 BlockingIOError，由出口调度器排队"""
+        self.transport.send_data(packet, addr)
 
     # ==========================
     # 辅助与循环
@@ -279,7 +425,7 @@ class OLSRNode:
                     self.generate_and_send_hello()
                 time.sleep(HELLO_INTERVAL - 0.5 + random.random())
             except Exception as e:
-                print(f"[Error] Hello Loop: {e}")
+                log.error("发送 HELLO 出错: %s", e)
 
     def loop_tc(self):
         while self.running:
@@ -288,65 +434,218 @@ class OLSRNode:
                     self.generate_and_send_tc()
                 time.sleep(TC_INTERVAL - 0.5 + random.random())
             except Exception as e:
-                print(f"[Error] TC Loop: {e}")
+                log.error("发送 TC 出错: %s", e)
 
-    def loop_cleanup(self):
+    def loop_expiry(self):
+        """
+        睡到最早的过期时刻 (或有更早的元组登记进来) 再醒来，只处理真正到期的元组
+        """
         while self.running:
-            time.sleep(2.0)
+            with self.lock:
+                deadline = self.expiry.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            self.expiry_wakeup.wait(timeout)
+            self.expiry_wakeup.clear()
             
             # 获取锁，保护清理过程中的删除操作
             with self.lock:
-                self.link_set.cleanup()
-                self.neighbor_manager.cleanup()
-                self.topology_manager.cleanup()
-                self.duplicate_set.cleanup()
+                if self.expiry.run_due():
+                    # 过期清理也会改变二跳集/拓扑集
+                    self.recompute_scheduler.request()
+
+    def loop_tx(self):
+        """等到聚合队列的发送时刻，把攒下的消息打包发出"""
+        while self.running:
+            with self.lock:
+                deadline = self.tx_queue.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            self.tx_wakeup.wait(timeout)
+            self.tx_wakeup.clear()
 
-    #处理数据包相关的方法函数
-    def process_data_message(self, originator_ip, body_bytes, ttl):
+            with self.lock:
+                try:
+                    self.tx_queue.poll()
+                except Exception as e:
+                    log.error("发送聚合队列出错: %s", e)
+
+    def snapshot(self):
         """
-        处理收到的数据包 (Type 5)
+        当前协议状态的快照 (地址为点分十进制字符串，可直接写成 JSON)，
+        供可视化工具 topo_viz.py 离线渲染拓扑和路由
         """
-        if len(body_bytes) < 4: return 
-
-        # 1. 解析自定义的 Body 头部：提取目标 IP
-        dest_ip_bytes = body_bytes[:4]
-        dest_ip = socket.inet_ntoa(dest_ip_bytes)
-        payload = body_bytes[4:] # 剩下的才是视频数据
-
-        # 2. 判断：是发给我的吗？
-        if dest_ip == self.my_ip:
-            print(f"[Data] 收到来自 {originator_ip} 的视频数据! 长度: {len(payload)}")
-            # TODO: 将 payload 放入视频显示队列
-            # self.video_queue.put(payload)
-            return
+        nm = self.neighbor_manager
+        return {
+            'node': int_to_ip(self.my_ip),
+            'time': self.clock(),
+            'neighbors': [
+                {'ip': int_to_ip(ip), 'status': n.status, 'willingness': n.willingness}
+                for ip, n in nm.neighbors.items()
+            ],
+            'mpr_set': [int_to_ip(ip) for ip in nm.current_mpr_set],
+            'mpr_selectors': [int_to_ip(ip) for ip in nm.mpr_selectors],
+            'two_hop': [[int_to_ip(n), int_to_ip(t)] for n, t in nm.two_hop_set],
+            'topology': [[int_to_ip(u), int_to_ip(v)] for u, v in self.topology_manager.iter_links()],
+            'routes': self.routing_manager.export_routing_table(),
+            'egress': self.egress.stats(),
+        }
+
+    def metrics_snapshot(self):
+        """运行时统计快照 (延迟直方图、计数器、各状态表大小和各模块的统计)，调用方负责持有 self.lock"""
+        nm = self.neighbor_manager
+        snap = self.metrics.snapshot()
+        snap['node'] = int_to_ip(self.my_ip)
+        snap['time'] = self.clock()
+        snap['rx_packets'] = self.rx_packets
+        snap['tables'] = {
+            'links': len(self.link_set.links),
+            'neighbors': len(nm.neighbors),
+            'two_hop': len(nm.two_hop_set),
+            'mpr_set': len(nm.current_mpr_set),
+            'mpr_selectors': len(nm.mpr_selectors),
+            'topology_records': len(self.topology_manager.records),
+            'duplicate_windows': len(self.duplicate_set.windows),
+            'routes': len(self.routing_manager.routing_table),
+            'expiry_heap': len(self.expiry),
+        }
+        snap['recompute'] = self.recompute_scheduler.stats()
+        snap['tx'] = self.tx_queue.stats()
+        if self.receiver is not None:
+            # kernel_drops 在没有 SO_RXQ_OVFL 时回退到 /proc/net/udp
+            snap['rx'] = self.receiver.snapshot()
+        snap['egress'] = self.egress.stats()
+        snap['data'] = self.data_plane.stats()
+        if self.route_installer is not None:
+            snap['route_install'] = self.route_installer.stats()
+        return snap
 
-        # 3. 如果不是发给我的，且 TTL > 0，则进行“单播转发”
-        if ttl > 1:
-            self.forward_unicast_data(dest_ip, body_bytes, ttl)
+    def start_stats_server(self, path=None, port=None):
+        """在 Unix 域 socket (path) 或 127.0.0.1:port 上提供统计查询 (见 metrics.StatsServer)"""
+        from metrics import StatsServer
+        self.stats_server = StatsServer(self, path=path, port=port).start()
+        log.info("统计接口已启动: %s", self.stats_server.address)
+        return self.stats_server
+
+    def write_snapshot(self, path):
+        """在锁内取快照并写成 JSON 文件"""
+        import json
+        with self.lock:
+            snap = self.snapshot()
+        with open(path, 'w') as f:
+            json.dump(snap, f, indent=1)
+        log.info("拓扑快照已写入 %s", path)
 
-    def forward_unicast_data(self, dest_ip, full_body, old_ttl):
+    def enable_route_install(self, backend='netlink', table=ROUTE_TABLE, dev=None):
         """
-        查路由表进行单播转发
+        把路由表导出到内核 (见 route_installer.py)
+        :param backend: 'netlink' / 'iproute2' / 'memory'，或者一个后端对象
+                        (iproute2 每个事务 fork 一次 ip，并在持有 self.lock 时等它退出，只作为没有 netlink 权限时的退路)
         """
-        # 查路由表：去 dest_ip 该给谁？
-        route = self.routing_manager.routing_table.get(dest_ip)
-        
-        if route:
-            next_hop = route['next_hop']
-            
-            # 重新封装头部（仅修改 TTL 和 Hop）
-            # 注意：这里需要重新构建 Message Header，或者像之前 forward_message 那样修改二进制
-            # 简单起见，我们假设重新打包转发：
-            
-            # ... (这里调用 send_packet 发给 next_hop) ...
-            print(f"[Forward] 数据包 {dest_ip} -> 下一跳 {next_hop}")
+        from route_installer import RouteInstaller, make_backend
+        if isinstance(backend, str):
+            backend = make_backend(backend, table=table, dev=dev)
+        with self.lock:
+            self.route_installer = RouteInstaller(self.routing_manager.routing_table, backend, metrics=self.metrics,
+                                                  expiry=self.expiry)
+            self.route_installer.sync()     # 清掉上次运行的残留，装上当前已有的路由
+        return self.route_installer
+
+    def _on_routes_changed(self, changed):
+        """路由表变化：清数据面的下一跳缓存，把变化作为一个事务装进内核"""
+        self.data_plane.invalidate(changed)
+        if self.route_installer is not None:
+            self.route_installer.update(changed)
+
+    def handle_link_lost(self, neighbor_ip, removed):
+        """
+        LinkSet 的链路丢失回调：立即更新邻居状态并请求重算，不等下一轮清理
+        (邻居由对称变为非对称属于关键变化，调度器会立即执行重算)
+        """
+        if removed:
+            self.neighbor_manager.remove_neighbor(neighbor_ip)
         else:
-            print(f"[Drop] 丢弃发往 {dest_ip} 的数据：无路由")
-    
+            neigh = self.neighbor_manager.neighbors.get(neighbor_ip)
+            if neigh is not None:
+                self.neighbor_manager.update_neighbor_status(neighbor_ip, neigh.willingness, False)
+        self.recompute_scheduler.request()
+
+    def loop_recompute(self):
+        """合并窗口到期后，执行被推迟的 MPR / 路由重算"""
+        while self.running:
+            time.sleep(self.recompute_scheduler.window)
+            with self.lock:
+                self.recompute_scheduler.poll()
+
+    # ==========================
+    # 数据面 (Data Plane)
+    # ==========================
+    def send_data(self, dest_ip, payload):
+        """向 dest_ip 发送数据 (沿路由表逐跳单播)，返回是否发出"""
+        return self.data_plane.send(to_addr(dest_ip), payload)
+
+    def loop_egress(self):
+        """发出出口调度器里排队的包 (被限速或发送缓冲区满时才会有)，不拿全局锁"""
+        while self.running:
+            deadline = self.egress.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            self.egress_wakeup.wait(timeout)
+            self.egress_wakeup.clear()
+            try:
+                self.egress.drain()
+            except Exception as e:
+                log.error("出口调度出错: %s", e)
+
+    def loop_data(self):
+        """数据 socket 的接收循环：不拿全局锁，只读路由表，控制面重算不会卡住转发"""
+        while self.running:
+            try:
+                self.data_plane.receive_once()
+            except Exception as e:
+                log.error("数据面出错: %s", e)
+
 
 if __name__ == "__main__":
-    import sys
-    ip = "192.168.3.2"
-    if len(sys.argv) > 1: ip = sys.argv[1]
-    node = OLSRNode(ip)
-    node.start()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="OLSR overlay node")
+    parser.add_argument("ip", nargs="?", default="192.168.3.2")
+    parser.add_argument("--runtime", choices=["thread", "asyncio"], default="thread")
+    parser.add_argument("--route-backend", choices=["dynamic", "csr", "scipy"], default="dynamic")
+    parser.add_argument("--snapshot", default=None,
+                        help="收到 SIGUSR1 时把拓扑快照写到该文件 (用 topo_viz.py 渲染)")
+    parser.add_argument("--egress-policy", choices=["drop-tail", "head-drop"], default=EGRESS_POLICY,
+                        help="数据队列满时的丢包策略")
+    parser.add_argument("--egress-rate", type=float, default=None,
+                        help="每个下一跳的数据限速 (字节/秒)，默认不限速")
+    parser.add_argument("--log", default=None,
+                        help="日志级别，可按模块设置，例如 info,mpr=debug,routing=debug (默认取环境变量 OLSR_LOG 或 info)")
+    parser.add_argument("--log-file", default=None, help="日志写到文件 (默认 stderr)")
+    parser.add_argument("--log-format", choices=["text", "json"], default="text")
+    parser.add_argument("--install-routes", choices=["netlink", "iproute2"], default=None,
+                        help="把 OLSR 路由装进内核路由表 (需要 CAP_NET_ADMIN)，默认不装")
+    parser.add_argument("--route-table", type=int, default=ROUTE_TABLE, help="写入的内核路由表 (默认 254 = main)")
+    parser.add_argument("--route-dev", default=None, help="路由的出接口 (默认由内核按下一跳选择)")
+    parser.add_argument("--stats-socket", default=None,
+                        help="在该 Unix 域 socket 上提供运行时统计 (python3 metrics.py <路径> [json|prometheus] 查询)")
+    parser.add_argument("--stats-port", type=int, default=None,
+                        help="在 127.0.0.1 的该端口上提供运行时统计 (也可以让 Prometheus 直接抓取 /metrics)")
+    args = parser.parse_args()
+    import olsr_log
+    olsr_log.configure(args.log, path=args.log_file, fmt=args.log_format)
+    node = OLSRNode(args.ip, route_backend=args.route_backend)
+    node.egress.policy = args.egress_policy
+    if args.egress_rate:
+        node.egress.set_pacing(None, args.egress_rate)
+    if args.install_routes:
+        node.enable_route_install(args.install_routes, table=args.route_table, dev=args.route_dev)
+    if args.stats_socket or args.stats_port is not None:
+        node.start_stats_server(path=args.stats_socket, port=args.stats_port)
+
+    if args.snapshot and hasattr(signal, 'SIGUSR1'):
+        def on_sigusr1(signum, frame):
+            # 信号处理函数运行在主线程 (可能正持有锁)，把写快照交给别的线程 / 事件循环
+            if node.runtime is not None and node.runtime.loop is not None:
+                node.runtime.loop.call_soon_threadsafe(node.write_snapshot, args.snapshot)
+            else:
+                threading.Thread(target=node.write_snapshot, args=(args.snapshot,), daemon=True).start()
+        signal.signal(signal.SIGUSR1, on_sigusr1)
+
+    node.start(args.runtime)
\ No newline at end of file
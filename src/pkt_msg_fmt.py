@@ -1,6 +1,6 @@
 import struct
-import socket
 import math
+from node_addr import to_addr
 
 # 常量定义 (基于 RFC 3626)
 OLSR_C = 1.0 / 16.0  # 缩放因子 C = 0.0625 [cite: 1679]
@@ -63,9 +63,9 @@ def create_message_header(msg_type, vtime_seconds, msg_body_len, originator_ip,
     total_msg_size = 12 + msg_body_len
     # 2. 编码 Vtime [cite: 298]
     vtime_byte = encode_mantissa(vtime_seconds)
-    # 3. 处理 IP 地址: 将字符串 "192.168.1.5" 转为 4字节二进制 [cite: 307]
+    # 3. 处理 IP 地址: 内部地址已是 32 位整数，直接按 I 打包；兼容传入字符串 "192.168.1.5" [cite: 307]
     try:
-        ip_bytes = socket.inet_aton(originator_ip)
+        addr = to_addr(originator_ip)
     except OSError:
         print(f"Error: Invalid IP address {originator_ip}")
         return None
@@ -73,14 +73,14 @@ def create_message_header(msg_type, vtime_seconds, msg_body_len, originator_ip,
     # 4. 打包 (使用大端序 !)
     # B: unsigned char (1 byte) -> Msg Type, Vtime, TTL, Hop Count
     # H: unsigned short (2 bytes) -> Msg Size, Seq Num
-    # 4s: char[4] (4 bytes) -> Originator Address
+    # I: unsigned int (4 bytes) -> Originator Address
     
     # 结构: Type(1), Vtime(1), Size(2), Originator(4), TTL(1), Hop(1), Seq(2)
-    header = struct.pack('!BBH4sBBH', 
+    header = struct.pack('!BBHIBBH', 
                          msg_type,       # Message Type
                          vtime_byte,     # Vtime
                          total_msg_size, # Message Size
-                         ip_bytes,       # Originator Address
+                         addr,           # Originator Address
                          ttl,            # Time To Live
                          hop_count,      # Hop Count
                          msg_seq_num     # Message Sequence Number
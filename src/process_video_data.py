@@ -1,14 +1,11 @@
 #本文件主要是将可播放的视频格式转化为可以进行发送的一个一个的数据包
-import socket
-import time
+# 传输协议见 file_transfer.py：带序号的 MTU 大小分片、接收端按偏移写入预分配 (mmap) 的文件、
+# NACK 选择性重传、按丢包率调整发送速率，丢包 / 乱序不再损坏文件
 import os
-import sys
+
+from file_transfer import send_file, receive_file
 
 def send_video_udp(file_path, dest_ip, dest_port):
-    # 创建 UDP Socket
-    # AF_INET = IPv4, SOCK_DGRAM = UDP
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
     # 检查文件是否存在
     if not os.path.exists(file_path):
         print(f"错误: 文件 {file_path} 不存在")
@@ -18,80 +15,28 @@ def send_video_udp(file_path, dest_ip, dest_port):
     print(f"开始发送文件: {file_path} ({file_size / 1024 / 1024:.2f} MB)")                                                                         
     print(f"目标: {dest_ip}:{dest_port}")
 
-    # 定义缓冲区大小 (Buffer Size)
-    # 注意：如果经过公网路由器，MTU 通常限制在 1472 字节左右。
-    # 局域网内可以使用较大的包，这里设为 60KB (61440 bytes)
-    BUFFER_SIZE = 61440 
-    
-    sent_bytes = 0
-    
     try:
-        with open(file_path, "rb") as f:
-            while True:
-                # 读取数据块
-                data = f.read(BUFFER_SIZE)
-                
-                # 如果读不到数据，说明文件结束
-                if not data:
-                    break
-                
-                # 发送数据
-                sock.sendto(data, (dest_ip, dest_port))
-                sent_bytes += len(data)
-                
-                # --- 简单的流控 ---
-                # 如果发送太快，接收端可能来不及处理导致丢包
-                # 根据网络情况调整 sleep 时间，或者移除
-                time.sleep(0.002) 
-                
-                # 打印进度 (可选)
-                sys.stdout.write(f"\r已发送: {sent_bytes / file_size * 100:.2f}%")
-                sys.stdout.flush()
-
-        # 发送结束标记
-        # 我们发送一个特殊的空包或特定字符串作为结束信号
-        print("\n发送结束信号...")
-        sock.sendto(b'EOF_MARKER', (dest_ip, dest_port))
-        
-        print("传输完成。")
-
+        stats = send_file(file_path, dest_ip, dest_port)
+        if stats['complete']:
+            print(f"传输完成。有效吞吐 {stats['goodput_mbps']:.1f} Mbit/s, "
+                  f"重传 {stats['retransmissions']} 片, 最终速率 {stats['rate_final_mbps']:.1f} Mbit/s")
+        else:
+            print("传输超时，接收端没有确认收齐。")
     except Exception as e:
         print(f"\n发生错误: {e}")
-    finally:
-        sock.close()
-
 
-import socket
 
 def receive_video_udp(save_path, listen_port):
-    # 创建 UDP Socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
-    # 绑定端口 (0.0.0.0 表示接收所有网卡的流量)
-    sock.bind(("0.0.0.0", listen_port))
     print(f"正在监听端口 {listen_port}，等待数据...")
-    
-    # 设置缓冲区，必须大于或等于发送端的包大小
-    BUFFER_SIZE = 65535 
-
     try:
-        with open(save_path, "wb") as f:
-            while True:
-                # 接收数据
-                data, addr = sock.recvfrom(BUFFER_SIZE)
-                
-                # 检查是否是结束标记
-                if data == b'EOF_MARKER':
-                    print(f"\n收到来自 {addr} 的结束信号。")
-                    break
-                
-                # 将数据写入文件
-                f.write(data)
-                
+        stats = receive_file(save_path, listen_port)
+        if stats['complete']:
+            print(f"接收完成。有效吞吐 {stats['goodput_mbps']:.1f} Mbit/s, 重复分片 {stats['duplicates']}")
+        else:
+            print("接收超时，文件不完整。")
     except KeyboardInterrupt:
         print("\n手动停止接收。")
     except Exception as e:
         print(f"发生错误: {e}")
     finally:
-        sock.close()
-        print(f"文件已保存至: {save_path}")
\ No newline at end of file
+        print(f"文件已保存至: {save_path}")
@@ -0,0 +1,130 @@
+'''
+本文件实现 MPR / 路由表重算的合并调度器 (debounce / coalesce)
+
+原来每收到一个对称 HELLO 就完整跑一遍 recalculate_mpr() 和 recalculate_routing_table()，
+一次 HELLO 突发 (N 个邻居) 就是 N 次重算。现在改为：
+1. 各管理器只负责"标脏"：
+   - NeighborManager.mpr_dirty      : MPR 选择的输入 (对称邻居 / 意愿值 / 二跳集) 变了
+   - NeighborManager.critical_change: 出现了新的对称链路或链路丢失
+   - DynamicSPF.has_pending()       : 路由图有未处理的边增量
+2. 调度器在一个窗口 (window 秒) 内最多执行一次重算；
+   遇到拓扑关键变化 (critical) 时立即执行，不等窗口
+3. 被窗口吸收掉的请求记为 coalesced，真正执行的记为 executed，方便观察抖动下节省了多少
+4. 传入 metrics (metrics.Metrics) 时记录 recalculate_mpr / recalculate_routing_table 的耗时直方图
+'''
+import time
+
+from constants import RECOMPUTE_WINDOW
+
+
+class RecomputeScheduler:
+    def __init__(self, neighbor_manager, routing_manager, window=RECOMPUTE_WINDOW, clock=time.time,
+                 metrics=None):
+        self.neighbor_manager = neighbor_manager
+        self.routing_manager = routing_manager
+        self.window = window
+        self.clock = clock
+        self.metrics = metrics
+        if metrics is not None:
+            self._h_mpr = metrics.histogram('recalculate_mpr')
+            self._h_route = metrics.histogram('recalculate_routing_table')
+
+        self.last_run = 0.0     # 上一次执行重算的时间
+        self.pending = False    # 有被推迟的重算请求
+        self.batching = False   # 正在处理一批数据报，重算推迟到整批结束
+
+        # --- 统计计数 ---
+        self.requests = 0       # 收到的重算请求总数
+        self.coalesced = 0      # 被窗口合并掉的请求数
+        self.executed = 0       # 实际执行的重算次数
+        self.mpr_runs = 0       # 其中 recalculate_mpr 执行次数
+        self.route_runs = 0     # 其中 recalculate_routing_table 执行次数
+
+    def is_dirty(self):
+        return self.neighbor_manager.mpr_dirty or self.routing_manager.spf.has_pending()
+
+    def request(self, now=None):
+        """
+        接收路径在处理完一条会改变状态的消息后调用
+        窗口内的普通变化只标记 pending，关键变化立即执行
+        """
+        if now is None:
+            now = self.clock()
+        self.requests += 1
+        if not self.is_dirty():
+            return  # 状态没变 (例如只是刷新了过期时间)，无需重算
+
+        if self.batching:
+            # 批处理中：只记下来，整批结束时 end_batch 统一决定
+            self.coalesced += 1
+            self.pending = True
+            return
+
+        if self.neighbor_manager.critical_change or now - self.last_run >= self.window:
+            self.run(now)
+        else:
+            self.coalesced += 1
+            self.pending = True
+
+    def begin_batch(self):
+        """开始处理一批数据报：期间的重算请求都推迟到 end_batch"""
+        self.batching = True
+
+    def end_batch(self, now=None):
+        """一批处理完：有关键变化或窗口已到则立即重算一次，否则留给窗口定时器"""
+        self.batching = False
+        if not self.pending:
+            return
+        if now is None:
+            now = self.clock()
+        if self.neighbor_manager.critical_change or now - self.last_run >= self.window:
+            self.run(now)
+
+    def poll(self, now=None):
+        """由定时循环调用：窗口到期后执行被推迟的重算"""
+        if now is None:
+            now = self.clock()
+        if self.pending and now - self.last_run >= self.window:
+            self.run(now)
+
+    def next_deadline(self):
+        """被推迟的重算最晚在什么时候执行，没有则返回 None"""
+        if not self.pending:
+            return None
+        return self.last_run + self.window
+
+    def flush(self, now=None):
+        """立即执行所有被推迟的重算 (例如发送 HELLO 之前要保证 MPR 集合是最新的)"""
+        if self.pending or self.is_dirty():
+            self.run(now if now is not None else self.clock())
+
+    def run(self, now):
+        self.pending = False
+        self.last_run = now
+        self.neighbor_manager.critical_change = False
+        if not self.is_dirty():
+            return
+
+        self.executed += 1
+        metrics = self.metrics
+        if self.neighbor_manager.mpr_dirty:
+            t0 = time.perf_counter()
+            self.neighbor_manager.recalculate_mpr()
+            if metrics is not None:
+                self._h_mpr.record(time.perf_counter() - t0)
+            self.mpr_runs += 1
+        if self.routing_manager.spf.has_pending():
+            t0 = time.perf_counter()
+            self.routing_manager.recalculate_routing_table()
+            if metrics is not None:
+                self._h_route.record(time.perf_counter() - t0)
+            self.route_runs += 1
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'executed': self.executed,
+            'mpr_runs': self.mpr_runs,
+            'route_runs': self.route_runs,
+        }
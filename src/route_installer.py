@@ -0,0 +1,492 @@
+'''
+本文件实现把 OLSR 路由表写进内核路由表的导出阶段 (diff + 批量提交)
+
+原来 RoutingManager 只维护一个 Python 字典，mininet_test.py 里 `ip route` 看不到 OLSR 的路由。现在：
+1. RouteInstaller 记住已经装进内核的 { dest: next_hop }，每次路由重算后只对变化的目的节点
+   (RoutingManager.on_routes_changed 给出) 和新表做对比，得到 add / replace / delete 三类操作；
+   只有跳数变化、下一跳不变的目的节点不产生内核操作 (内核路由的 metric 是固定的 ROUTE_METRIC)
+2. 一次重算的全部操作作为一个事务交给后端一次提交：
+   - NetlinkBackend  : 直接用 NETLINK_ROUTE socket，把所有 RTM_NEWROUTE / RTM_DELROUTE 拼进一次 sendmsg，
+                       再一次性收齐 ACK (按 seq 对应到每条操作)，不 fork 任何进程
+   - IPRouteBackend  : 没有 netlink 权限时的退路，一个事务一次 `ip -force -batch -`，
+                       注意它在路由重算回调里 fork 进程，线程模式下会持锁 (OLSRNode.lock) 等 ip 退出，
+                       asyncio 模式下会阻塞事件循环；只适合小网络或调试
+   - MemoryBackend   : 内存里的假内核路由表，记录每个事务，供测试和仿真使用
+3. 路由都是 dest/32 via next_hop，写进 ROUTE_TABLE (默认 main，也可以用单独的表配合 ip rule)，
+   protocol 字段为 ROUTE_PROTO。启动时先从内核读回本协议的路由作为"已安装"状态，
+   第一次同步就顺带清掉上次运行的残留；退出时 close() 删掉本协议装的全部路由
+4. 失败的操作下一次重算时重新对比 / 重试；拓扑稳定、一直没有重算时，
+   由过期调度器每 ROUTE_RETRY_INTERVAL 秒重试一次，直到全部装上。
+   后端逐条报告的失败说明内核没有执行这条操作，"已安装"状态保持不变 (replace 失败时内核里还是旧路由)；
+   后端抛出 OSError 时结果不确定，add / replace 的目的节点记为 UNKNOWN，之后按 replace 或 delete 处理，
+   保证不会在内核里留下 OLSR 已经不要的路由
+5. 统计每个事务的安装延迟 (直方图 route_install，见 metrics.py) 和 add / replace / delete / 失败次数
+'''
+import errno
+import os
+import socket
+import struct
+import subprocess
+import time
+
+from node_addr import int_to_ip, ip_to_int
+from olsr_log import get_logger
+from constants import ROUTE_TABLE, ROUTE_PROTO, ROUTE_METRIC, ROUTE_BATCH_BYTES, ROUTE_RETRY_INTERVAL
+
+log = get_logger('routing')
+
+ADD, REPLACE, DELETE = 'add', 'replace', 'delete'
+UNKNOWN = -1    # installed 里的占位下一跳：内核里可能有这条路由 (下一跳不确定)，也可能没有
+
+
+class RouteInstaller:
+    def __init__(self, routing_table, backend, metrics=None, expiry=None, retry_interval=ROUTE_RETRY_INTERVAL):
+        """
+        :param routing_table: RoutingManager.routing_table (同一个字典，原地更新)
+        :param backend: NetlinkBackend / IPRouteBackend / MemoryBackend，见 make_backend()
+        :param metrics: metrics.Metrics，设置后记录每个事务的安装延迟
+        :param expiry: 节点的 ExpiryScheduler，有失败的操作时用它定时重试 (None 则只在下次重算时重试)
+        """
+        self.routing_table = routing_table
+        self.backend = backend
+        self.metrics = metrics
+        self.expiry = expiry
+        self.retry_interval = retry_interval
+        self._retry_armed = False   # 过期调度器里已经登记了一次重试
+        self._h_install = metrics.histogram('route_install') if metrics is not None else None
+
+        # 内核里本协议的路由 { dest: next_hop }，启动时从内核读回 (上次运行的残留会在第一次同步时清掉)
+        self.installed = backend.dump()
+        self.retry = set()      # 上次提交失败、下次要重新对比的目的节点
+
+        # --- 统计计数 ---
+        self.transactions = 0   # 提交的事务数 (每次有变化的重算一个)
+        self.adds = 0
+        self.replaces = 0
+        self.deletes = 0
+        self.failures = 0       # 失败的操作数
+        self.last_latency = 0.0 # 最近一个事务的提交耗时 (秒)
+        self.max_latency = 0.0
+
+    def diff(self, dests=None):
+        """
+        对比已安装的路由和当前路由表，返回 [(op, dest, next_hop), ...]
+        :param dests: 只对比这些目的节点 (路由引擎给出的变化集合)；None 表示全表对比
+        """
+        table = self.routing_table
+        installed = self.installed
+        if dests is None:
+            dests = set(table) | set(installed)
+        ops = []
+        for dest in dests:
+            route = table.get(dest)
+            old = installed.get(dest)
+            if route is None:
+                if old is not None:
+                    ops.append((DELETE, dest, old))
+            elif old is None:
+                ops.append((ADD, dest, route['next_hop']))
+            elif old != route['next_hop']:
+                ops.append((REPLACE, dest, route['next_hop']))
+        return ops
+
+    def update(self, changed=None):
+        """
+        RoutingManager.on_routes_changed 的回调：把这次重算的变化作为一个事务提交
+        :param changed: 变化的目的节点集合，None 表示全表同步
+        """
+        if changed is None:
+            dests = None
+        else:
+            dests = set(changed)
+            if self.retry:
+                dests |= self.retry
+        self.retry = set()
+        ops = self.diff(dests)
+        if not ops:
+            return 0
+
+        t0 = time.perf_counter()
+        uncertain = False
+        try:
+            failed = self.backend.apply(ops)
+        except OSError as e:
+            # 不知道哪些操作已经生效 (例如 netlink 的一批请求发到一半出错)
+            failed = dict.fromkeys(range(len(ops)), str(e))
+            uncertain = True
+        elapsed = time.perf_counter() - t0
+        self.transactions += 1
+        self.last_latency = elapsed
+        if elapsed > self.max_latency:
+            self.max_latency = elapsed
+        if self._h_install is not None:
+            self._h_install.record(elapsed)
+
+        installed = self.installed
+        for i, (op, dest, next_hop) in enumerate(ops):
+            if i in failed:
+                self.failures += 1
+                self.retry.add(dest)
+                if uncertain and op != DELETE:
+                    installed[dest] = UNKNOWN   # 下次对比时 replace (还要这条路由) 或 delete (不要了)
+                continue
+            if op == DELETE:
+                del installed[dest]
+                self.deletes += 1
+            else:
+                installed[dest] = next_hop
+                if op == ADD:
+                    self.adds += 1
+                else:
+                    self.replaces += 1
+        if failed:
+            log.warning("路由安装: %d / %d 条操作失败 (%s)", len(failed), len(ops),
+                        "; ".join(sorted(set(failed.values()))))
+            if self.expiry is not None and not self._retry_armed:
+                self._retry_armed = True
+                self.expiry.schedule(self.expiry.clock() + self.retry_interval, self._expire_retry, None)
+        else:
+            log.debug("路由安装: %d 条操作 (%.2f ms)", len(ops), elapsed * 1e3)
+        return len(ops)
+
+    def _expire_retry(self, _, now):
+        """过期调度器的处理函数：重试上次失败的操作 (仍然失败会再登记下一次)"""
+        self._retry_armed = False
+        if self.retry:
+            self.update(set())
+        return None
+
+    def sync(self):
+        """全表对比并提交 (例如外部改动了内核路由表之后)"""
+        return self.update(None)
+
+    def close(self):
+        """删除本协议装的全部路由"""
+        ops = [(DELETE, dest, next_hop) for dest, next_hop in self.installed.items()]
+        if ops:
+            failed = self.backend.apply(ops)
+            self.deletes += len(ops) - len(failed)
+            self.failures += len(failed)
+        self.installed = {}
+        self.retry = set()
+        self.backend.close()
+
+    def stats(self):
+        return {
+            'installed': len(self.installed),
+            'transactions': self.transactions,
+            'adds': self.adds,
+            'replaces': self.replaces,
+            'deletes': self.deletes,
+            'failures': self.failures,
+            'pending_retry': len(self.retry),
+            'last_latency_ms': self.last_latency * 1e3,
+            'max_latency_ms': self.max_latency * 1e3,
+        }
+
+
+# ==========================
+# 后端 (Backends)
+# 接口：dump() -> {dest: next_hop}      读回内核里本协议的路由
+#       apply(ops) -> {下标: 错误说明}   一次提交一个事务，返回失败的操作
+#       close()
+# ==========================
+class MemoryBackend:
+    """内存里的假内核路由表：记录每个事务，供测试 / 仿真使用"""
+    def __init__(self, routes=None, fail=None):
+        """
+        :param routes: 初始路由 (模拟上次运行的残留)
+        :param fail: 可选的 fail(op, dest, next_hop) -> 错误说明或 None，用来模拟内核拒绝
+        """
+        self.routes = dict(routes or {})
+        self.fail = fail
+        self.transactions = []  # 每个事务的操作列表
+
+    def dump(self):
+        return dict(self.routes)
+
+    def apply(self, ops):
+        self.transactions.append(list(ops))
+        failed = {}
+        for i, (op, dest, next_hop) in enumerate(ops):
+            error = self.fail(op, dest, next_hop) if self.fail is not None else None
+            if error:
+                failed[i] = error
+            elif op == DELETE:
+                self.routes.pop(dest, None)
+            else:
+                self.routes[dest] = next_hop
+        return failed
+
+    def close(self):
+        pass
+
+
+# --- netlink 协议常量 (linux/netlink.h, linux/rtnetlink.h) ---
+NLMSG_HDR = struct.Struct('=IHHII')      # len, type, flags, seq, pid
+RTMSG = struct.Struct('=BBBBBBBBI')      # family, dst_len, src_len, tos, table, protocol, scope, type, flags
+RTA_HDR = struct.Struct('=HH')           # len, type
+NLMSGERR = struct.Struct('=i')           # nlmsgerr.error (后面跟着出错请求的头部)
+
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+RTM_NEWROUTE, RTM_DELROUTE, RTM_GETROUTE = 24, 25, 26
+NLM_F_REQUEST, NLM_F_ACK = 0x1, 0x4
+NLM_F_DUMP = 0x300
+NLM_F_REPLACE, NLM_F_CREATE = 0x100, 0x400
+RTA_DST, RTA_OIF, RTA_GATEWAY, RTA_PRIORITY, RTA_TABLE = 1, 4, 5, 6, 15
+RT_SCOPE_UNIVERSE, RT_SCOPE_NOWHERE = 0, 255
+RTN_UNICAST = 1
+RT_TABLE_UNSPEC = 0
+
+
+def _rta(rta_type, payload):
+    length = RTA_HDR.size + len(payload)
+    return RTA_HDR.pack(length, rta_type) + payload + b'\0' * (-length & 3)
+
+
+def _u32(value):
+    return struct.pack('=I', value)
+
+
+def _addr(addr):
+    return struct.pack('!I', addr)
+
+
+class NetlinkBackend:
+    """
+    直接用 NETLINK_ROUTE socket 改内核路由表 (需要 CAP_NET_ADMIN)
+    一个事务的所有请求拼成一个缓冲区一次 sendmsg (超过 ROUTE_BATCH_BYTES 时分几次)，
+    内核按顺序处理并为每条请求回一个 ACK，收齐后按 seq 找出失败的操作
+    """
+    def __init__(self, table=ROUTE_TABLE, proto=ROUTE_PROTO, metric=ROUTE_METRIC, dev=None):
+        self.table = table
+        self.proto = proto
+        self.metric = metric
+        self.oif = socket.if_nametoindex(dev) if dev else None
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((0, 0))
+        self.seq = 0
+
+    def _route_msg(self, msg_type, flags, dest, next_hop):
+        """构造一条 RTM_NEWROUTE / RTM_DELROUTE 请求，返回 (seq, bytes)"""
+        self.seq = (self.seq + 1) & 0xffffffff
+        table = self.table if self.table < 256 else RT_TABLE_UNSPEC
+        scope = RT_SCOPE_UNIVERSE if msg_type == RTM_NEWROUTE else RT_SCOPE_NOWHERE
+        body = RTMSG.pack(socket.AF_INET, 32, 0, 0, table, self.proto, scope, RTN_UNICAST, 0)
+        body += _rta(RTA_TABLE, _u32(self.table))
+        body += _rta(RTA_DST, _addr(dest))
+        body += _rta(RTA_PRIORITY, _u32(self.metric))
+        if msg_type == RTM_NEWROUTE:
+            body += _rta(RTA_GATEWAY, _addr(next_hop))
+            if self.oif is not None:
+                body += _rta(RTA_OIF, _u32(self.oif))
+        header = NLMSG_HDR.pack(NLMSG_HDR.size + len(body), msg_type, flags | NLM_F_REQUEST | NLM_F_ACK,
+                                self.seq, 0)
+        return self.seq, header + body
+
+    def apply(self, ops):
+        pending = {}    # { seq: 操作下标 }
+        failed = {}
+        chunk = []
+        size = 0
+        for i, (op, dest, next_hop) in enumerate(ops):
+            if op == DELETE:
+                seq, msg = self._route_msg(RTM_DELROUTE, 0, dest, next_hop)
+            else:
+                seq, msg = self._route_msg(RTM_NEWROUTE, NLM_F_CREATE | NLM_F_REPLACE, dest, next_hop)
+            if size + len(msg) > ROUTE_BATCH_BYTES and chunk:
+                self._send(chunk, pending, failed)
+                chunk, size = [], 0
+            pending[seq] = i
+            chunk.append(msg)
+            size += len(msg)
+        if chunk:
+            self._send(chunk, pending, failed)
+        return failed
+
+    def _send(self, chunk, pending, failed):
+        """发出一批请求并收齐它们的 ACK"""
+        self.sock.sendall(b''.join(chunk))
+        waiting = len(chunk)
+        while waiting:
+            for msg_type, seq, payload in self._recv():
+                if msg_type != NLMSG_ERROR or seq not in pending:
+                    continue
+                waiting -= 1
+                i = pending.pop(seq)
+                error = -NLMSGERR.unpack_from(payload)[0]
+                # 删除一条已经不存在的路由 (例如接口 down 时被内核删掉了) 不算失败
+                if error and not (error == errno.ESRCH and self._is_delete(payload)):
+                    failed[i] = os.strerror(error)
+
+    def _recv(self):
+        data = self.sock.recv(1 << 20)
+        offset = 0
+        while offset + NLMSG_HDR.size <= len(data):
+            length, msg_type, _, seq, _ = NLMSG_HDR.unpack_from(data, offset)
+            if length < NLMSG_HDR.size:
+                break
+            yield msg_type, seq, data[offset + NLMSG_HDR.size:offset + length]
+            offset += (length + 3) & ~3
+
+    def dump(self):
+        """读回内核里本协议 (protocol == proto) 在本表中的 IPv4 主机路由"""
+        self.seq = (self.seq + 1) & 0xffffffff
+        seq = self.seq
+        body = RTMSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0, 0, 0)
+        self.sock.sendall(NLMSG_HDR.pack(NLMSG_HDR.size + len(body), RTM_GETROUTE,
+                                         NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + body)
+        routes = {}
+        while True:
+            for msg_type, msg_seq, payload in self._recv():
+                if msg_seq != seq:
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return routes
+                if msg_type == NLMSG_ERROR:
+                    raise OSError(-NLMSGERR.unpack_from(payload)[0], "netlink route dump failed")
+                if msg_type != RTM_NEWROUTE:
+                    continue
+                _, dst_len, _, _, table, proto, _, _, _ = RTMSG.unpack_from(payload)
+                if dst_len != 32 or proto != self.proto:
+                    continue
+                attrs = self._attrs(payload[RTMSG.size:])
+                if attrs.get(RTA_TABLE, table) != self.table or RTA_DST not in attrs:
+                    continue
+                routes[attrs[RTA_DST]] = attrs.get(RTA_GATEWAY, attrs[RTA_DST])
+
+    @staticmethod
+    def _attrs(data):
+        attrs = {}
+        offset = 0
+        while offset + RTA_HDR.size <= len(data):
+            length, rta_type = RTA_HDR.unpack_from(data, offset)
+            if length < RTA_HDR.size:
+                break
+            value = data[offset + RTA_HDR.size:offset + length]
+            if rta_type in (RTA_DST, RTA_GATEWAY) and len(value) == 4:
+                attrs[rta_type] = struct.unpack('!I', value)[0]
+            elif rta_type == RTA_TABLE and len(value) == 4:
+                attrs[rta_type] = struct.unpack('=I', value)[0]
+            offset += (length + 3) & ~3
+        return attrs
+
+    @staticmethod
+    def _is_delete(payload):
+        """NLMSG_ERROR 的负载里带着出错请求的头部，判断它是不是 RTM_DELROUTE"""
+        if len(payload) < NLMSGERR.size + NLMSG_HDR.size:
+            return False
+        return NLMSG_HDR.unpack_from(payload, NLMSGERR.size)[1] == RTM_DELROUTE
+
+    def close(self):
+        self.sock.close()
+
+
+class IPRouteBackend:
+    """
+    用 iproute2 的 `ip -force -batch -` 提交：一个事务一次 fork，而不是每条路由一次
+    -force 让 ip 出错后继续执行后面的行，并为每个失败的行输出 "Command failed -:行号"，据此逐条报告失败；
+    对不上行号时抛出 OSError，由 RouteInstaller 按结果不确定处理 (replace / del 重复执行都是安全的)
+    apply() 会等 ip 进程退出，调用方 (路由重算回调) 此时持有 OLSRNode.lock，见文件开头的说明
+    """
+    def __init__(self, table=ROUTE_TABLE, proto=ROUTE_PROTO, metric=ROUTE_METRIC, dev=None, ip='ip'):
+        self.table = table
+        self.proto = proto
+        self.metric = metric
+        self.dev = dev
+        self.ip = ip
+
+    def _line(self, op, dest, next_hop):
+        common = f"{int_to_ip(dest)}/32 table {self.table} proto {self.proto} metric {self.metric}"
+        if op == DELETE:
+            return f"route del {common}"
+        line = f"route replace {common} via {int_to_ip(next_hop)}"
+        return line + f" dev {self.dev}" if self.dev else line
+
+    def apply(self, ops):
+        script = "".join(self._line(*op) + "\n" for op in ops)
+        result = subprocess.run([self.ip, '-force', '-batch', '-'], input=script, capture_output=True, text=True)
+        if result.returncode == 0:
+            return {}
+        failed = {}
+        reported = False    # 至少对上了一个行号
+        error = None        # "Command failed" 前面那一行是具体的错误说明
+        for line in result.stderr.splitlines():
+            if line.startswith('Command failed'):
+                try:
+                    i = int(line.rsplit(':', 1)[1]) - 1
+                except (IndexError, ValueError):
+                    continue
+                reported = True
+                # 删除不存在的路由不算失败
+                if 0 <= i < len(ops) and not (ops[i][0] == DELETE and error and 'No such process' in error):
+                    failed[i] = error or line
+                error = None
+            elif line.strip():
+                error = line.strip()
+        if not reported:
+            raise OSError(f"ip -batch 退出码 {result.returncode}: {error or result.stderr.strip()}")
+        return failed
+
+    def dump(self):
+        result = subprocess.run([self.ip, '-4', 'route', 'show', 'table', str(self.table), 'proto', str(self.proto)],
+                                capture_output=True, text=True)
+        routes = {}
+        for line in result.stdout.splitlines():
+            fields = line.split()
+            if not fields or '/' in fields[0] and not fields[0].endswith('/32'):
+                continue
+            try:
+                dest = ip_to_int(fields[0].split('/')[0])
+                routes[dest] = ip_to_int(fields[fields.index('via') + 1]) if 'via' in fields else dest
+            except (ValueError, OSError, IndexError):
+                continue
+        return routes
+
+    def close(self):
+        pass
+
+
+BACKENDS = ('netlink', 'iproute2', 'memory')
+
+
+def make_backend(name, table=ROUTE_TABLE, dev=None):
+    if name == 'netlink':
+        return NetlinkBackend(table=table, dev=dev)
+    if name == 'iproute2':
+        return IPRouteBackend(table=table, dev=dev)
+    if name == 'memory':
+        return MemoryBackend()
+    raise ValueError(f"unknown route install backend: {name}")
+
+
+if __name__ == "__main__":
+    # 自检 1：用 MemoryBackend 模拟"接口还没 up，内核拒绝路由"，拓扑稳定 (没有重算) 时靠定时重试装上
+    from expiry_scheduler import ExpiryScheduler
+    now = [0.0]
+    expiry = ExpiryScheduler(clock=lambda: now[0])
+    link_up = [False]
+    backend = MemoryBackend(fail=lambda op, dest, next_hop: None if link_up[0] else 'Network is unreachable')
+    table = {ip_to_int('10.0.0.3'): {'next_hop': ip_to_int('10.0.0.2'), 'distance': 2}}
+    installer = RouteInstaller(table, backend, expiry=expiry)
+    installer.sync()
+    assert not backend.routes and installer.retry
+    link_up[0] = True
+    now[0] = ROUTE_RETRY_INTERVAL + 0.1
+    expiry.run_due()
+    assert backend.routes == {ip_to_int('10.0.0.3'): ip_to_int('10.0.0.2')} and not installer.retry, backend.routes
+    print("重试后已安装:", {int_to_ip(d): int_to_ip(n) for d, n in backend.routes.items()}, installer.stats())
+
+    # 自检 2：replace 被内核拒绝 (内核里仍是旧路由)，之后目的节点离开路由表，旧路由要被删掉
+    backend = MemoryBackend(fail=lambda op, dest, next_hop: 'Network is unreachable' if op == REPLACE else None)
+    table = {ip_to_int('10.0.0.3'): {'next_hop': ip_to_int('10.0.0.2'), 'distance': 2}}
+    installer = RouteInstaller(table, backend)
+    installer.sync()
+    table[ip_to_int('10.0.0.3')] = {'next_hop': ip_to_int('10.0.0.4'), 'distance': 2}
+    installer.update({ip_to_int('10.0.0.3')})
+    del table[ip_to_int('10.0.0.3')]
+    installer.update({ip_to_int('10.0.0.3')})
+    installer.close()
+    assert not backend.routes, backend.routes
+    print("replace 失败后删除: 内核路由表已清空")
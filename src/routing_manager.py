@@ -1,19 +1,64 @@
 # 引入你之前上传的 dijkstra 模块
 from dijkstra import dijkstra
+from dynamic_spf import DynamicSPF
+import logging
+
+from node_addr import int_to_ip
+from olsr_log import get_logger
+
+log = get_logger('routing')
 
 class RoutingManager:
-    def __init__(self, my_ip, neighbor_manager, topology_manager):
+    def __init__(self, my_ip, neighbor_manager, topology_manager, backend='dynamic'):
+        """
+        :param backend: 路由计算后端
+            'dynamic' : 增量最短路径 DynamicSPF (默认)
+            'csr'     : CSR 邻接数组 + 向量化 BFS (见 csr_routing.py)
+            'scipy'   : CSR 邻接数组 + scipy.sparse.csgraph
+        """
         self.my_ip = my_ip
         self.neighbor_manager = neighbor_manager
         self.topology_manager = topology_manager
+        self.backend = backend
         
-        # 路由表: { dest_ip: next_hop_ip }
-        # 或者更详细: { dest_ip: {'next_hop': ip, 'dist': n} }
-        self.routing_table = {}
+        # 路由引擎：邻居管理器和拓扑管理器直接把边的增删推送给它
+        # DynamicSPF 的图和最短路径树在两次计算之间保留；CSR 后端在 update() 时整体重算
+        if backend == 'dynamic':
+            self.spf = DynamicSPF(my_ip)
+        elif backend in ('csr', 'scipy'):
+            # 按需加载：只有选了 CSR 后端的节点才 import NumPy / SciPy
+            from csr_routing import CSRRouting
+            self.spf = CSRRouting(my_ip, backend)
+        else:
+            raise ValueError(f"unknown routing backend: {backend}")
+        neighbor_manager.route_listener = self.spf
+        topology_manager.route_listener = self.spf
+
+        # 路由表: { dest_ip: {'next_hop': ip, 'distance': n} }，地址均为内部 int 表示
+        # 由路由引擎原地维护，这里只是同一个字典的引用
+        self.routing_table = self.spf.routing_table
+
+        # 路由变化通知 on_routes_changed(changed_dests)，由数据面注册，用来清下一跳缓存
+        self.on_routes_changed = None
 
     def recalculate_routing_table(self):
         """
-        核心函数：将 OLSR 数据转换为图，计算 Dijkstra，更新路由表
+        核心函数：把管理器上报的边增量交给路由引擎，更新路由表
+        (DynamicSPF 只修复受影响的子树，CSR 后端整体重算后只改写变化的条目)
+        """
+        changed = self.spf.update()
+        if changed:
+            if self.on_routes_changed is not None:
+                self.on_routes_changed(changed)
+            # 整张表只在 debug 级别才格式化
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("路由表更新 (%d 条变化):\n%s", len(changed), self.format_routing_table())
+        return changed
+
+    def compute_full_routing_table(self):
+        """
+        全量计算：将 OLSR 数据转换为图，计算 Dijkstra，返回一张新的路由表
+        不修改 self.routing_table，用于和增量结果做对照校验
         """
         # --- 第一步：构建图 (Graph Construction) ---
         # 格式: {node: [(neighbor, weight), ...]}
@@ -55,7 +100,7 @@ class RoutingManager:
 
         # 1.3 添加全局拓扑链路 (Last_IP -> Dest_IP)
         # 来源: TopologyManager
-        for (dest_ip, last_ip), topo_tuple in self.topology_manager.topology_set.items():
+        for last_ip, dest_ip in self.topology_manager.iter_links():
             # 确保节点存在于图中
             if last_ip not in graph:
                 graph[last_ip] = []
@@ -97,14 +142,22 @@ class RoutingManager:
                     'distance': dist[target_node]
                 }
 
-        # 更新并打印
-        self.routing_table = new_routing_table
-        self.print_routing_table()
+        return new_routing_table
 
-    def print_routing_table(self):
-        print("\n=== 路由表更新 (Routing Table) ===")
-        print(f"{'Destination':<16} | {'Next Hop':<16} | {'Distance'}")
-        print("-" * 46)
+    def export_routing_table(self):
+        """对外接口：导出点分十进制字符串形式的路由表"""
+        return {
+            int_to_ip(dest): {'next_hop': int_to_ip(info['next_hop']), 'distance': info['distance']}
+            for dest, info in self.routing_table.items()
+        }
+
+    def format_routing_table(self):
+        lines = [f"{'Destination':<16} | {'Next Hop':<16} | {'Distance'}", "-" * 46]
         for dest, info in self.routing_table.items():
-            print(f"{dest:<16} | {info['next_hop']:<16} | {info['distance']}")
+            lines.append(f"{int_to_ip(dest):<16} | {int_to_ip(info['next_hop']):<16} | {info['distance']}")
+        return "\n".join(lines)
+
+    def print_routing_table(self):
+        print("\n=== 路由表 (Routing Table) ===")
+        print(self.format_routing_table())
         print("=" * 46 + "\n")
\ No newline at end of file
@@ -0,0 +1,546 @@
+'''
+本文件实现进程内的离散事件仿真器，用来在一个进程里跑成百上千个 OLSRNode
+
+mininet_test.py 写死了 4 台主机，还需要 root 和 Mininet，没法衡量控制面在更大规模下的表现。
+仿真模式下：
+1. 虚拟时钟 SimLoop：事件按 (时刻, 登记顺序) 放进最小堆，没有事件时直接跳到下一个事件的时刻，
+   接口是 asyncio 事件循环的子集 (call_later / call_at / call_soon / time)，
+   所以节点的定时逻辑直接复用 AsyncRuntime (SimRuntime 只替换收包入口)
+2. 虚拟广播信道 SimMedium：按拓扑 (有向邻接表) 把控制包广播给一跳邻居、把数据包单播给下一跳，
+   每条链路单独配置丢包率和时延，收到的包在 "发送时刻 + 时延 + 抖动" 投递
+3. 每个节点用 SimTransport 代替 UDP socket，用 SimLoop.time 代替 time.time (见 transport.py)
+4. 确定性：信道用独立的 random.Random(seed)，协议里的抖动 (HELLO / TC 间隔、发送聚合) 用的全局
+   random 在创建仿真器时用同一个 seed 播种；同样的 seed 和拓扑，事件序列完全一致
+5. install_routes=True 时每个节点把路由导出到内存里的假内核路由表 (route_installer.MemoryBackend)，
+   统计整网的内核路由变动 (add / replace / delete) 次数
+6. restart_node() / --restart：节点重启后序列号从头开始，检查邻居不会把它的新消息当成重复丢掉
+
+用法: python3 sim.py --topology grid --nodes 1000 --duration 60 --seed 1
+'''
+import heapq
+import random
+import time
+from collections import deque
+
+from async_runtime import AsyncRuntime
+from olsr_main import OLSRNode
+from route_installer import MemoryBackend
+from node_addr import ip_to_int, int_to_ip, to_addr
+from msg_view import iter_messages
+from olsr_log import get_logger, configure
+from constants import HELLO_INTERVAL, DUP_HOLD_TIME, SIM_LINK_DELAY, SIM_LINK_JITTER, SIM_MAX_DATAGRAM
+
+SIM_PORT = 5005
+BASE_ADDR = ip_to_int('10.0.0.1')   # 拓扑生成器给第 i 个节点分配 BASE_ADDR + i
+
+log = get_logger('runtime')
+
+
+class SimHandle:
+    """call_later 返回的定时器句柄，和 asyncio.TimerHandle 一样可以 cancel()"""
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class SimLoop:
+    """虚拟时间的事件循环"""
+    def __init__(self, start=0.0):
+        self.now = start
+        self.heap = []      # [(when, seq, handle)]
+        self._seq = 0
+        self.events = 0     # 已执行的事件数
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback, *args):
+        handle = SimHandle(when, callback, args)
+        self._seq += 1
+        heapq.heappush(self.heap, (when, self._seq, handle))
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.now + delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        return self.call_at(self.now, callback, *args)
+
+    def run_until(self, end):
+        """执行 end 时刻之前的所有事件，时钟停在 end"""
+        heap = self.heap
+        pop = heapq.heappop
+        while heap and heap[0][0] <= end:
+            when, _, handle = pop(heap)
+            if handle.cancelled:
+                continue
+            self.now = when
+            self.events += 1
+            handle.callback(*handle.args)
+        self.now = end
+
+
+class SimMedium:
+    """
+    虚拟广播信道：links[src][dst] = (丢包率, 时延)，有向；对称链路两个方向各一项
+    """
+    def __init__(self, loop, seed=0, loss=0.0, delay=SIM_LINK_DELAY, jitter=SIM_LINK_JITTER):
+        self.loop = loop
+        self.rng = random.Random(seed)
+        self.loss = loss            # 新建链路的默认丢包率
+        self.delay = delay          # 新建链路的默认时延
+        self.jitter = jitter
+        self.links = {}             # { src: { dst: (loss, delay) } }
+        self.runtimes = {}          # { addr: SimRuntime }
+
+        # --- 统计计数 ---
+        self.control_sent = 0       # 广播次数
+        self.data_sent = 0
+        self.delivered = 0          # 投递给接收节点的包数 (控制 + 数据)
+        self.lost = 0               # 被链路丢包丢掉的
+        self.unreachable = 0        # 单播的下一跳不是一跳邻居
+        self.bytes = 0
+        self.msg_count = {}         # 广播出去的控制消息 { 消息类型: 条数 }
+        self.msg_bytes = {}         # { 消息类型: 字节数 (消息头 + 消息体) }
+
+    def attach(self, runtime):
+        addr = runtime.node.my_ip
+        self.runtimes[addr] = runtime
+        self.links.setdefault(addr, {})
+
+    def add_link(self, a, b, loss=None, delay=None, symmetric=True):
+        """添加 (或修改) 链路 a -> b，symmetric=True 时同时添加 b -> a"""
+        conf = (self.loss if loss is None else loss, self.delay if delay is None else delay)
+        self.links.setdefault(a, {})[b] = conf
+        if symmetric:
+            self.links.setdefault(b, {})[a] = conf
+
+    def remove_link(self, a, b, symmetric=True):
+        self.links.get(a, {}).pop(b, None)
+        if symmetric:
+            self.links.get(b, {}).pop(a, None)
+
+    def neighbors(self, addr):
+        return self.links.get(addr, {})
+
+    def _transmit(self, link, callback, *args):
+        loss, delay = link
+        if loss and self.rng.random() < loss:
+            self.lost += 1
+            return
+        if self.jitter:
+            delay += self.jitter * self.rng.random()
+        self.loop.call_later(delay, callback, *args)
+
+    def broadcast(self, src, packet):
+        """控制包：发给 src 的每个一跳邻居，各条链路独立丢包"""
+        self.control_sent += 1
+        self.bytes += len(packet)
+        for msg in iter_messages(packet):
+            msg_type = msg.msg_type
+            self.msg_count[msg_type] = self.msg_count.get(msg_type, 0) + 1
+            self.msg_bytes[msg_type] = self.msg_bytes.get(msg_type, 0) + msg.size
+        src_addr = (int_to_ip(src), SIM_PORT)
+        for dst, link in self.links[src].items():
+            self._transmit(link, self._deliver_control, dst, packet, src_addr)
+
+    def unicast(self, src, dst, packet):
+        """数据包：只有 dst 是 src 的一跳邻居时才能送达"""
+        self.data_sent += 1
+        self.bytes += len(packet)
+        link = self.links[src].get(dst)
+        if link is None:
+            self.unreachable += 1
+            return
+        self._transmit(link, self._deliver_data, dst, packet)
+
+    def _deliver_control(self, dst, packet, src_addr):
+        runtime = self.runtimes.get(dst)
+        if runtime is not None and runtime.up:
+            self.delivered += 1
+            runtime.on_datagram(packet, src_addr)
+
+    def _deliver_data(self, dst, packet):
+        runtime = self.runtimes.get(dst)
+        if runtime is not None and runtime.up:
+            self.delivered += 1
+            runtime.on_data(packet)
+
+
+class SimTransport:
+    """OLSRNode 的仿真收发接口：没有 socket，包交给虚拟信道 (接口说明见 transport.py)"""
+    def __init__(self, medium, addr, port=SIM_PORT, max_datagram=SIM_MAX_DATAGRAM):
+        self.medium = medium
+        self.addr = addr
+        self.sock = None
+        self.data_sock = None
+        self.port = port
+        self.data_port = port + 1
+        self.max_datagram = max_datagram
+
+    def sendto(self, packet, addr):
+        self.medium.broadcast(self.addr, bytes(packet))
+
+    def send_data(self, packet, addr):
+        # packet 可能是数据面预分配缓冲区上的视图，在途期间必须有自己的副本
+        self.medium.unicast(self.addr, ip_to_int(addr[0]), bytes(packet))
+
+
+class SimRuntime(AsyncRuntime):
+    """
+    复用 AsyncRuntime 的定时逻辑 (HELLO / TC / 过期 / 合并窗口 / 发送聚合 / 出口调度)，
+    事件循环换成 SimLoop，收包由 SimMedium 直接调用
+    """
+    def __init__(self, node, loop):
+        super().__init__(node)
+        self.loop = loop
+        self.up = False
+
+    def start(self, offset=0.0):
+        """offset 秒后发出第一个 HELLO (错开各节点的启动时刻)"""
+        self.install()
+        self.up = True
+        self._hello_handle = self.loop.call_later(offset, self._hello_tick)
+        self._tc_handle = self.loop.call_later(offset + random.random(), self._tc_tick)
+
+    def stop(self):
+        """节点失效：不再发送，也不再接收"""
+        self.up = False
+        self.cancel_timers()
+
+    def on_datagram(self, data, addr):
+        try:
+            self.node.process_batch([(data, addr)])
+        except Exception as e:
+            log.error("收包出错: %s", e)
+        self._arm_recompute()
+
+    def on_data(self, packet):
+        buf = bytearray(packet)
+        try:
+            self.node.data_plane.handle(memoryview(buf), len(buf))
+        except Exception as e:
+            log.error("数据面出错: %s", e)
+
+
+# ==========================
+# 拓扑生成
+# ==========================
+def line_topology(n):
+    return [(i, i + 1) for i in range(n - 1)]
+
+
+def grid_topology(width, height):
+    edges = []
+    for y in range(height):
+        for x in range(width):
+            i = y * width + x
+            if x + 1 < width:
+                edges.append((i, i + 1))
+            if y + 1 < height:
+                edges.append((i, i + width))
+    return edges
+
+
+def random_geometric_topology(n, radius, rng):
+    """
+    单位正方形内随机撒 n 个点，距离不超过 radius 的点之间有链路
+    (按 radius 分格子，只比较相邻格子里的点)
+    """
+    points = [(rng.random(), rng.random()) for _ in range(n)]
+    cells = {}
+    for i, (x, y) in enumerate(points):
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(i)
+    r2 = radius * radius
+    edges = []
+    for (cx, cy), members in cells.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cx + dx, cy + dy), ()):
+                    xj, yj = points[j]
+                    for i in members:
+                        if i < j:
+                            xi, yi = points[i]
+                            if (xi - xj) ** 2 + (yi - yj) ** 2 <= r2:
+                                edges.append((i, j))
+    return edges
+
+
+def clustered_topology(n, clusters, rng, bridges=2):
+    """
+    n 个节点分成 clusters 个簇，簇内是平均度数约为 6 的随机几何图，
+    相邻两簇 (首尾相接成环) 之间随机连 bridges 条链路
+    """
+    clusters = max(1, min(clusters, n))
+    sizes = [n // clusters + (1 if c < n % clusters else 0) for c in range(clusters)]
+    edges = []
+    members = []
+    start = 0
+    for size in sizes:
+        radius = (6.0 / (3.14159 * max(size, 1))) ** 0.5
+        edges.extend((start + i, start + j) for i, j in random_geometric_topology(size, radius, rng))
+        members.append(range(start, start + size))
+        start += size
+    if clusters > 1:
+        for c in range(clusters if clusters > 2 else 1):
+            a, b = members[c], members[(c + 1) % clusters]
+            for _ in range(bridges):
+                edges.append((rng.choice(a), rng.choice(b)))
+    return edges
+
+
+class Simulator:
+    """
+    :param seed: 随机种子 (信道丢包 / 时延抖动 / 协议抖动 / 节点启动时刻)
+    :param loss, delay, jitter: 新建链路的默认丢包率、时延和抖动
+    :param install_routes: 每个节点把路由导出到内存里的假内核路由表，统计路由变动
+    """
+    def __init__(self, seed=0, loss=0.0, delay=SIM_LINK_DELAY, jitter=SIM_LINK_JITTER,
+                 route_backend='dynamic', install_routes=False):
+        random.seed(seed)
+        self.seed = seed
+        self.rng = random.Random(seed + 1)
+        self.loop = SimLoop()
+        self.medium = SimMedium(self.loop, seed, loss, delay, jitter)
+        self.route_backend = route_backend
+        self.install_routes = install_routes
+        self.nodes = {}         # { addr: OLSRNode }
+        self.wall_time = 0.0    # run() 实际耗费的时间
+
+    # ==========================
+    # 构建网络
+    # ==========================
+    def add_node(self, ip):
+        addr = to_addr(ip)
+        node = OLSRNode(addr, transport=SimTransport(self.medium, addr), clock=self.loop.time,
+                        route_backend=self.route_backend)
+        node.runtime = SimRuntime(node, self.loop)
+        if self.install_routes:
+            node.enable_route_install(MemoryBackend())
+        self.medium.attach(node.runtime)
+        self.nodes[addr] = node
+        return node
+
+    def add_link(self, a, b, loss=None, delay=None, symmetric=True):
+        self.medium.add_link(to_addr(a), to_addr(b), loss, delay, symmetric)
+
+    def remove_link(self, a, b, symmetric=True):
+        self.medium.remove_link(to_addr(a), to_addr(b), symmetric)
+
+    def build(self, n, edges, **link_conf):
+        """按编号建 n 个节点 (地址 10.0.0.1 起) 和边列表 [(i, j)]，返回地址列表"""
+        addrs = [BASE_ADDR + i for i in range(n)]
+        for addr in addrs:
+            self.add_node(addr)
+        for i, j in edges:
+            self.medium.add_link(addrs[i], addrs[j], **link_conf)
+        return addrs
+
+    def start(self, stagger=HELLO_INTERVAL):
+        """启动所有节点，第一个 HELLO 在 [0, stagger) 内随机错开"""
+        for node in self.nodes.values():
+            node.runtime.start(self.rng.random() * stagger)
+
+    def fail_node(self, ip):
+        """节点失效：停止收发，邻居靠 HELLO 超时发现"""
+        self.nodes[to_addr(ip)].runtime.stop()
+
+    def restart_node(self, ip, offset=0.0):
+        """
+        节点重启：旧实例停止，同一地址换一个全新的 OLSRNode (消息序列号从头开始)，offset 秒后发出第一个 HELLO
+        邻居的重复检测窗口里还留着旧实例的序列号，用来检查重启后的消息不会被当成重复丢掉
+        """
+        addr = to_addr(ip)
+        self.nodes[addr].runtime.stop()
+        node = self.add_node(addr)
+        node.runtime.start(offset)
+        return node
+
+    # ==========================
+    # 运行
+    # ==========================
+    def run(self, duration):
+        """仿真推进 duration 秒 (虚拟时间)"""
+        t0 = time.perf_counter()
+        self.loop.run_until(self.loop.now + duration)
+        self.wall_time += time.perf_counter() - t0
+
+    def run_until_converged(self, timeout, step=1.0):
+        """每隔 step 秒 (虚拟时间) 检查一次，全部收敛返回收敛时刻，超时返回 None"""
+        end = self.loop.now + timeout
+        expected = self.expected_distances()
+        while self.loop.now < end:
+            self.run(min(step, end - self.loop.now))
+            if self.convergence(expected) == 1.0:
+                return self.loop.now
+        return None
+
+    # ==========================
+    # 收敛检查
+    # ==========================
+    def expected_distances(self):
+        """在信道拓扑 (只算双向链路、在线节点) 上 BFS，得到每个节点到其余可达节点的跳数"""
+        links = self.medium.links
+        up = {addr for addr, node in self.nodes.items() if node.runtime.up}
+        sym = {a: [b for b in links[a] if b in up and a in links.get(b, ())] for a in up}
+        expected = {}
+        for src in up:
+            dist = {src: 0}
+            queue = deque([src])
+            while queue:
+                u = queue.popleft()
+                d = dist[u] + 1
+                for v in sym[u]:
+                    if v not in dist:
+                        dist[v] = d
+                        queue.append(v)
+            del dist[src]
+            expected[src] = dist
+        return expected
+
+    def convergence(self, expected=None):
+        """路由表与最短跳数完全一致 (目的集合、跳数都对，下一跳是一跳邻居) 的节点比例"""
+        if expected is None:
+            expected = self.expected_distances()
+        if not expected:
+            return 1.0
+        links = self.medium.links
+        good = 0
+        for addr, dist in expected.items():
+            table = self.nodes[addr].routing_manager.routing_table
+            if len(table) != len(dist):
+                continue
+            neighbors = links[addr]
+            for dest, d in dist.items():
+                route = table.get(dest)
+                if route is None or route['distance'] != d or route['next_hop'] not in neighbors:
+                    break
+            else:
+                good += 1
+        return good / len(expected)
+
+    def stats(self):
+        medium = self.medium
+        sim_time = self.loop.now
+        return {
+            'nodes': len(self.nodes),
+            'links': sum(len(v) for v in medium.links.values()) // 2,
+            'seed': self.seed,
+            'sim_time': sim_time,
+            'wall_time': self.wall_time,
+            'speedup': sim_time / self.wall_time if self.wall_time else 0.0,
+            'events': self.loop.events,
+            'control_sent': medium.control_sent,
+            'data_sent': medium.data_sent,
+            'delivered': medium.delivered,
+            'lost': medium.lost,
+            'bytes': medium.bytes,
+            'route_churn': self.route_churn(),
+        }
+
+    def route_churn(self):
+        """整网的内核路由变动次数 (没有开启 install_routes 时为 None)"""
+        if not self.install_routes:
+            return None
+        churn = dict.fromkeys(('transactions', 'adds', 'replaces', 'deletes', 'failures'), 0)
+        for node in self.nodes.values():
+            stats = node.route_installer.stats()
+            for key in churn:
+                churn[key] += stats[key]
+        return churn
+
+
+def restart_check(sim, ip, duration=DUP_HOLD_TIME + 10):
+    """
+    重启检查：节点正常运行超过 DUP_HOLD_TIME 后重启 (序列号从 1 开始，仍落在邻居的重复检测窗口里，
+    但邻居记下的同样序列号都已超过 DUP_HOLD_TIME)，之后每秒检查一次收敛，
+    返回 (未收敛的秒数, 最后一次未收敛距重启的秒数)
+    正常情况下只在重新建立链路的几秒内未收敛；如果重启后的消息被当成重复，会持续到 DUP_HOLD_TIME 左右
+    """
+    addr = to_addr(ip)
+    sim.run(DUP_HOLD_TIME + HELLO_INTERVAL * 5)
+    t0 = sim.loop.now
+    sim.restart_node(addr)
+    unconverged, last = 0, None
+    while sim.loop.now < t0 + duration:
+        sim.run(1.0)
+        if sim.convergence() < 1.0:
+            unconverged += 1
+            last = sim.loop.now - t0
+    return unconverged, last
+
+
+TOPOLOGIES = ('line', 'grid', 'random', 'clustered')
+
+
+def make_topology(name, n, rng):
+    """返回 (实际节点数, 边列表)"""
+    if name == 'line':
+        return n, line_topology(n)
+    if name == 'grid':
+        width = max(1, int(round(n ** 0.5)))
+        height = (n + width - 1) // width
+        return width * height, grid_topology(width, height)
+    if name == 'random':
+        # 平均度数约为 8 的随机几何图
+        radius = (8.0 / (3.14159 * max(n, 1))) ** 0.5
+        return n, random_geometric_topology(n, radius, rng)
+    if name == 'clustered':
+        return n, clustered_topology(n, max(2, int(round(n ** 0.5 / 2))), rng)
+    raise ValueError(f"unknown topology: {name}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="OLSR 控制面离散事件仿真")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="grid")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60.0, help="最多仿真多少秒 (虚拟时间)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--loss", type=float, default=0.0, help="每条链路的丢包率")
+    parser.add_argument("--delay", type=float, default=SIM_LINK_DELAY, help="每跳时延 (秒)")
+    parser.add_argument("--route-backend", choices=["dynamic", "csr", "scipy"], default="dynamic")
+    parser.add_argument("--log", default=None,
+                        help="节点日志级别，例如 info 或 info,mpr=debug (默认只输出 warning 以上)")
+    parser.add_argument("--install-routes", action="store_true",
+                        help="把路由导出到内存里的假内核路由表，统计路由变动次数")
+    parser.add_argument("--restart", action="store_true",
+                        help="收敛后重启第一个节点 (序列号从头开始)，检查全网多久重新收敛")
+    args = parser.parse_args()
+
+    if args.log:
+        configure(args.log)
+    sim = Simulator(seed=args.seed, loss=args.loss, delay=args.delay, route_backend=args.route_backend,
+                    install_routes=args.install_routes)
+    n, edges = make_topology(args.topology, args.nodes, random.Random(args.seed))
+    sim.build(n, edges)
+    sim.start()
+    converged = sim.run_until_converged(args.duration)
+
+    s = sim.stats()
+    print(f"拓扑 {args.topology}: {s['nodes']} 节点 / {s['links']} 链路, seed={args.seed}, loss={args.loss:.0%}")
+    if converged is None:
+        print(f"{args.duration:.0f} 秒内未收敛，收敛节点比例 {sim.convergence():.1%}")
+    else:
+        print(f"收敛时刻 {converged:.1f} s (虚拟时间)")
+    print(f"仿真 {s['sim_time']:.1f} s 用时 {s['wall_time']:.1f} s (加速比 {s['speedup']:.1f}x), "
+          f"事件 {s['events']}, 控制包 {s['control_sent']}, 投递 {s['delivered']}, 丢失 {s['lost']}")
+    if args.restart and converged is not None:
+        unconverged, last = restart_check(sim, BASE_ADDR)
+        print(f"重启 {int_to_ip(BASE_ADDR)} 后: 未收敛 {unconverged} s"
+              + (f", 最后一次未收敛在重启后 {last:.1f} s" if last is not None else ""))
+    churn = s['route_churn']
+    if churn is not None:
+        print(f"内核路由变动: 事务 {churn['transactions']}, add {churn['adds']}, replace {churn['replaces']}, "
+              f"delete {churn['deletes']}, 失败 {churn['failures']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,25 @@
 import struct
 import socket
+from node_addr import to_addr
 
 def create_tc_body(ansn, advertised_neighbors):
     """
     构造 TC 消息体 (Pack)
     :param ansn: Advertised Neighbor Sequence Number (int, 0-65535)
-    :param advertised_neighbors: list of neighbor IP strings
+    :param advertised_neighbors: list of neighbor addresses (32 位整数，兼容 IP 字符串)
     """
     # 1. 固定头部: ANSN (2B) + Reserved (2B)
     # !HH 代表两个 unsigned short (大端序)
     fixed_part = struct.pack('!HH', ansn, 0)
     
-    # 2. 邻居列表部分
-    neigh_part = b''
-    for ip_str in advertised_neighbors:
+    # 2. 邻居列表部分：整数地址一次打包
+    addrs = []
+    for ip in advertised_neighbors:
         try:
-            # 将字符串 IP 转为 4 字节二进制
-            neigh_part += socket.inet_aton(ip_str)
+            addrs.append(to_addr(ip))
         except OSError:
-            print(f"[TC Pack Error] Invalid IP: {ip_str}")
+            print(f"[TC Pack Error] Invalid IP: {ip}")
+    neigh_part = struct.pack(f'!{len(addrs)}I', *addrs)
             
     return fixed_part + neigh_part
 
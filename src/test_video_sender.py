@@ -1,11 +1,22 @@
 import socket
 import struct
-import time
 import cv2
 
+from video_pipeline import VideoPipeline, AdaptiveQuality
+
 HEADER_FMT = "!IHH"
 HEADER_SIZE = struct.calcsize(HEADER_FMT)
 
+def send_chunks(sock, data, frame_id, addr, max_payload=1200):
+    """把一帧切成 max_payload 大小的分片，加上 (frame_id, chunk_id, total_chunks) 头发出去"""
+    total_chunks = (len(data) + max_payload - 1) // max_payload
+    view = memoryview(data)
+    for chunk_id in range(total_chunks):
+        start = chunk_id * max_payload
+        payload = view[start:start + max_payload]
+        header = struct.pack(HEADER_FMT, frame_id, chunk_id, total_chunks)
+        sock.sendto(header + payload, addr)
+
 def main():
     # === 配置 ===
     video_path = "demo.mp4"   # 改成你要发送的视频文件
@@ -13,8 +24,10 @@ def main():
     dst_port = 5000
 
     max_payload = 1200         # UDP负载大小（不含头）
-    jpeg_quality = 60          # JPEG质量(0-100)
+    jpeg_quality = 60          # JPEG质量(0-100)，开启自适应时为初始质量
     realtime = True            # True: 按视频原FPS节奏发送；False: 尽快发送
+    adaptive = True            # 根据发送积压自动调整 JPEG 质量 / 分辨率
+    encode_workers = 2         # 并行编码的线程数 (OpenCV 编码时释放 GIL)
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
@@ -26,51 +39,35 @@ def main():
     fps = cap.get(cv2.CAP_PROP_FPS)
     if fps is None or fps <= 1e-6:
         fps = 25.0
-    frame_interval = 1.0 / fps
-
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
-    frame_id = 0
 
     print(f"Sending file '{video_path}' to udp://{dst_ip}:{dst_port}, fps={fps:.2f}")
 
-    last_send = time.time()
-
-    try:
-        while True:
-            ok, frame = cap.read()
-            if not ok:
-                print("视频读取结束。")
-                break
+    # 采集 / 编码 / 发送 三级流水线 (见 video_pipeline.py)
+    def read_frame():
+        ok, frame = cap.read()
+        if not ok:
+            print("视频读取结束。")
+            return None
+        # 可选：缩小分辨率降码率
+        # frame = cv2.resize(frame, (640, 360))
+        return frame
 
-            # 可选：缩小分辨率降码率
-            # frame = cv2.resize(frame, (640, 360))
-
-            ok, buf = cv2.imencode(".jpg", frame, encode_param)
-            if not ok:
-                continue
-            data = buf.tobytes()
-
-            total_chunks = (len(data) + max_payload - 1) // max_payload
-
-            for chunk_id in range(total_chunks):
-                start = chunk_id * max_payload
-                end = min(start + max_payload, len(data))
-                payload = data[start:end]
-                header = struct.pack(HEADER_FMT, frame_id, chunk_id, total_chunks)
-                sock.sendto(header + payload, (dst_ip, dst_port))
+    frame_id = 0
 
-            frame_id = (frame_id + 1) & 0xFFFFFFFF
+    def send(data):
+        nonlocal frame_id
+        send_chunks(sock, data, frame_id, (dst_ip, dst_port), max_payload)
+        frame_id = (frame_id + 1) & 0xFFFFFFFF
 
-            # 按原FPS节奏发送（可选）
-            if realtime:
-                now = time.time()
-                elapsed = now - last_send
-                sleep_time = frame_interval - elapsed
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                last_send = time.time()
+    pipeline = VideoPipeline(read_frame, send, fps, workers=encode_workers, realtime=realtime, quality=jpeg_quality,
+                             adaptive=AdaptiveQuality(quality=jpeg_quality) if adaptive else None)
 
+    try:
+        stats = pipeline.run()
+        print(f"发送 {stats['sent']} 帧, {stats['fps']:.1f} fps, 帧间隔抖动 {stats['interval_jitter_ms']:.1f} ms, "
+              f"最终质量 {stats['quality']} / 缩放 {stats['scale']:.2f}")
     except KeyboardInterrupt:
+        pipeline.stop()
         print("Sender stopped.")
     finally:
         cap.release()
@@ -0,0 +1,119 @@
+'''
+本文件是可选的拓扑可视化工具
+
+原来 dijkstra.py 在模块顶层 import networkx 和 matplotlib.pyplot，只为了 draw_graph，
+而 routing_manager 会 import dijkstra，于是每个 OLSR 节点进程启动时都要加载这些绘图库
+(几秒的启动时间和几十 MB 内存)。现在绘图功能单独放在这里，只有真正画图时才加载绘图库：
+1. 运行中的节点调用 OLSRNode.write_snapshot() (或收到 SIGUSR1) 把邻居 / 二跳 / 拓扑 / 路由表写成 JSON 快照
+2. 本工具读取快照，还原出整张拓扑图，画出来并高亮本节点的下一跳和到某个目的节点的路径
+
+用法: python3 topo_viz.py 快照.json [--to 目的IP] [-o 输出图片]
+'''
+import json
+
+from dijkstra import dijkstra, reconstruct_path
+
+
+def _plotting():
+    """按需加载绘图库"""
+    try:
+        import networkx as nx
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        raise ImportError("拓扑可视化需要 networkx 和 matplotlib: pip install networkx matplotlib") from e
+    return nx, plt
+
+
+def load_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def snapshot_graph(snapshot):
+    """
+    由快照还原拓扑图 (邻接表格式，与 dijkstra 相同)
+    边：我 -> 对称邻居，对称邻居 -> 二跳，TC 宣告的 last -> dest
+    """
+    me = snapshot['node']
+    graph = {me: []}
+
+    def add(u, v):
+        graph.setdefault(u, [])
+        graph.setdefault(v, [])
+        if (v, 1.0) not in graph[u]:
+            graph[u].append((v, 1.0))
+
+    sym = {n['ip'] for n in snapshot['neighbors'] if n['status'] == 1}
+    for ip in sym:
+        add(me, ip)
+    for neighbor_ip, two_hop_ip in snapshot['two_hop']:
+        if neighbor_ip in sym:
+            add(neighbor_ip, two_hop_ip)
+    for last_ip, dest_ip in snapshot['topology']:
+        add(last_ip, dest_ip)
+    return graph
+
+
+def draw_graph(graph, path=None, highlight=None, title="Graph with Shortest Path Highlighted", output=None): #绘制图的函数，输入为图和路径
+    """
+    :param path: 要高亮的路径 (节点列表)，画成红色
+    :param highlight: 额外高亮的边列表 (例如本节点到各下一跳)，画成橙色
+    :param output: 图片文件名，为 None 时弹窗显示
+    """
+    nx, plt = _plotting()
+    G = nx.DiGraph()
+    plt.figure(figsize=(10, 8))
+    plt.title(title)
+    # Add edges with weights
+    for u in graph:
+        G.add_node(u)
+        for v, w in graph[u]:
+            G.add_edge(u, v, weight=w) #遍历邻接表，添加有向边和权重
+    pos = nx.circular_layout(G, center=(0,0))  # layout for positioning 这里使用默认使用spring layout布局（seed=42），也可以使用circular_layout(环形，节点少的时候效果不错)、shell_layout、kamada_kawai_layout、Spectral Layout等布局
+    # Draw nodes and edges
+    nx.draw(G, pos, with_labels=True, node_color='skyblue', node_size=1500, font_size=12, arrowsize=20)
+    # Draw edge weights
+    edge_labels = nx.get_edge_attributes(G, 'weight')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='black')
+    if highlight:
+        nx.draw_networkx_edges(G, pos, edgelist=highlight, edge_color='orange', width=2.5)
+    # Highlight shortest path
+    if path and len(path) > 1:
+        path_edges = list(zip(path, path[1:]))
+        nx.draw_networkx_edges(G, pos, edgelist=path_edges, edge_color='red', width=2.5)
+    if output:
+        plt.savefig(output)
+        plt.close()
+    else:
+        plt.show()
+
+
+def render_snapshot(snapshot, dest=None, output=None):
+    """画出快照中的拓扑，高亮本节点到各下一跳的边；指定 dest 时再高亮到它的最短路径"""
+    me = snapshot['node']
+    graph = snapshot_graph(snapshot)
+    next_hops = sorted({info['next_hop'] for info in snapshot['routes'].values()})
+    highlight = [(me, nh) for nh in next_hops]
+
+    path = None
+    if dest is not None:
+        route = snapshot['routes'].get(dest)
+        if route is None:
+            print(f"[Viz] 快照中没有到 {dest} 的路由")
+        else:
+            # 从节点实际使用的下一跳出发找路径，等价路径有多条时和路由表保持一致
+            _, parent = dijkstra(graph, route['next_hop'])
+            path = [me] + reconstruct_path(parent, route['next_hop'], dest)
+
+    title = f"OLSR topology seen by {me} ({len(snapshot['routes'])} routes)"
+    draw_graph(graph, path, highlight, title, output)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Render an OLSR node topology snapshot")
+    parser.add_argument("snapshot")
+    parser.add_argument("--to", dest="dest", default=None, help="高亮到该目的节点的路径")
+    parser.add_argument("-o", "--output", default=None, help="保存为图片而不是弹窗显示")
+    args = parser.parse_args()
+    render_snapshot(load_snapshot(args.snapshot), args.dest, args.output)
@@ -1,12 +1,21 @@
-import time
-from constants import TOP_HOLD_TIME # 通常是 15秒 (3 * TC_INTERVAL)
-
-class TopologyTuple:
-    def __init__(self, dest_addr, last_addr, seq):
-        self.dest_addr = dest_addr  # 目标节点 (T_dest_addr)
-        self.last_addr = last_addr  # 上一跳/网关节点 (T_last_addr)
-        self.seq = seq              # 序列号 (T_seq)
+import logging
+
+from expiry_scheduler import ExpiryScheduler
+from olsr_log import get_logger, Addr
+
+log = get_logger('topology')
+
+class TopologyRecord:
+    """
+    按 Originator (T_last_addr) 组织的拓扑记录
+    同一个源节点通过一条 TC 宣告的所有链路共用一个 ANSN 和过期时间，
+    因此不再为每条 (dest, last) 链路单独建一个对象
+    """
+    def __init__(self, last_addr, seq):
+        self.last_addr = last_addr  # 上一跳/网关节点 (T_last_addr)，即 TC 的 Originator
+        self.seq = seq              # 序列号 (T_seq)，即 ANSN
         self.expiration_time = 0    # 过期时间 (T_time)
+        self.dests = set()          # 宣告的邻居集合 (T_dest_addr)
 
 
 # =================【新增：序列号比较逻辑】=================
@@ -22,81 +31,97 @@ def is_seq_newer(s1, s2):
 
 
 class TopologyManager:
-    def __init__(self, my_ip):
+    def __init__(self, my_ip, expiry=None):
         self.my_ip = my_ip
-        # 拓扑集: 存储 TopologyTuple
-        # 格式建议: {(dest_ip, last_ip): TopologyTuple} 
-        # 这样可以通过 (目标, 源) 唯一确定一条链路
-        self.topology_set = {} 
+        # 共享的过期调度器 (由 OLSRNode 传入，单独使用时自建一个)
+        self.expiry = expiry if expiry is not None else ExpiryScheduler()
+        # 拓扑集: 按源节点索引 { last_ip: TopologyRecord }
+        # 查 ANSN、用更新的 ANSN 整体替换、过期删除都只和该源节点宣告的邻居数有关，
+        # 不再线性扫描整个拓扑集
+        self.records = {}
 
-        #这里topology_set的key是(dest_addr, last_addr)的tuple，value是TopologyTuple对象
         #dest_addr (目标): 被宣告的邻居 IP（即 MPR Selector，接收广播的节点）。
         #last_addr (源/上一跳): 发送 TC 消息的节点 IP（即 MPR，宣告这条链路的节点）。
 
+        # 路由引擎 (DynamicSPF)，由 RoutingManager 注册，接收 last->dest 边的增删
+        self.route_listener = None
+
+    def _edge_added(self, last_ip, dest_ip):
+        if self.route_listener is not None:
+            self.route_listener.add_edge(last_ip, dest_ip)
+
+    def _edge_removed(self, last_ip, dest_ip):
+        if self.route_listener is not None:
+            self.route_listener.remove_edge(last_ip, dest_ip)
+
+    def _add_link(self, record, dest_ip):
+        record.dests.add(dest_ip)
+        self._edge_added(record.last_addr, dest_ip)
+
+    def _remove_link(self, record, dest_ip):
+        record.dests.discard(dest_ip)
+        self._edge_removed(record.last_addr, dest_ip)
+
     def process_tc_message(self, originator_ip, tc_body, validity_time, current_time):
         """
         处理接收到的 TC 消息，更新拓扑集 (RFC 9.5)
         :param originator_ip: TC 消息的发送源 (Message Header 里的 Originator)
-        :param tc_body: 解析后的字典 {'ansn': ..., 'neighbors': ...}
+        :param tc_body: 解析后的字典 {'ansn': ..., 'advertised_neighbors': ...}
         """
         # 1. 验证 ANSN (Advertised Neighbor Sequence Number)
-        # 我们需要检查是否已经收到过这个 Originator 发来的更新的 TC
-        # RFC 规则：如果内存里有比当前包更新的 ANSN，丢弃当前包
-        
-        # 这里的逻辑稍微有点绕：我们需要找到所有 T_last_addr == originator_ip 的记录
-        # 来对比 sequence number。
-        
-        last_known_seq = -1
-        has_entry = False
-        # 遍历查找该源节点的已知最大序列号 (这不是最高效的写法，但最直观)
-        for t_tuple in self.topology_set.values():
-            if t_tuple.last_addr == originator_ip:
-                last_known_seq = t_tuple.seq
-                has_entry = True
-                break # 通常同一个源节点的 seq 是一致的，找到一个就行
-
+        # 直接按源节点取记录，O(1)
+        record = self.records.get(originator_ip)
         received_seq = tc_body['ansn']
 
         # =================【修改点：使用 RFC 序列号比较】=================
         # 如果我们有旧记录，且收到的包不比旧记录新（即旧的或相同的），忽略
-        if has_entry and not is_seq_newer(received_seq, last_known_seq) and received_seq != last_known_seq:
-             # print(f"[Topology] 收到过时/重复 TC ({originator_ip}), 忽略。")
+        if record is not None and not is_seq_newer(received_seq, record.seq) and received_seq != record.seq:
              return
 
-        # 2. 如果收到更新的序列号 (received_seq > last_known_seq)
-        # 删除旧的拓扑记录
-        if has_entry and is_seq_newer(received_seq, last_known_seq):
-            keys_to_remove = []
-            for key, t_tuple in self.topology_set.items():
-                if t_tuple.last_addr == originator_ip:
-                    keys_to_remove.append(key)
-            for k in keys_to_remove:
-                del self.topology_set[k]
-
-        # 3. 添加/更新新的拓扑记录 (RFC 9.5 Rule 4)
+        advertised = set(tc_body['advertised_neighbors'])
+
+        if record is None:
+            record = TopologyRecord(originator_ip, received_seq)
+            self.records[originator_ip] = record
+            self.expiry.schedule(current_time + validity_time, self._expire_record, record)
+        elif received_seq != record.seq:
+            # 2. 收到更新的序列号：整体替换该源节点的宣告集合
+            # 只对新旧集合的差集发出边的增删，两边都有的链路保持不动
+            for dest_ip in record.dests - advertised:
+                self._remove_link(record, dest_ip)
+            record.seq = received_seq
+
+        # 3. 添加新的拓扑记录 (RFC 9.5 Rule 4)
         # T_dest_addr = TC 里的邻居 IP
         # T_last_addr = TC 的 Originator
-        # validity_time = TOP_HOLD_TIME # 应该从 Message Header 的 Vtime 获取，这里简化使用常量
-        
-        for neighbor_ip in tc_body['advertise.d_neighbors']:
-            key = (neighbor_ip, originator_ip)
-            
-            if key not in self.topology_set:
-                # 创建新记录
-                t_tuple = TopologyTuple(neighbor_ip, originator_ip, received_seq)
-                self.topology_set[key] = t_tuple
-                print(f"[Topology] 新增链路: {originator_ip} -> {neighbor_ip}")
-            else:
-                # 更新现有记录
-                t_tuple = self.topology_set[key]
-                t_tuple.seq = received_seq
-            
-            # 刷新过期时间
-            t_tuple.expiration_time = current_time + validity_time
-
-    def cleanup(self):
-        """清理过期拓扑"""
-        now = time.time()
-        keys_to_remove = [k for k, v in self.topology_set.items() if v.expiration_time < now]
-        for k in keys_to_remove:
-            del self.topology_set[k]
\ No newline at end of file
+        debug = log.isEnabledFor(logging.DEBUG)
+        for neighbor_ip in advertised - record.dests:
+            self._add_link(record, neighbor_ip)
+            if debug:
+                log.debug("新增链路: %s -> %s", Addr(originator_ip), Addr(neighbor_ip))
+
+        # 刷新过期时间
+        record.expiration_time = current_time + validity_time
+
+    def iter_links(self):
+        """遍历所有拓扑链路 (last_ip, dest_ip)"""
+        for last_ip, record in self.records.items():
+            for dest_ip in record.dests:
+                yield last_ip, dest_ip
+
+    def remove_originator(self, originator_ip):
+        """删除某个源节点的全部拓扑记录"""
+        record = self.records.pop(originator_ip, None)
+        if record is None:
+            return
+        for dest_ip in list(record.dests):
+            self._remove_link(record, dest_ip)
+
+    def _expire_record(self, record, now):
+        """过期调度器的处理函数：被刷新过则返回新的过期时刻，否则删除该源节点的全部拓扑"""
+        if self.records.get(record.last_addr) is not record:
+            return None
+        if record.expiration_time >= now:
+            return record.expiration_time
+        self.remove_originator(record.last_addr)
+        return None
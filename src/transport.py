@@ -0,0 +1,43 @@
+'''
+本文件实现 OLSRNode 的收发接口 (transport)
+
+OLSRNode 原来在 __init__ 里直接创建并绑定控制 / 数据两个 UDP socket，协议逻辑和真实网络绑死在一起，
+只能在真实主机 (或 mininet) 上跑。现在把 "怎么把包发出去" 抽成一个 transport 对象：
+- UdpTransport : 真实网络，控制端口广播 + 数据端口单播 (原来的行为)
+- SimTransport : 进程内仿真 (见 sim.py)，包交给虚拟广播信道，没有 socket
+transport 需要提供的接口：
+  sock / data_sock      : 控制 / 数据 socket，没有时为 None (不创建批量收包器，收包由外部注入)
+  port / data_port      : 控制 / 数据端口
+  max_datagram          : 数据面预分配缓冲区的大小
+  sendto(packet, addr)  : 发出一个控制包 (addr 为广播地址)
+  send_data(packet, addr): 非阻塞单播一个数据包，发送缓冲区满时抛 BlockingIOError
+'''
+import socket
+
+from constants import DATA_PORT_OFFSET, DATA_BUFFER_SIZE
+
+
+class UdpTransport:
+    def __init__(self, port=5005):
+        # 控制 socket：HELLO / TC 广播
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.bind(('0.0.0.0', port))
+        self.port = self.sock.getsockname()[1]
+
+        # 数据 socket：视频等数据流量走单独的端口，不和 HELLO / TC 抢接收缓冲区
+        self.data_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.data_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.data_sock.bind(('0.0.0.0', self.port + DATA_PORT_OFFSET if port else 0))
+        self.data_port = self.data_sock.getsockname()[1]
+
+        self.max_datagram = DATA_BUFFER_SIZE
+        self.sendto = self.sock.sendto
+
+    def send_data(self, packet, addr):
+        self.data_sock.sendto(packet, socket.MSG_DONTWAIT, addr)
+
+    def close(self):
+        self.sock.close()
+        self.data_sock.close()
@@ -0,0 +1,244 @@
+'''
+本文件实现流水线化的视频发送端
+
+test_video_sender.main 在一个线程里串行执行 cap.read()、cv2.imencode 和分片 sendto，
+JPEG 编码耗时直接叠加到帧间隔抖动上，高帧率视频源跟不上。现在拆成三级流水线，级间用有界队列连接：
+1. 采集 (capture)：读帧，按当前的质量 / 缩放参数把编码任务提交给编码池
+   (线程池，OpenCV 编码时释放 GIL；也可以用进程池)，把 Future 按采集顺序放进有界队列；
+   队列满时，实时源 (drop_frames=True) 丢掉新帧，文件源则阻塞等待
+2. 编码 (encode)：编码池里并行执行，多帧同时编码
+3. 发送 (send)：按采集顺序取 Future 的结果，保证帧序；按帧率节奏发送 (rate pacing)
+   单帧编码抛异常只计入 encode_failures 并跳过该帧；发送出错时流水线整体停止，
+   发送端退出前排空队列，保证采集线程不会阻塞在 put 上
+自适应控制 AdaptiveQuality 根据发送端积压 (发送时刻落后帧率节奏多少帧) 调整 JPEG 质量，
+质量降到下限仍积压时再缩小分辨率；积压消除后逐步恢复
+
+使用者：test_video_sender.py (直接 UDP 分片) 和 video_stream.py send (经 OLSR 数据面)
+'''
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from constants import (VIDEO_ENCODE_WORKERS, VIDEO_PIPELINE_DEPTH, VIDEO_JPEG_QUALITY,
+                       VIDEO_MIN_QUALITY, VIDEO_MAX_QUALITY, VIDEO_MIN_SCALE)
+
+
+def cv2_encode(frame, quality, scale):
+    """JPEG 编码 (模块级函数，进程池可以 pickle)，失败返回 None"""
+    import cv2
+    if scale < 1.0:
+        h, w = frame.shape[:2]
+        frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    return buf.tobytes() if ok else None
+
+
+class AdaptiveQuality:
+    """
+    由发送积压驱动的质量 / 分辨率控制 (AIMD 式)：
+    积压 >= high 时质量降 step，质量到下限后分辨率乘 0.75；
+    连续 patience 帧积压 <= low 时先恢复分辨率，再逐步提高质量
+    """
+    def __init__(self, quality=VIDEO_JPEG_QUALITY, min_quality=VIDEO_MIN_QUALITY, max_quality=VIDEO_MAX_QUALITY,
+                 min_scale=VIDEO_MIN_SCALE, high=1, low=0, step=5, patience=15):
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.scale = 1.0
+        self.min_scale = min_scale
+        self.high = high
+        self.low = low
+        self.step = step
+        self.patience = patience
+        self._calm = 0
+        self.changes = 0
+
+    def update(self, backlog):
+        """每发送一帧调用一次，返回 (quality, scale)"""
+        if backlog >= self.high:
+            self._calm = 0
+            if self.quality > self.min_quality:
+                self.quality = max(self.min_quality, self.quality - self.step)
+                self.changes += 1
+            elif self.scale > self.min_scale:
+                self.scale = max(self.min_scale, self.scale * 0.75)
+                self.changes += 1
+        elif backlog <= self.low:
+            self._calm += 1
+            if self._calm >= self.patience:
+                self._calm = 0
+                if self.scale < 1.0:
+                    self.scale = min(1.0, self.scale / 0.75)
+                    self.changes += 1
+                elif self.quality < self.max_quality:
+                    self.quality = min(self.max_quality, self.quality + 1)
+                    self.changes += 1
+        return self.quality, self.scale
+
+
+class VideoPipeline:
+    """
+    :param read_frame: 采集函数，返回一帧，视频结束返回 None
+    :param send: 发送一帧编码后的数据 send(data)，例如 VideoStreamSender.send_frame
+    :param encode: 编码函数 encode(frame, quality, scale) -> bytes / None
+    :param fps: 发送节奏 (帧/秒)，realtime=False 时尽快发送
+    :param adaptive: AdaptiveQuality 实例，None 表示固定用 quality
+    """
+    def __init__(self, read_frame, send, fps, encode=cv2_encode, workers=VIDEO_ENCODE_WORKERS,
+                 depth=VIDEO_PIPELINE_DEPTH, realtime=True, drop_frames=False, processes=False,
+                 quality=VIDEO_JPEG_QUALITY, adaptive=None):
+        self.read_frame = read_frame
+        self.send = send
+        self.encode = encode
+        self.interval = 1.0 / fps
+        self.workers = workers
+        self.realtime = realtime
+        self.drop_frames = drop_frames
+        self.processes = processes
+        self.adaptive = adaptive
+        self.quality = adaptive.quality if adaptive else quality
+        self.scale = 1.0
+
+        # 采集 -> 发送 之间按帧序排列的 Future 队列，有界，满了就反压采集
+        self.pending = queue.Queue(maxsize=depth)
+        self.running = True
+
+        # --- 统计计数 ---
+        self.captured = 0
+        self.dropped = 0            # 队列满被丢掉的帧 (drop_frames=True)
+        self.encode_failures = 0
+        self.sent = 0
+        self.bytes = 0
+        self.encode_time = 0.0
+        self.max_lag = 0.0          # 发送时刻落后节奏的最大值
+        self._intervals = []        # 相邻两帧的实际发送间隔
+        self.elapsed = 0.0
+
+    def _encode_timed(self, frame, quality, scale):
+        t0 = time.perf_counter()
+        data = self.encode(frame, quality, scale)
+        return data, time.perf_counter() - t0
+
+    def capture_loop(self, pool):
+        submit = pool.submit
+        try:
+            while self.running:
+                frame = self.read_frame()
+                if frame is None:
+                    break
+                self.captured += 1
+                if self.drop_frames and self.pending.full():
+                    self.dropped += 1
+                    continue
+                if self.processes:
+                    future = submit(self.encode, frame, self.quality, self.scale)
+                else:
+                    future = submit(self._encode_timed, frame, self.quality, self.scale)
+                self.pending.put(future)
+        finally:
+            self.pending.put(None)
+
+    def send_loop(self):
+        finished = False    # 收到了采集线程的结束标记
+        try:
+            finished = self._send_frames()
+        finally:
+            if not finished:
+                # 发送出错退出：通知采集线程停止，并排空队列直到结束标记，让它不再阻塞在 put 上
+                self.running = False
+                self._drain()
+
+    def _drain(self):
+        while True:
+            future = self.pending.get()
+            if future is None:
+                return
+            future.cancel()
+
+    def _send_frames(self):
+        """发送循环，收到结束标记时返回 True"""
+        next_time = time.perf_counter()
+        last_sent = None
+        while True:
+            future = self.pending.get()
+            if future is None:
+                return True
+            try:
+                result = future.result()
+            except Exception:
+                self.encode_failures += 1  # 单帧编码出错只丢这一帧
+                continue
+            if self.processes:
+                data = result
+            else:
+                data, elapsed = result
+                self.encode_time += elapsed
+            if data is None:
+                self.encode_failures += 1
+                continue
+
+            # 按帧率节奏发送；落后时不睡，节奏从当前时刻重新开始，不突发补发
+            now = time.perf_counter()
+            backlog = 0
+            if self.realtime:
+                if next_time > now:
+                    time.sleep(next_time - now)
+                    now = time.perf_counter()
+                else:
+                    lag = now - next_time
+                    if lag > self.max_lag:
+                        self.max_lag = lag
+                    backlog = int(lag / self.interval)
+                    if lag > self.interval:
+                        next_time = now
+                next_time += self.interval
+
+            self.send(data)
+            self.sent += 1
+            self.bytes += len(data)
+            if last_sent is not None:
+                self._intervals.append(now - last_sent)
+            last_sent = now
+
+            if self.adaptive is not None:
+                self.quality, self.scale = self.adaptive.update(backlog)
+
+    def run(self):
+        """运行到视频结束 (或 stop())，返回统计"""
+        executor = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+        t0 = time.perf_counter()
+        with executor(max_workers=self.workers) as pool:
+            capture = threading.Thread(target=self.capture_loop, args=(pool,), daemon=True)
+            capture.start()
+            try:
+                self.send_loop()
+            finally:
+                capture.join()
+        self.elapsed = time.perf_counter() - t0
+        return self.stats()
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        intervals = self._intervals
+        jitter = 0.0
+        if intervals:
+            mean = sum(intervals) / len(intervals)
+            jitter = (sum((x - mean) ** 2 for x in intervals) / len(intervals)) ** 0.5
+        elapsed = self.elapsed
+        return {
+            'captured': self.captured,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'encode_failures': self.encode_failures,
+            'fps': self.sent / elapsed if elapsed else 0.0,
+            'mbps': self.bytes * 8 / elapsed / 1e6 if elapsed else 0.0,
+            'encode_ms_avg': self.encode_time / self.sent * 1e3 if self.sent and not self.processes else 0.0,
+            'interval_jitter_ms': jitter * 1e3,
+            'max_lag_ms': self.max_lag * 1e3,
+            'quality': self.quality,
+            'scale': self.scale,
+        }
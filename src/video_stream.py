@@ -0,0 +1,449 @@
+'''
+本文件实现基于 OLSR 数据面的视频流分片与重组
+
+test_video_sender.py / test_video_receiver.py 直接用 UDP 收发 `!IHH` 分片，不经过覆盖网络路由；
+接收端每帧一个字典，帧号一变就把上一帧全部丢掉，多跳时延抖动下很多帧永远收不齐。现在：
+1. 发送端 VideoStreamSender 把一帧 (JPEG 等任意字节串) 切成 DATA_MESSAGE 负载，
+   经 OLSRNode.send_data 沿路由表逐跳单播到目的节点
+2. 接收端 VideoStreamReceiver 挂在 DataPlane.on_deliver 上，每个流 (源节点, 流号) 一个
+   预分配的环形缓冲区，按 frame_id % slots 放进帧槽，分片直接写到帧缓冲区中的偏移位置：
+   多个帧可以同时在途，迟到的分片仍能补齐较旧的帧
+3. 按流统计端到端时延、到达抖动 (RFC 3550 的平滑算法) 和帧完成率
+4. 可选的前向纠错 (见 fec.py)：数据分片每 k 个一组，附加 r 个修复分片，接收端组内收到任意 k 个分片
+   就能直接恢复缺失的数据分片，不需要重传
+
+分片负载格式 (CHUNK_HEADER，26 字节) + 分片数据：
+  stream_id(2) | frame_id(4) | chunk_id(2) | total_chunks(2) | chunk_size(2) | frame_len(4) |
+  fec_k(1) | fec_r(1) | 发送时间戳 us(8)
+chunk_size 是该帧除最后一片外每片的长度，接收端据此算出分片在帧内的偏移
+total_chunks 只计数据分片；chunk_id >= total_chunks 的是修复分片，第 g 组的第 j 个修复分片
+的 chunk_id = total_chunks + g * fec_r + j；fec_k 为 0 表示不带 FEC
+注意：时延用的是发送端的时间戳，两端时钟需要同步 (同一台机器或 NTP)
+
+用法:
+  python3 video_stream.py send 本节点IP 目的IP video.mp4 [--fec 0.25]
+  python3 video_stream.py recv 本节点IP
+'''
+import struct
+import time
+
+from constants import VIDEO_CHUNK_SIZE, VIDEO_RING_SLOTS, VIDEO_MAX_FRAME_SIZE, VIDEO_FRAME_TIMEOUT, FEC_GROUP_SIZE
+from node_addr import int_to_ip
+from fec import encode_group, decode_group
+
+CHUNK_HEADER = struct.Struct('!HIHHHIBBQ')
+
+
+def frame_newer(a, b):
+    """32 位帧号的序列号比较：a 比 b 新"""
+    return a != b and ((a - b) & 0xFFFFFFFF) < 0x80000000
+
+
+class VideoStreamSender:
+    """
+    :param send: 发送函数 send(dest, payload) -> bool，一般是 OLSRNode.send_data
+    :param dest: 目的节点地址 (点分十进制字符串或 32 位整数)
+    :param fec: FEC 参数 (k, r)，每 k 个数据分片附加 r 个修复分片，可用 fec.fec_params(冗余比例) 得到；
+                (0, 0) 表示不启用
+    """
+    def __init__(self, send, dest, stream_id=0, chunk_size=VIDEO_CHUNK_SIZE, fec=(0, 0)):
+        self.send = send
+        self.dest = dest
+        self.stream_id = stream_id
+        self.chunk_size = chunk_size
+        self.fec_k, self.fec_r = fec
+        self.frame_id = 0
+
+        # 预分配的分片缓冲区，每片原地写头部和数据
+        self.buf = bytearray(CHUNK_HEADER.size + chunk_size)
+        self.view = memoryview(self.buf)
+        self.pad = bytearray(0)     # FEC 编码用的补零帧缓冲区
+
+        # --- 统计计数 ---
+        self.frames = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.repair_chunks = 0
+        self.send_failures = 0
+
+    def send_frame(self, data, timestamp=None):
+        """切片发送一帧 (FEC 启用时随后发送修复分片)，返回帧号"""
+        data = memoryview(data).cast('B')
+        size = self.chunk_size
+        total = max(1, (len(data) + size - 1) // size)
+        k, r = self.fec_k, self.fec_r
+        repairs = (total + k - 1) // k * r if k else 0
+        if total + repairs > 0xFFFF:
+            raise ValueError(f"帧太大: {len(data)} 字节")
+        ts = int((time.time() if timestamp is None else timestamp) * 1e6)
+        frame_id = self.frame_id
+
+        for chunk_id in range(total):
+            self._send_chunk(frame_id, chunk_id, total, len(data), ts,
+                             data[chunk_id * size:(chunk_id + 1) * size])
+
+        if repairs:
+            # 修复分片按补零到 chunk_size 的数据分片计算
+            padded = total * size
+            if len(self.pad) < padded:
+                self.pad = bytearray(padded)
+            pad = memoryview(self.pad)
+            pad[:len(data)] = data
+            pad[len(data):padded] = bytes(padded - len(data))
+            chunk_id = total
+            for first in range(0, total, k):
+                group = [pad[i * size:(i + 1) * size] for i in range(first, min(first + k, total))]
+                for repair in encode_group(group, size, r):
+                    self._send_chunk(frame_id, chunk_id, total, len(data), ts, repair)
+                    chunk_id += 1
+            self.repair_chunks += repairs
+
+        self.frames += 1
+        self.bytes += len(data)
+        self.frame_id = (frame_id + 1) & 0xFFFFFFFF
+        return frame_id
+
+    def _send_chunk(self, frame_id, chunk_id, total, length, ts, chunk):
+        hdr = CHUNK_HEADER.size
+        n = hdr + len(chunk)
+        CHUNK_HEADER.pack_into(self.buf, 0, self.stream_id, frame_id, chunk_id, total, self.chunk_size,
+                               length, self.fec_k, self.fec_r, ts)
+        self.buf[hdr:n] = chunk
+        if not self.send(self.dest, self.view[:n]):
+            self.send_failures += 1
+        self.chunks += 1
+
+
+class FrameSlot:
+    """
+    环形缓冲区里的一个帧槽：预分配的帧缓冲区 + 已收分片的位图
+    启用 FEC 时另外记录每组收到的分片数和收到的修复分片 { chunk_id: bytes }
+    """
+    __slots__ = ('frame_id', 'total', 'received', 'have', 'buf', 'length', 'size', 'fec_k', 'fec_r',
+                 'group_count', 'repairs', 'first_arrival', 'sent_at', 'active')
+
+    def __init__(self, max_frame_size):
+        self.buf = bytearray(max_frame_size)
+        self.have = bytearray(0)
+        self.frame_id = None
+        self.total = 0
+        self.received = 0
+        self.length = 0
+        self.size = 0
+        self.fec_k = 0
+        self.fec_r = 0
+        self.group_count = []
+        self.repairs = {}
+        self.first_arrival = 0.0
+        self.sent_at = 0.0
+        self.active = False
+
+    def reset(self, frame_id, total, size, length, fec_k, fec_r, sent_at, now):
+        self.frame_id = frame_id
+        self.total = total
+        self.received = 0
+        if len(self.have) < total:
+            self.have = bytearray(total)
+        else:
+            self.have[:total] = bytes(total)
+        self.length = length
+        self.size = size
+        self.fec_k = fec_k
+        self.fec_r = fec_r
+        self.repairs.clear()
+        if fec_k:
+            self.group_count = [0] * ((total + fec_k - 1) // fec_k)
+        self.first_arrival = now
+        self.sent_at = sent_at
+        self.active = True
+
+
+class StreamState:
+    """一个流 (源节点, 流号) 的帧槽环和统计"""
+    def __init__(self, slots, max_frame_size):
+        self.slots = [FrameSlot(max_frame_size) for _ in range(slots)]
+        self.max_frame_size = max_frame_size
+        self.first_frame = None     # 收到的最旧帧号，用于估计应收帧数
+        self.newest_frame = None
+
+        self.completed = 0
+        self.incomplete = 0         # 被挤出或超时仍未收齐的帧
+        self.late_chunks = 0        # 所属帧已经被挤出窗口的分片
+        self.duplicate_chunks = 0
+        self.bad_chunks = 0
+        self.bytes = 0
+        self.repair_chunks = 0      # 收到的修复分片
+        self.recovered_chunks = 0   # 由 FEC 恢复出的数据分片
+
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.jitter = 0.0           # RFC 3550 平滑抖动
+        self._last_transit = None
+
+    def expected(self):
+        """从第一个帧到最新帧应收的帧数 (从未到达过任何分片的帧也算在内)"""
+        if self.first_frame is None:
+            return 0
+        return ((self.newest_frame - self.first_frame) & 0xFFFFFFFF) + 1
+
+    def stats(self):
+        expected = self.expected()
+        return {
+            'frames_completed': self.completed,
+            'frames_incomplete': self.incomplete,
+            'frames_expected': expected,
+            'completion_rate': self.completed / expected if expected else 0.0,
+            'late_chunks': self.late_chunks,
+            'duplicate_chunks': self.duplicate_chunks,
+            'bad_chunks': self.bad_chunks,
+            'repair_chunks': self.repair_chunks,
+            'recovered_chunks': self.recovered_chunks,
+            'bytes': self.bytes,
+            'latency_avg_ms': self.latency_sum / self.completed * 1e3 if self.completed else 0.0,
+            'latency_max_ms': self.latency_max * 1e3,
+            'jitter_ms': self.jitter * 1e3,
+        }
+
+
+class VideoStreamReceiver:
+    """
+    :param on_frame: 收齐一帧时的回调 on_frame(stream_key, frame_id, frame_view)，
+                     stream_key 是 (源节点地址, 流号)；frame_view 指向帧槽的缓冲区，只在回调期间有效
+    """
+    def __init__(self, on_frame=None, slots=VIDEO_RING_SLOTS, max_frame_size=VIDEO_MAX_FRAME_SIZE,
+                 frame_timeout=VIDEO_FRAME_TIMEOUT):
+        self.on_frame = on_frame
+        self.n_slots = slots
+        self.max_frame_size = max_frame_size
+        self.frame_timeout = frame_timeout
+        self.streams = {}   # { (orig_ip, stream_id): StreamState }
+
+    def attach(self, node):
+        """挂到 OLSRNode 的数据面上，收下所有投递给本节点的数据"""
+        node.data_plane.on_deliver = self.handle
+
+    def handle(self, orig_ip, payload, now=None):
+        """处理一个分片 (DataPlane.on_deliver 回调)"""
+        if len(payload) < CHUNK_HEADER.size:
+            return
+        if now is None:
+            now = time.time()
+        stream_id, frame_id, chunk_id, total, size, length, fec_k, fec_r, ts = CHUNK_HEADER.unpack_from(payload, 0)
+        key = (orig_ip, stream_id)
+        stream = self.streams.get(key)
+        if stream is None:
+            stream = self.streams[key] = StreamState(self.n_slots, self.max_frame_size)
+
+        n = len(payload) - CHUNK_HEADER.size
+        offset = chunk_id * size
+        repairs = (total + fec_k - 1) // fec_k * fec_r if fec_k else 0
+        if (not size or total * size > self.max_frame_size or length > total * size or (total > 1 and (total - 1) * size >= length)
+                or chunk_id >= total + repairs
+                or n != (length - offset if chunk_id == total - 1 else size)):
+            stream.bad_chunks += 1
+            return
+
+        # 1. 窗口：比最新帧旧 slots 个以上的帧已经没有槽了
+        if stream.newest_frame is None:
+            stream.first_frame = stream.newest_frame = frame_id
+        elif frame_newer(frame_id, stream.newest_frame):
+            stream.newest_frame = frame_id
+        elif ((stream.newest_frame - frame_id) & 0xFFFFFFFF) >= self.n_slots:
+            stream.late_chunks += 1
+            return
+        elif frame_newer(stream.first_frame, frame_id):
+            stream.first_frame = frame_id   # 开头几帧乱序到达
+
+        # 2. 找帧槽：槽里是更旧的帧就挤出去
+        slot = stream.slots[frame_id % self.n_slots]
+        if slot.frame_id != frame_id or not slot.active:
+            if slot.frame_id == frame_id:
+                # 这一帧已经交付 (或超时放弃)，迟到 / 重复 / 用不上的修复分片
+                stream.duplicate_chunks += 1
+                return
+            if slot.active:
+                if not frame_newer(frame_id, slot.frame_id):
+                    stream.late_chunks += 1
+                    return
+                stream.incomplete += 1
+            slot.reset(frame_id, total, size, length, fec_k, fec_r, ts / 1e6, now)
+        elif chunk_id < total and slot.have[chunk_id] or chunk_id in slot.repairs:
+            stream.duplicate_chunks += 1
+            return
+
+        # 3. 数据分片写进帧缓冲区，修复分片先存起来
+        data = memoryview(payload)[CHUNK_HEADER.size:]
+        if chunk_id < total:
+            slot.buf[offset:offset + n] = data
+            if n < size:
+                slot.buf[offset + n:offset + size] = bytes(size - n)  # 最后一片补零，参与 FEC 解码
+            slot.have[chunk_id] = 1
+            slot.received += 1
+            group = chunk_id // fec_k if fec_k else None
+        else:
+            slot.repairs[chunk_id] = bytes(data)
+            stream.repair_chunks += 1
+            group = (chunk_id - total) // fec_r
+
+        # 4. FEC：组内收到的分片够了就恢复缺失的数据分片
+        if group is not None:
+            slot.group_count[group] += 1
+            self._try_recover(stream, slot, group)
+
+        if slot.received == slot.total:
+            self._complete(key, stream, slot, now)
+
+    def _try_recover(self, stream, slot, group):
+        k, r, size, total = slot.fec_k, slot.fec_r, slot.size, slot.total
+        first = group * k
+        k_group = min(k, total - first)
+        if slot.group_count[group] < k_group:
+            return
+        have = slot.have
+        if all(have[first:first + k_group]):
+            return
+
+        buf = memoryview(slot.buf)
+        present = {i: buf[(first + i) * size:(first + i + 1) * size]
+                   for i in range(k_group) if have[first + i]}
+        base = total + group * r
+        for j in range(r):
+            repair = slot.repairs.get(base + j)
+            if repair is not None:
+                present[k_group + j] = repair
+
+        recovered = decode_group(present, k_group, r, size)
+        if not recovered:
+            return
+        for i, chunk in recovered.items():
+            offset = (first + i) * size
+            buf[offset:offset + size] = chunk
+            have[first + i] = 1
+        slot.received += len(recovered)
+        stream.recovered_chunks += len(recovered)
+
+    def _complete(self, key, stream, slot, now):
+        slot.active = False
+        stream.completed += 1
+        stream.bytes += slot.length
+
+        transit = now - slot.sent_at
+        stream.latency_sum += transit
+        if transit > stream.latency_max:
+            stream.latency_max = transit
+        if stream._last_transit is not None:
+            stream.jitter += (abs(transit - stream._last_transit) - stream.jitter) / 16
+        stream._last_transit = transit
+
+        if self.on_frame is not None:
+            self.on_frame(key, slot.frame_id, memoryview(slot.buf)[:slot.length])
+
+    def expire(self, now=None):
+        """放弃超过 frame_timeout 仍未收齐的帧，返回放弃的帧数"""
+        if now is None:
+            now = time.time()
+        expired = 0
+        for stream in self.streams.values():
+            for slot in stream.slots:
+                if slot.active and now - slot.first_arrival > self.frame_timeout:
+                    slot.active = False
+                    stream.incomplete += 1
+                    expired += 1
+        return expired
+
+    def stats(self):
+        return {
+            f"{int_to_ip(orig)}/{stream_id}": stream.stats()
+            for (orig, stream_id), stream in self.streams.items()
+        }
+
+
+def _run_node(ip):
+    import threading
+    from olsr_main import OLSRNode
+    node = OLSRNode(ip)
+    threading.Thread(target=node.start, daemon=True).start()
+    return node
+
+
+def main_send(ip, dest, video_path, fps=None, jpeg_quality=60, fec=(0, 0)):
+    import cv2
+    from video_pipeline import VideoPipeline, AdaptiveQuality
+    node = _run_node(ip)
+    sender = VideoStreamSender(node.send_data, dest, fec=fec)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频文件: {video_path}")
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    def read_frame():
+        ok, frame = cap.read()
+        return frame if ok else None
+
+    # 采集 / 编码 / 发送 三级流水线 (见 video_pipeline.py)
+    pipeline = VideoPipeline(read_frame, sender.send_frame, fps, adaptive=AdaptiveQuality(quality=jpeg_quality))
+    print(f"[Video] 发送 {video_path} -> {dest}, fps={fps:.2f}")
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        pipeline.stop()
+    finally:
+        cap.release()
+        node.stop()
+    print(f"[Video] 共发送 {sender.frames} 帧 / {sender.chunks} 片, 失败 {sender.send_failures}")
+
+
+def main_recv(ip):
+    import cv2
+    import numpy as np
+    frames = []
+
+    def on_frame(key, frame_id, view):
+        frames.append(bytes(view))
+
+    receiver = VideoStreamReceiver(on_frame)
+    node = _run_node(ip)
+    receiver.attach(node)
+    last_report = time.time()
+    try:
+        while True:
+            while frames:
+                img = cv2.imdecode(np.frombuffer(frames.pop(0), dtype=np.uint8), cv2.IMREAD_COLOR)
+                if img is not None:
+                    cv2.imshow("OLSR Video", img)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            now = time.time()
+            if now - last_report >= 1.0:
+                receiver.expire(now)
+                for name, s in receiver.stats().items():
+                    print(f"[Video] {name}: 完成率 {s['completion_rate']:.1%}, "
+                          f"时延 {s['latency_avg_ms']:.1f} ms, 抖动 {s['jitter_ms']:.1f} ms")
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cv2.destroyAllWindows()
+        node.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Video streaming over the OLSR data plane")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    p_send = sub.add_parser("send")
+    p_send.add_argument("ip")
+    p_send.add_argument("dest")
+    p_send.add_argument("video")
+    p_send.add_argument("--fps", type=float, default=None)
+    p_send.add_argument("--quality", type=int, default=60)
+    p_send.add_argument("--fec", type=float, default=0.0, help="FEC 冗余比例 (修复分片数 / 数据分片数)，0 表示不启用")
+    p_send.add_argument("--fec-k", type=int, default=FEC_GROUP_SIZE, help="FEC 每组的数据分片数")
+    p_recv = sub.add_parser("recv")
+    p_recv.add_argument("ip")
+    args = parser.parse_args()
+    if args.mode == "send":
+        from fec import fec_params
+        main_send(args.ip, args.dest, args.video, args.fps, args.quality, fec_params(args.fec, args.fec_k))
+    else:
+        main_recv(args.ip)